@@ -1,28 +1,69 @@
 import os
 import re
+import sys
 import json
 import argparse
-from groq import Groq
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from core.config import AVAILABLE_TOOLS, register_tool
+from core.tool_manifest import ToolManifest, import_tool
+from core.generation_cache import (GENERATION_CACHE, GENERATION_CACHE_PATH, GenerationCache,
+                                   normalize_request, registry_fingerprint)
+from core.log import get_logger
+from core import llm, telemetry
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("generator")
+
+# Tools generated at the same time in batch mode
+GENERATOR_WORKERS = int(os.getenv("GENERATOR_WORKERS", "4"))
+
+# Seconds a generated module may take to compile and import in the validation subprocess
+VALIDATION_TIMEOUT_S = float(os.getenv("GENERATOR_VALIDATION_TIMEOUT_S", "30"))
+
+# Environment variables whose names contain these are not passed to the validation subprocess
+SECRET_ENV_MARKERS = ("KEY", "TOKEN", "SECRET", "PASSWORD")
+
+# Runs in the validation subprocess: compile and import the module, then report the function signature
+VALIDATION_PROBE = r"""
+import sys, json, inspect, importlib.util
+path, function_name = sys.argv[1], sys.argv[2]
+with open(path) as file:
+    compile(file.read(), path, "exec")
+spec = importlib.util.spec_from_file_location("generated_tool", path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+function = getattr(module, function_name, None)
+if not callable(function):
+    raise SystemExit(f"{function_name} is not defined as a function in the generated module")
+parameters = inspect.signature(function).parameters.values()
+print(json.dumps({
+    "parameters": [p.name for p in parameters if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)],
+    "required": [p.name for p in parameters
+                 if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) and p.default is p.empty],
+    "var_keyword": any(p.kind == p.VAR_KEYWORD for p in parameters),
+}))
+"""
+
 class AgentGenerator:
-    def __init__(self):
-        """Initialize the Agent Generator with Groq API client"""
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
+    def __init__(self, use_cache=None):
+        """Initialize the Agent Generator; requests go through the shared Groq client in core/llm.py"""
+        if not os.getenv("GROQ_API_KEY"):
             raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
-            
-        self.client = Groq(api_key=self.api_key)
-        self.model = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
         
         # Define paths to important files
         self.project_root = os.path.dirname(os.path.abspath(__file__))
         self.tools_dir = os.path.join(self.project_root, "tools")
-        self.tools_init = os.path.join(self.tools_dir, "__init__.py")
-        self.config_path = os.path.join(self.project_root, "core", "config.py")
+        self.manifest = ToolManifest()
+
+        # Generated definitions are reused for repeated requests (see core/generation_cache.py)
+        self.cache = None
+        if GENERATION_CACHE if use_cache is None else use_cache:
+            self.cache = GenerationCache(os.path.join(self.project_root, GENERATION_CACHE_PATH))
         
     def get_file_content(self, file_path):
         """Read and return the content of a file"""
@@ -36,7 +77,7 @@ class AgentGenerator:
         """Write content to a file"""
         with open(file_path, 'w') as file:
             file.write(content)
-        print(f"Updated: {file_path}")
+        logger.info("Updated: %s", file_path)
     
     def parse_tool_definition(self, agent_description):
         """Parse LLM response to extract tool information"""
@@ -68,7 +109,7 @@ class AgentGenerator:
                         json_text = re.sub(r'^[\s"\']+|[\s"\']+$', '', json_text)
                         results[key] = json.loads(json_text)
                     except json.JSONDecodeError:
-                        print(f"Warning: Could not parse JSON for parameters")
+                        logger.warning("Could not parse JSON for parameters")
                         results[key] = {}
             else:
                 # For other keys, get the first match
@@ -133,237 +174,315 @@ Please ensure that:
 
 Make sure to include all necessary imports and dependencies. If the tool requires external API access, include comments about any required environment variables."""
 
-        # Query the model
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Create a tool that can {user_query}"}
-            ],
-            max_completion_tokens=4096
-        )
+        # Shares the pooled client, rate limit, retries and telemetry with the agent's own stages
+        response = llm.chat_completion(telemetry.STAGE_GENERATION, [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Create a tool that can {user_query}"}
+        ])
         
         agent_description = response.choices[0].message.content
         return agent_description
         
-    def update_tool_init(self, function_name, file_name_without_ext):
-        """Update the tools/__init__.py file to import and export the new tool"""
-        init_content = self.get_file_content(self.tools_init)
-        
-        # Add import statement
-        import_pattern = r'# Import all tools to make them accessible from the tools package\n'
-        import_statement = f'from .{file_name_without_ext} import {function_name}\n'
-        
-        if import_statement not in init_content:
-            init_content = re.sub(
-                import_pattern,
-                f'{import_pattern}{import_statement}',
-                init_content
-            )
-        
-        # Add to __all__ list
-        all_pattern = r"__all__ = \[(.*?)\]"
-        all_match = re.search(all_pattern, init_content, re.DOTALL)
-        
-        if all_match:
-            current_all = all_match.group(1)
-            # Check if our function is already in __all__
-            if f"'{function_name}'" not in current_all:
-                # Add it to the end of the list
-                new_all = current_all.rstrip() + f", '{function_name}'" if current_all.strip() else f"'{function_name}'"
-                init_content = re.sub(all_pattern, f"__all__ = [{new_all}]", init_content, flags=re.DOTALL)
-        
-        self.write_file_content(self.tools_init, init_content)
-        
-    def update_config(self, tool_name, description, parameters):
-        """Update the core/config.py file to add the new tool"""
-        config_content = self.get_file_content(self.config_path)
-        
-        # Step 1: Add import statement
-        import_statement = f"from tools import {tool_name}"
-        import_line = "from tools import "
-        
-        # Check if the import already exists
-        if import_statement not in config_content:
-            # Find the import line and add our new import
-            import_match = re.search(r'from tools import .*', config_content)
-            if import_match:
-                old_import = import_match.group(0)
-                new_import = f"{old_import}, {tool_name}"
-                config_content = config_content.replace(old_import, new_import)
-        
-        # Step 2: Add to AVAILABLE_TOOLS list
-        available_tools_pattern = r'AVAILABLE_TOOLS = \[(.*?)\]'
-        available_tools_match = re.search(available_tools_pattern, config_content, re.DOTALL)
-        
-        if available_tools_match:
-            tool_json = json.dumps({
-                "name": tool_name,
-                "description": description,
-                "parameters": parameters
-            }, indent=4)
-            
-            # Format the tool entry properly with correct indentation
-            tool_entry = f"""    {{
-        "name": "{tool_name}",
-        "description": "{description}",
-        "parameters": {json.dumps(parameters, indent=8).replace('{', '{').replace('}', '}')}
-    }}"""
-            
-            # Add to the end of the list, before the closing bracket
-            tools_content = available_tools_match.group(1)
-            if f'"name": "{tool_name}"' not in tools_content:
-                end_position = available_tools_match.end() - 1  # Position before the closing bracket
-                new_tools_content = config_content[:end_position] + ",\n" + tool_entry + "\n" + config_content[end_position:]
-                config_content = new_tools_content
-        
-        # Step 3: Add to tools configuration (for function calling format)
-        tools_pattern = r'tools = \[(.*?)\]'
-        tools_match = re.search(tools_pattern, config_content, re.DOTALL)
-        
-        if tools_match:
-            tool_params_properties = {}
-            tool_params_required = []
-            
-            for param_name, param_desc in parameters.items():
-                # Extract the type from description (usually "string - Description")
-                param_type = "string"  # Default type
-                if " - " in param_desc:
-                    param_type = param_desc.split(" - ")[0].lower()
-                
-                tool_params_properties[param_name] = {
-                    "type": param_type,
-                    "description": param_desc.split(" - ")[-1] if " - " in param_desc else param_desc
-                }
-                tool_params_required.append(param_name)
-            
-            tool_config = {
-                "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "description": description,
-                    "parameters": {
-                        "type": "object",
-                        "properties": tool_params_properties,
-                        "required": tool_params_required
-                    }
-                }
-            }
-            
-            # Format the tool config properly
-            tool_config_str = f"""    {{
-        "type": "function",
-        "function": {{
-            "name": "{tool_name}",
-            "description": "{description}",
-            "parameters": {{
-                "type": "object",
-                "properties": {{
-"""
-            
-            # Add each property
-            for param_name, param_desc in parameters.items():
-                param_type = "string"
-                if " - " in param_desc:
-                    param_type = param_desc.split(" - ")[0].lower()
-                param_description = param_desc.split(" - ")[-1] if " - " in param_desc else param_desc
-                
-                tool_config_str += f"""                    "{param_name}": {{
-                        "type": "{param_type}",
-                        "description": "{param_description}"
-                    }},
-"""
-            
-            # Remove the last comma
-            tool_config_str = tool_config_str.rstrip(",\n") + "\n"
-            
-            # Add required parameters and close the brackets
-            tool_config_str += f"""                }},
-                "required": {json.dumps(tool_params_required)}
-            }}
-        }}
-    }}"""
-            
-            # Add to the end of the list, before the closing bracket
-            tools_content = tools_match.group(1)
-            if f'"name": "{tool_name}"' not in tools_content:
-                end_position = tools_match.end() - 1  # Position before the closing bracket
-                new_tools_content = config_content[:end_position] + ",\n" + tool_config_str + "\n" + config_content[end_position:]
-                config_content = new_tools_content
-        
-        # Step 4: Add to available_functions mapping
-        functions_pattern = r'available_functions = {(.*?)}'
-        functions_match = re.search(functions_pattern, config_content, re.DOTALL)
-        
-        if functions_match:
-            functions_entry = f'    "{tool_name}": {tool_name},'
-            functions_content = functions_match.group(1)
-            
-            if f'"{tool_name}":' not in functions_content:
-                end_position = functions_match.end() - 1  # Position before the closing bracket
-                new_functions_content = config_content[:end_position] + "\n" + functions_entry + "\n" + config_content[end_position:]
-                config_content = new_functions_content
-        
-        self.write_file_content(self.config_path, config_content)
-        
-    def create_agent(self, user_query):
-        """Main function to create a new agent based on user query"""
-        print(f"Generating agent for: '{user_query}'")
-        
-        # Generate agent definition using Groq
-        agent_description = self.generate_agent_definition(user_query)
-        print("\nAgent description generated:")
-        print("-" * 50)
-        print(agent_description)
-        print("-" * 50)
-        
-        # Parse the tool definition
-        tool_info = self.parse_tool_definition(agent_description)
-        
-        # Extract important information
-        tool_name = tool_info.get("tool_name")
-        file_name = tool_info.get("file_name")
-        function_name = tool_info.get("function_name", tool_name)
-        description = tool_info.get("description", "")
+    def file_name_errors(self, file_name):
+        """
+        Check the module file a generated tool would be written to in the tools package.
+
+        Returns:
+            list: Problems found; empty if the name is valid and not taken by the package
+                  itself, a built-in tool, a helper module or an earlier generated tool
+        """
+        if not re.fullmatch(r"[a-z0-9_]+\.py", file_name or ""):
+            return [f"Invalid file name: {file_name!r}"]
+        module_path = os.path.join(self.tools_dir, file_name)
+        if file_name == "__init__.py" or os.path.exists(module_path) or os.path.isdir(module_path[:-len(".py")]):
+            return [f"File name {file_name!r} is already used in the tools package"]
+        return []
+
+    def validate_tool(self, tool_info):
+        """
+        Compile and import a generated tool in a separate Python process and check its signature.
+
+        The module is loaded from a temporary directory, with a timeout and without API keys
+        or passwords in its environment, so broken or misbehaving code never reaches the
+        tools package or the running process.
+
+        Returns:
+            list: Problems found; empty if the tool can be installed
+        """
         code = tool_info.get("code", "")
+        function_name = tool_info.get("function_name")
         parameters = tool_info.get("parameters", {})
-        
-        # Create the Python file for the tool
-        file_path = os.path.join(self.tools_dir, file_name)
-        self.write_file_content(file_path, code)
-        
-        # Update the tools/__init__.py file
-        file_name_without_ext = os.path.splitext(file_name)[0]
-        self.update_tool_init(function_name, file_name_without_ext)
-        
-        # Update the core/config.py file
-        self.update_config(tool_name, description, parameters)
-        
-        print(f"\nSuccessfully created agent: {tool_name}")
-        print(f"- Tool file: {file_path}")
-        print(f"- Updated __init__.py to import {function_name}")
-        print(f"- Updated config.py to include the new tool")
-        print("\nYour new agent is ready to use! 🚀")
-        
+        if not code:
+            return ["No Python code block in the generated definition"]
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", function_name or ""):
+            return [f"Invalid function name: {function_name!r}"]
+        file_name_errors = self.file_name_errors(tool_info.get("file_name"))
+        if file_name_errors:
+            return file_name_errors
+
+        env = {name: value for name, value in os.environ.items()
+               if not any(marker in name.upper() for marker in SECRET_ENV_MARKERS)}
+        with tempfile.TemporaryDirectory(prefix="gyanova_tool_") as sandbox:
+            path = os.path.join(sandbox, tool_info["file_name"])
+            with open(path, "w") as file:
+                file.write(code)
+            try:
+                probe = subprocess.run(
+                    [sys.executable, "-c", VALIDATION_PROBE, path, function_name],
+                    cwd=sandbox, env=env, capture_output=True, text=True, timeout=VALIDATION_TIMEOUT_S
+                )
+            except subprocess.TimeoutExpired:
+                return [f"Importing the module took longer than {VALIDATION_TIMEOUT_S}s"]
+        if probe.returncode != 0:
+            error_lines = (probe.stderr or probe.stdout).strip().splitlines()
+            return [f"Module failed to compile or import: {error_lines[-1] if error_lines else probe.returncode}"]
+
+        signature = json.loads(probe.stdout.strip().splitlines()[-1])
+        problems = []
+        for name in parameters:
+            if name not in signature["parameters"] and not signature["var_keyword"]:
+                problems.append(f"Declared parameter '{name}' is not accepted by {function_name}()")
+        for name in signature["required"]:
+            if name not in parameters:
+                problems.append(f"{function_name}() requires '{name}', which is not a declared parameter")
+            elif "(optional)" in str(parameters[name]).lower():
+                problems.append(f"Parameter '{name}' is declared optional but has no default in {function_name}()")
+        return problems
+
+    def generate_tool(self, user_query):
+        """
+        Generate, parse and validate one tool; nothing is written to the project.
+
+        With the generation cache, a request for something a registered tool already
+        does comes back with "existing" set to that tool, and a repeated request reuses
+        the definition generated before instead of calling the LLM again.
+        """
+        if self.cache is not None:
+            existing = self.cache.find_existing(user_query)
+            if existing is not None:
+                tool_name, similarity = existing
+                return {"tool_name": tool_name, "query": user_query, "existing": tool_name,
+                        "similarity": similarity, "errors": []}
+            fingerprint = registry_fingerprint()
+            cached = self.cache.lookup(user_query, fingerprint)
+            if cached is not None:
+                # The file may have been taken since the definition was generated
+                return {**cached, "query": user_query, "cached": True,
+                        "errors": self.file_name_errors(cached.get("file_name"))}
+
+        agent_description = self.generate_agent_definition(user_query)
+        tool_info = self.parse_tool_definition(agent_description)
+        tool_info["query"] = user_query
+        tool_info["agent_description"] = agent_description
+        tool_info["errors"] = self.validate_tool(tool_info)
+        if self.cache is not None and not tool_info["errors"]:
+            tool_info["cache_key"] = self.cache.store(user_query, fingerprint, tool_info)
+        return tool_info
+
+    def duplicate_of(self, tool_info):
+        """Name of the registered tool a generated definition would duplicate, or None"""
+        registered = {tool["name"] for tool in AVAILABLE_TOOLS}
+        for name in (tool_info.get("tool_name"), tool_info.get("function_name")):
+            if name in registered:
+                return name
+        return None
+
+    def manifest_entry(self, tool_info):
+        """Tool manifest entry for a generated tool (see core/tool_manifest.py)"""
         return {
-            "tool_name": tool_name,
-            "file_path": file_path,
-            "function_name": function_name,
-            "description": description
+            "name": tool_info["tool_name"],
+            "module": f"tools.{os.path.splitext(tool_info['file_name'])[0]}",
+            "function": tool_info.get("function_name", tool_info["tool_name"]),
+            "description": tool_info.get("description", ""),
+            "parameters": tool_info.get("parameters", {}),
         }
 
+    def hot_register(self, entry):
+        """Import an installed tool and add it to the running registry, so no restart is needed"""
+        function = import_tool(entry, reload=entry["module"] in sys.modules)
+        register_tool(entry["name"], function, entry["description"], entry["parameters"], entry.get("policy"))
+
+    def install_tools(self, tool_infos, register=True):
+        """
+        Write validated tools into the tools package, add them to the tool manifest
+        in a single write, and register them live.
+
+        Returns:
+            list: One result per tool, in order
+        """
+        entries = []
+        for tool_info in tool_infos:
+            file_path = os.path.join(self.tools_dir, tool_info["file_name"])
+            self.write_file_content(file_path, tool_info.get("code", ""))
+            entries.append(self.manifest_entry(tool_info))
+        self.manifest.add(entries)
+        logger.info("Updated: %s", self.manifest.path)
+
+        results = []
+        for entry in entries:
+            result = {
+                "tool_name": entry["name"],
+                "file_path": os.path.join(self.project_root, *entry["module"].split(".")) + ".py",
+                "function_name": entry["function"],
+                "description": entry["description"],
+                "registered": False
+            }
+            if register:
+                try:
+                    self.hot_register(entry)
+                    result["registered"] = True
+                except Exception as e:
+                    # The tool is in the manifest; it becomes available after a restart
+                    logger.warning("Could not register %s in the running process: %s: %s", entry["name"], type(e).__name__, e)
+                    result["error"] = f"{type(e).__name__}: {e}"
+            results.append(result)
+        return results
+
+    def install_tool(self, tool_info, register=True):
+        """Write one validated tool into the tools package and the manifest, and register it live"""
+        return self.install_tools([tool_info], register)[0]
+        
+    def create_agent(self, user_query, register=True):
+        """
+        Main function to create a new agent based on user query.
+
+        Returns:
+            dict: The result, with "status" "created", "rejected", "existing" or "duplicate"
+                  (see create_agents)
+        """
+        logger.info("Generating agent for: '%s'", user_query)
+        
+        # Generate agent definition using Groq (or reuse a cached one) and validate it in a subprocess
+        tool_info = self.generate_tool(user_query)
+        if tool_info.get("existing"):
+            logger.info("The existing tool %s already does this (similarity %.2f); nothing generated",
+                        tool_info["existing"], tool_info["similarity"])
+            return {"tool_name": tool_info["existing"], "query": user_query, "status": "existing"}
+        if tool_info.get("cached"):
+            logger.info("Reusing the cached definition of this request")
+        logger.debug("Agent description generated:\n%s", tool_info["agent_description"])
+
+        duplicate = self.duplicate_of(tool_info)
+        if duplicate:
+            logger.info("Duplicate generation: %s is already registered; AVAILABLE_TOOLS left unchanged", duplicate)
+            return {"tool_name": duplicate, "query": user_query, "status": "duplicate",
+                    "reason": f"{duplicate} is already registered"}
+
+        if tool_info["errors"]:
+            logger.warning("Rejected %s ('%s'): %s", tool_info["tool_name"], user_query, "; ".join(tool_info["errors"]))
+            return {"tool_name": tool_info["tool_name"], "query": user_query, "status": "rejected",
+                    "errors": tool_info["errors"]}
+        
+        result = self.install_tool(tool_info, register)
+        self._mark_installed(tool_info)
+        logger.info("Created %s ('%s')%s", result["tool_name"], user_query,
+                    " from the generation cache" if tool_info.get("cached") else "")
+        return {**result, "query": user_query, "status": "created"}
+
+    def _mark_installed(self, tool_info):
+        if self.cache is not None and tool_info.get("cache_key"):
+            self.cache.mark_installed(tool_info["cache_key"])
+
+    def create_agents(self, user_queries, max_workers=GENERATOR_WORKERS, register=True):
+        """
+        Batch mode: generate and validate one tool per query concurrently, then install
+        all accepted tools with a single manifest write.
+
+        Args:
+            user_queries (list): Natural language descriptions, one tool each
+            max_workers (int): Tools generated at the same time
+            register (bool): Also register accepted tools in the running process
+
+        Returns:
+            list: One result per query, in order, with "status" "created", "rejected",
+                  "existing" (a registered tool already does it) or "duplicate"
+                  (the generated tool is already registered, or was created earlier in the batch)
+        """
+        # Requests that normalize to the same text are generated once
+        unique = {}
+        for user_query in user_queries:
+            unique.setdefault(normalize_request(user_query), user_query)
+        logger.info("Generating %d agents with %d workers", len(unique), max_workers)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as pool:
+            generated = dict(zip(unique, pool.map(self.generate_tool, unique.values())))
+
+        results = []
+        installed = set()
+        file_names = set()
+        accepted = []
+        for user_query in user_queries:
+            normalized = normalize_request(user_query)
+            tool_info = generated[normalized]
+            tool_name = tool_info["tool_name"]
+            if tool_info.get("existing"):
+                logger.info("'%s' is already provided by %s", user_query, tool_name)
+                results.append({"tool_name": tool_name, "query": user_query, "status": "existing"})
+                continue
+            duplicate = self.duplicate_of(tool_info)
+            if duplicate or tool_name in installed:
+                if tool_name in installed and unique[normalized] != user_query:
+                    reason = f"same request as '{unique[normalized]}'"
+                elif tool_name in installed:
+                    reason = f"another request in this batch already generated {tool_name}"
+                else:
+                    reason = f"{duplicate} is already registered"
+                logger.info("Duplicate generation for '%s': %s", user_query, reason)
+                results.append({"tool_name": duplicate or tool_name, "query": user_query,
+                                "status": "duplicate", "reason": reason})
+                continue
+            errors = list(tool_info["errors"])
+            if not errors and tool_info["file_name"] in file_names:
+                errors.append(f"Another tool in this batch is written to {tool_info['file_name']}")
+            if errors:
+                logger.warning("Rejected %s ('%s'): %s", tool_name, user_query, "; ".join(errors))
+                results.append({"tool_name": tool_name, "query": user_query,
+                                "status": "rejected", "errors": errors})
+                continue
+            installed.add(tool_name)
+            file_names.add(tool_info["file_name"])
+            accepted.append((len(results), user_query, tool_info))
+            results.append(None)
+
+        installs = self.install_tools([tool_info for _, _, tool_info in accepted], register) if accepted else []
+        for (position, user_query, tool_info), result in zip(accepted, installs):
+            self._mark_installed(tool_info)
+            logger.info("Created %s ('%s')%s", result["tool_name"], user_query,
+                        " from the generation cache" if tool_info.get("cached") else "")
+            results[position] = {**result, "query": user_query, "status": "created"}
+        return results
+
+def print_result(result):
+    """Report the outcome of one request to the command line user"""
+    tool_name = result["tool_name"]
+    if result["status"] == "created":
+        print(f"Created {tool_name} for '{result['query']}': {result['file_path']}")
+    elif result["status"] == "existing":
+        print(f"'{result['query']}' is already done by the existing tool {tool_name}; nothing generated")
+    elif result["status"] == "duplicate":
+        print(f"'{result['query']}' duplicates {tool_name}: {result['reason']}")
+    else:
+        # The reasons are logged as a warning when the tool is rejected
+        print(f"Rejected {tool_name} for '{result['query']}' ({len(result['errors'])} problem(s) found)")
+
 def main():
     """Command line interface for the Agent Generator"""
     parser = argparse.ArgumentParser(description="Generate a new agent for Gyanova")
     parser.add_argument("query", nargs="+", help="Natural language description of what the agent should do")
+    parser.add_argument("--batch", action="store_true",
+                        help="Treat each argument as a separate tool request and generate them concurrently")
+    parser.add_argument("--workers", type=int, default=GENERATOR_WORKERS,
+                        help=f"Tools generated at the same time in batch mode (default: {GENERATOR_WORKERS})")
     args = parser.parse_args()
     
-    # Combine all arguments into a single query
-    user_query = " ".join(args.query)
-    
     # Create and use the agent generator
     generator = AgentGenerator()
-    generator.create_agent(user_query)
+    if args.batch:
+        results = generator.create_agents(args.query, max_workers=args.workers)
+    else:
+        # Combine all arguments into a single query
+        results = [generator.create_agent(" ".join(args.query))]
+    for result in results:
+        print_result(result)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,7 @@
 # Import main components to make them accessible from the core package
-from .agent import process_user_query
-from .config import AVAILABLE_TOOLS, tools, available_functions
+from .agent import process_user_query, process_user_queries, resume_query
+from .config import AVAILABLE_TOOLS, tools, available_functions, TOOL_POLICIES
 
 # Export main components
-__all__ = ['process_user_query', 'AVAILABLE_TOOLS', 'tools', 'available_functions']
+__all__ = ['process_user_query', 'process_user_queries', 'resume_query', 'AVAILABLE_TOOLS', 'tools', 'available_functions', 'TOOL_POLICIES']
 #done
\ No newline at end of file
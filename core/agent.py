@@ -1,26 +1,119 @@
 import os
 import json
 import re
-from groq import Groq
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from core.config import AVAILABLE_TOOLS, tools, available_functions
+from core.config import AVAILABLE_TOOLS, tools, available_functions, TOOL_POLICIES
+from core import telemetry, llm, progress
+from core.memo import request_memo, batch_scope, is_cacheable
+from core.answer_cache import ANSWER_CACHE, answer_cache
+from core.checkpoint import CheckpointMismatch, QueryCheckpoint, checkpoint_id, get_checkpoint_store, completed_result
+from core.compaction import compact_tool_messages, estimate_tokens, to_prompt_text
+from core.context import ConversationContext, dependency_context
+from core.speculation import Speculation
+from core.plan_stream import IncrementalTaskParser
+from core.plan_parser import PlanParseError, extract_json, parse_plan, tool_schemas, validate_task
+from core.deadline import (QUERY_DEADLINE_S, DeadlineExceeded, QueryCancelled, ToolTimeout, current_deadline,
+                           deadline_scope, record_cancelled)
+from core.executor import execute_task_graph, task_dependencies, MAX_WORKERS
+from core.tool_processes import get_tool_process_pool, uses_process_backend
+from core.log import get_logger, preview
 
 # Load environment variables
 load_dotenv()
 #done
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-model = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+logger = get_logger("agent")
 
-def process_user_query(user_query):
-    # Step 1: Ask the model to analyze the query and break it down into subtasks
+# Stream the planner response and start tasks as soon as each one is parsed
+PLANNER_STREAMING = os.getenv("PLANNER_STREAMING", "true").lower() in ["true", "1", "yes"]
+
+# Number of queries planned together in one LLM call by process_user_queries
+BATCH_PLANNING_SIZE = int(os.getenv("BATCH_PLANNING_SIZE", "10"))
+BATCH_PLANNING_MAX_TOKENS = int(os.getenv("BATCH_PLANNING_MAX_TOKENS", "8192"))
+
+# Upper bound for the context rewrite's completion cap, which grows with the results it copies
+CONTEXT_REWRITE_MAX_TOKENS_CEILING = int(os.getenv("CONTEXT_REWRITE_MAX_TOKENS_CEILING", "4096"))
+
+# Seconds an LLM call may take (planning and context rewriting are also capped by the query deadline)
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+
+# Timeout for tools without a "timeout" entry in TOOL_POLICIES
+DEFAULT_TOOL_TIMEOUT_S = float(os.getenv("DEFAULT_TOOL_TIMEOUT_S", "30"))
+
+# Threads that run the actual tool calls so the executor can stop waiting on a hung upstream
+_tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_POOL_SIZE", "32")))
+
+def _llm_timeout(bounded):
+    """Per-call LLM timeout, capped by the query deadline when bounded"""
+    if not bounded:
+        return LLM_TIMEOUT_S
+    timeout = current_deadline().budget(LLM_TIMEOUT_S)
+    if timeout <= 0:
+        current_deadline().check()
+    return timeout
+
+def _llm_deadline(bounded):
+    """The deadline an LLM call observes; unbounded calls (synthesis) can still be cancelled"""
+    return current_deadline() if bounded else current_deadline().without_expiry()
+
+def _chat_completion(stage, messages, bounded=True, **kwargs):
+    """Call the stage's configured model through the shared LLM client pool"""
+    deadline = _llm_deadline(bounded)
+    return llm.chat_completion(stage, messages, timeout=_llm_timeout(bounded), deadline=deadline, **kwargs)
+
+def _chat_completion_stream(stage, messages, bounded=True, **kwargs):
+    """Stream the stage's configured model through the shared LLM client pool, yielding content deltas"""
+    deadline = _llm_deadline(bounded)
+    yield from llm.chat_completion_stream(stage, messages, timeout=_llm_timeout(bounded), deadline=deadline, **kwargs)
+
+def _call_with_timeout(tool_name, function_to_call, parameters):
+    """
+    Run a tool on its backend and stop waiting once its timeout budget is spent or the query is cancelled.
+    Tools whose policy sets "backend": "process" run in the tool worker processes, everything else on the tool pool.
+    """
+    deadline = current_deadline()
+    policy = TOOL_POLICIES.get(tool_name, {})
+    timeout = deadline.budget(policy.get("timeout", DEFAULT_TOOL_TIMEOUT_S))
+    if timeout <= 0:
+        deadline.check()
+    started = time.perf_counter()
+    if uses_process_backend(policy):
+        future = get_tool_process_pool().submit(function_to_call, parameters, time_limit=timeout)
+    else:
+        future = _tool_pool.submit(contextvars.copy_context().run, function_to_call, **parameters)
+    wait([future, deadline.cancellation], timeout=timeout, return_when=FIRST_COMPLETED)
+    if future.done():
+        return future.result()
+    
+    # A call that already started cannot be killed; it finishes in the background, bounded by
+    # the tool's own socket timeouts (or the worker's time limit), and its result is dropped
+    future.cancel()
+    if deadline.cancelled:
+        record_cancelled("tool_calls_abandoned", time.perf_counter() - started)
+        raise QueryCancelled(deadline.reason)
+    raise ToolTimeout(f"{tool_name} did not finish within {timeout:.1f}s")
+
+def _run_tool(tool_name, parameters, queued_at=None, memo=None):
+    """Execute a tool function inside a telemetry span, reusing memoized results when allowed"""
+    with telemetry.span(f"tool.{tool_name}", telemetry.STAGE_TOOL, queued_at=queued_at, tool_name=tool_name) as span:
+        function_to_call = available_functions[tool_name]
+        if memo is not None:
+            tool_result, cache_hit = memo.call(
+                tool_name, parameters, lambda: _call_with_timeout(tool_name, function_to_call, parameters)
+            )
+        else:
+            tool_result, cache_hit = _call_with_timeout(tool_name, function_to_call, parameters), False
+        span.set(cache_hit=cache_hit)
+        span.record_payload(parameters, tool_result)
+    return tool_result
+
+def _tools_prompt():
+    """Shared planner instructions listing the exact tools available"""
     # Provide the exact list of available tools to prevent hallucination
     tools_description = json.dumps(AVAILABLE_TOOLS, indent=2)
-    
-    planning_messages = [
-        {"role": "system", "content": f"""You are a helpful assistant that breaks down complex queries into separate tasks. 
-        
-These are the ONLY tools available to you:
+    return f"""These are the ONLY tools available to you:
 {tools_description}
 
 For each task, you MUST specify a tool_name that EXACTLY matches one of the available tool names listed above.
@@ -34,86 +127,120 @@ Example:
   {{"tool_name": "send_email", "parameters": {{"to": "example@example.com", "subject": "Weather Report"}}, "requires": [0]}}
 ]
 
-DO NOT invent or hallucinate tool names that aren't in the list."""},
+DO NOT invent or hallucinate tool names that aren't in the list."""
+
+def _parse_tasks(task_breakdown):
+    """Extract the raw task list from the planner response (an empty plan if there is none)"""
+    try:
+        # Tolerates code fences, explanations, trailing commas and a response cut off mid-array
+        return parse_plan(task_breakdown)
+    except PlanParseError as e:
+        # Answering without tools costs nothing extra; a blind web search rarely helped
+        logger.warning("Failed to parse tasks as JSON: %s. Answering without tools.", e)
+        return []
+
+def _validate_task_stream(tasks):
+    """
+    Yield only tasks that fit the schema of a registered tool, repairing common planner
+    mistakes locally, and renumber "requires" to the kept tasks
+    """
+    schemas = tool_schemas(tools)
+    kept_index = {}  # Planner index -> index among valid tasks
+    for n, planned in enumerate(tasks):
+        task, notes = validate_task(planned, schemas)
+        if task is None:
+            logger.warning("%s. Skipping this task.", "; ".join(notes))
+            continue
+        if notes:
+            logger.info("Repaired task %d: %s", n+1, "; ".join(notes))
+        if "requires" in task:
+            task["requires"] = [kept_index[r] for r in task_dependencies(n, task) if r in kept_index]
+        kept_index[n] = len(kept_index)
+        yield task
+
+def _validate_tasks(tasks):
+    """Keep only tasks whose tool_name is a registered tool"""
+    return list(_validate_task_stream(tasks))
+
+def _planning_messages(user_query):
+    return [
+        {"role": "system", "content": f"""You are a helpful assistant that breaks down complex queries into separate tasks. 
+        
+{_tools_prompt()}"""},
         {"role": "user", "content": f"Break down this query into separate subtasks: '{user_query}'"}
     ]
-    
+
+def _plan(user_query):
+    """Step 1: Ask the model to analyze the query and break it down into subtasks"""
     # Get task breakdown from the model
-    planning_response = client.chat.completions.create(
-        model=model, 
-        messages=planning_messages,
-        max_completion_tokens=4096
-    )
+    planning_response = _chat_completion(telemetry.STAGE_PLANNING, _planning_messages(user_query))
     
     # Extract and parse the tasks
     task_breakdown = planning_response.choices[0].message.content
-    print("\n--- Task Breakdown ---")
-    print(task_breakdown)
+    logger.debug("Task breakdown:\n%s", task_breakdown)
     
-    # Try to parse the JSON tasks from the model's response
-    try:
-        # The model might wrap the JSON in markdown code blocks or add explanations
-        # Let's try to extract just the JSON part
-        json_match = re.search(r'\[.*\]', task_breakdown, re.DOTALL)
-        if json_match:
-            tasks = json.loads(json_match.group(0))
-        else:
-            # If no array is found, maybe it's a direct JSON object
-            json_match = re.search(r'\{.*\}', task_breakdown, re.DOTALL)
-            if json_match:
-                tasks = json.loads(json_match.group(0))
-                if not isinstance(tasks, list):
-                    tasks = [tasks]
-            else:
-                raise ValueError("No valid JSON found in the response")
-    except (json.JSONDecodeError, ValueError) as e:
-        print(f"Failed to parse tasks as JSON: {e}. Using a simplified approach.")
-        # Fallback: Create a simple web search task based on the query
-        tasks = [{"tool_name": "web_search", "parameters": {"query": user_query}}]
-    
-    # Validate that we only have valid tool names
-    valid_tasks = []
-    for task in tasks:
-        if task["tool_name"] in available_functions:
-            valid_tasks.append(task)
-        else:
-            print(f"Invalid tool name: {task['tool_name']}. Skipping this task.")
+    return _validate_tasks(_parse_tasks(task_breakdown))
+
+def _plan_stream(user_query, plan):
+    """
+    Step 1 (streaming): yield validated tasks as soon as the planner has written each one.
     
-    tasks = valid_tasks
+    Every yielded task is also appended to plan["tasks"], and plan["ready_at"] is set once
+    the planner response is complete.
+    """
+    parser = IncrementalTaskParser()
     
-    # Initialize conversation for the final response
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant that responds to user queries by sequentially executing appropriate tools and providing a comprehensive final answer."},
-        {"role": "user", "content": user_query}
-    ]
+    def streamed_tasks():
+        for delta in _chat_completion_stream(telemetry.STAGE_PLANNING, _planning_messages(user_query)):
+            yield from parser.feed(delta)
     
-    # Step 2: Execute each task sequentially and collect results
-    print("\n--- Executing Tasks Sequentially ---")
-    all_results = []
-    task_results_by_index = {}  # Store results by task index for context sharing
+    for task in _validate_task_stream(streamed_tasks()):
+        plan["tasks"].append(task)
+        yield task
+    plan["ready_at"] = time.perf_counter()
     
-    for i, task in enumerate(tasks):
-        tool_name = task["tool_name"]
-        parameters = task["parameters"].copy()  # Create a copy to modify if needed
-        
-        # Check if this task requires data from previous tasks
-        if "requires" in task:
-            context_data = {}
-            for req_idx in task["requires"]:
-                if req_idx < i and req_idx in task_results_by_index:  # Ensure the required task has been processed
-                    context_data[f"task_{req_idx+1}_result"] = task_results_by_index[req_idx]
-            
-            # If we have context data, we need to prepare it for the current task
-            if context_data:
-                print(f"Task {i+1} requires data from previous tasks: {task['requires']}")
-                
-                # Set up model to process the context and update parameters
-                context_prompt = [
-    {"role": "system", "content": f"""You are a helpful assistant that processes task results and updates parameters for the next task.
-
-Previous task results: {json.dumps(context_data, indent=2)}
-
-Current task: {json.dumps(task, indent=2)}
+    logger.debug("Task breakdown:\n%s", parser.text)
+    
+    if not parser.tasks:
+        # No task array was streamed; parse the full response the non-streaming way
+        for task in _validate_tasks(_parse_tasks(parser.text)):
+            plan["tasks"].append(task)
+            yield task
+
+def _rewrite_token_cap(context_data, task):
+    """
+    Completion cap for a context rewrite. The rewritten parameters may hold the full text of
+    earlier results, so the cap follows their estimated size (doubled for JSON escaping and
+    non-Latin scripts), never below the stage's configured cap
+    """
+    needed = 2 * (estimate_tokens(to_prompt_text(context_data)) + estimate_tokens(json.dumps(task, ensure_ascii=False)))
+    floor = llm.stage_config(telemetry.STAGE_CONTEXT)["max_completion_tokens"]
+    return max(floor, min(needed, CONTEXT_REWRITE_MAX_TOKENS_CEILING))
+
+def _prepare_parameters(i, task, task_results_by_index):
+    """Rewrite a task's parameters using the results of the tasks it requires"""
+    parameters = task["parameters"].copy()  # Create a copy to modify if needed
+    
+    # Check if this task requires data from previous tasks
+    if "requires" not in task:
+        return parameters
+    
+    # Only the required results, compacted and capped to the rewrite token budget
+    context_data = dependency_context(i, task, task_results_by_index)
+    
+    # If we have context data, we need to prepare it for the current task
+    if not context_data:
+        return parameters
+    
+    logger.debug("Task %d requires data from previous tasks: %s", i+1, task["requires"])
+    
+    # Set up model to process the context and update parameters
+    context_prompt = [
+        {"role": "system", "content": f"""You are a helpful assistant that processes task results and updates parameters for the next task.
+
+Previous task results: {json.dumps(context_data, ensure_ascii=False)}
+
+Current task: {json.dumps(task)}
 
 IMPORTANT: If this task needs to use text content from a previous task result, extract the FULL TEXT CONTENT from the previous result and use it directly.
 DO NOT just refer to "the result from task X" - use the actual content.
@@ -122,78 +249,374 @@ For translation tasks: use the full text content as the 'text' parameter.
 For email tasks: use the full translated content as the 'body' parameter.
 
 Return only a JSON object with the updated parameters. Do not include any explanations."""},
-]
-                
-                context_response = client.chat.completions.create(
-                    model=model,
-                    messages=context_prompt,
-                    max_completion_tokens=4096
-                )
-                
-                try:
-                    updated_params_text = context_response.choices[0].message.content
-                    # Extract JSON from the response
-                    json_match = re.search(r'\{.*\}', updated_params_text, re.DOTALL)
-                    if json_match:
-                        updated_params = json.loads(json_match.group(0))
-                        parameters.update(updated_params)
-                        print(f"Updated parameters based on previous task results: {parameters}")
-                    else:
-                        # If no JSON is found, try to use the context directly
-                        parameters["context"] = context_data
-                        print("Added raw context data to parameters")
-                except Exception as e:
-                    print(f"Error updating parameters with context: {str(e)}")
-                    # Fallback: Add context as a separate parameter
-                    parameters["context"] = context_data
+    ]
+    
+    context_response = _chat_completion(telemetry.STAGE_CONTEXT, context_prompt,
+                                        max_completion_tokens=_rewrite_token_cap(context_data, task))
+    
+    try:
+        updated_params_text = context_response.choices[0].message.content
+        # Extract JSON from the response
+        try:
+            updated_params = extract_json(updated_params_text, "{")
+        except PlanParseError:
+            updated_params = None
+        if isinstance(updated_params, dict):
+            parameters.update(updated_params)
+            logger.debug("Task %d: updated parameters based on previous task results: %s", i+1, preview(parameters, 200))
+        else:
+            # If no JSON is found, try to use the context directly
+            parameters["context"] = context_data
+            logger.debug("Task %d: added raw context data to parameters", i+1)
+    except Exception as e:
+        logger.warning("Task %d: error updating parameters with context: %s", i+1, e)
+        # Fallback: Add context as a separate parameter
+        parameters["context"] = context_data
+    
+    return parameters
+
+def _execute_task(i, task, task_results_by_index, ready_at, memo, checkpoint=None):
+    """
+    Step 2 for one task: resolve its parameters, run the tool and return the structured result.
+    
+    Failures never escape: a tool error, timeout or exceeded deadline is reported in the
+    result's "status", and tasks whose requirements did not succeed are skipped or run
+    degraded according to their tool's "on_dependency_failure" policy. With a checkpoint,
+    side-effecting tools run at most once per query and task (see CheckpointStore.call_once).
+    """
+    tool_name = task["tool_name"]
+    parameters = task["parameters"]
+    
+    failed = [r for r in task_dependencies(i, task) if task_results_by_index.get(r, {}).get("status") != "ok"]
+    if failed and TOOL_POLICIES.get(tool_name, {}).get("on_dependency_failure", "skip") == "skip":
+        message = f"Skipped because required task(s) {[r+1 for r in failed]} did not succeed"
+        logger.info("Task %d: %s", i+1, message)
+        return _task_result(i, tool_name, parameters, {"status": "skipped", "error": message}, "skipped")
+    
+    try:
+        current_deadline().check()
+        parameters = _prepare_parameters(i, task, task_results_by_index)
         
-        print(f"Task {i+1}: Executing {tool_name} with parameters {parameters}")
+        logger.info("Task %d: executing %s", i+1, tool_name)
+        logger.debug("Task %d parameters: %s", i+1, preview(parameters, 200))
+        progress.emit(progress.TASK_STARTED, task_number=i+1, tool_name=tool_name, parameters=parameters)
         
         # Execute the tool function
-        function_to_call = available_functions[tool_name]
-        tool_result = function_to_call(**parameters)
+        if checkpoint is not None and not is_cacheable(tool_name):
+            tool_result = checkpoint.call_once(
+                i, tool_name, lambda: _run_tool(tool_name, parameters, queued_at=ready_at, memo=memo)
+            )
+        else:
+            tool_result = _run_tool(tool_name, parameters, queued_at=ready_at, memo=memo)
+    except QueryCancelled as e:
+        record_cancelled("tasks_cancelled")
+        logger.info("Task %d: %s cancelled: %s", i+1, tool_name, e)
+        return _task_result(i, tool_name, parameters, {"status": "cancelled", "error": str(e)}, "cancelled")
+    except (ToolTimeout, DeadlineExceeded) as e:
+        logger.warning("Task %d: %s timed out: %s", i+1, tool_name, e)
+        return _task_result(i, tool_name, parameters, {"status": "timeout", "error": str(e)}, "timeout")
+    except Exception as e:
+        logger.warning("Task %d: %s failed: %s", i+1, tool_name, e)
+        return _task_result(i, tool_name, parameters, {"status": "error", "error": str(e)}, "error")
+    
+    logger.debug("Task %d result: %s", i+1, preview(tool_result))
+    
+    return _task_result(i, tool_name, parameters, tool_result)
+
+def _task_result(i, tool_name, parameters, result, status="ok"):
+    progress.emit(progress.TASK_FINISHED, task_number=i+1, tool_name=tool_name, status=status)
+    return {
+        "task_number": i+1,
+        "tool_name": tool_name,
+        "parameters": parameters,
+        "result": result,
+        "status": status
+    }
+
+def _synthesize(user_query, all_results, stream=False):
+    """
+    Step 3: Generate the final comprehensive response from the tool results.
+    
+    With stream=True the answer is streamed and every piece is reported as an
+    ANSWER_DELTA progress event as it arrives (used by the voice pipeline).
+    """
+    # Build the conversation within its token budget, summarizing older tool outputs if needed
+    context = ConversationContext(user_query)
+    for task_result in all_results:
+        context.add(task_result)
+    
+    # Trim tool results to the synthesis token budget and log what compaction saved
+    with telemetry.span(telemetry.STAGE_COMPACTION, telemetry.STAGE_COMPACTION) as span:
+        messages, savings = compact_tool_messages(context.messages(), [r["result"] for r in all_results],
+                                                  budget_tokens=context.budget_tokens)
+        span.set(**savings, **context.stats)
+    if savings["tokens_saved"]:
+        logger.debug("Compacted synthesis prompt: ~%d -> ~%d tokens", savings["tokens_before"], savings["tokens_after"])
+    
+    # The answer is still produced after the deadline, explaining any tasks that timed out
+    if stream:
+        answer = []
+        for delta in _chat_completion_stream(telemetry.STAGE_SYNTHESIS, messages, bounded=False):
+            answer.append(delta)
+            progress.emit(progress.ANSWER_DELTA, text=delta)
+        return "".join(answer)
+    final_response = _chat_completion(telemetry.STAGE_SYNTHESIS, messages, bounded=False)
+    return final_response.choices[0].message.content
+
+def process_user_query(user_query, deadline_s=QUERY_DEADLINE_S, use_cache=ANSWER_CACHE, deadline=None, query_id=None,
+                       tenant=None):
+    """
+    Plan, execute and answer a single user query.
+    
+    Args:
+        user_query (str): The user's query
+        deadline_s (float): Seconds allowed for planning and tool execution; tasks still
+                            pending after that are reported as timed out
+        use_cache (bool): Serve recent answers to the same or a near-duplicate query
+                          from the answer cache, and cache this answer if it is cacheable
+        deadline (Deadline, optional): Deadline to use instead of a new one of deadline_s;
+                                       calling its cancel() from another thread aborts the query
+        query_id (str, optional): Checkpoint the plan and every task result under this ID.
+                                  Calling again with the same ID resumes at the first incomplete
+                                  task, and side-effecting tools are never repeated
+        tenant (str, optional): Tenant the query ID belongs to; checkpoints of other tenants
+                                are never read, even under the same query ID
+        
+    Returns:
+        Tuple[List[Dict], str]: Structured result of every task and the final answer
+        
+    Raises:
+        QueryCancelled: If the deadline was cancelled before the answer was complete
+        CheckpointMismatch: If query_id was already used for a different query
+    """
+    started = time.perf_counter()
+    with telemetry.start_trace(telemetry.STAGE_QUERY), deadline_scope(deadline_s, deadline):
+        try:
+            checkpoint, saved = _open_checkpoint(query_id, user_query, tenant)
+            if saved is not None and saved["status"] == "done":
+                logger.info("Query %s already answered; returning the saved answer", query_id)
+                return [saved["results"][i] for i in sorted(saved["results"])], saved["final_answer"]
+            if use_cache and saved is None:
+                cached = _cached_answer(user_query)
+                if cached is not None:
+                    if checkpoint is not None:
+                        checkpoint.finish(cached[1])
+                    return cached
+            all_results, final_answer = _process_user_query(user_query, checkpoint, saved)
+        except QueryCancelled as e:
+            record_cancelled("queries_cancelled", time.perf_counter() - started)
+            logger.info("Query cancelled: %s", e)
+            raise
+        if use_cache:
+            answer_cache.store(user_query, all_results, final_answer)
+        return all_results, final_answer
+
+def resume_query(query_id, tenant=None, **kwargs):
+    """Resume a checkpointed query by its ID, e.g. after the process died halfway through its plan"""
+    saved = get_checkpoint_store().load(checkpoint_id(query_id, tenant))
+    if saved is None:
+        raise KeyError(f"No checkpoint for query {query_id}")
+    return process_user_query(saved["user_query"], query_id=query_id, tenant=tenant, **kwargs)
+
+def _open_checkpoint(query_id, user_query, tenant=None):
+    """Return the query's checkpoint and its saved state (None if there is nothing to resume)"""
+    if query_id is None:
+        return None, None
+    store = get_checkpoint_store()
+    query_id = checkpoint_id(query_id, tenant)
+    saved = store.load(query_id)
+    if saved is not None and saved["user_query"] != user_query:
+        raise CheckpointMismatch("Query ID already used for a different query; choose a new query_id")
+    if saved is not None and saved["status"] != "done":
+        if not saved["plan_complete"]:
+            # The plan was cut off while streaming; plan again (side effects stay idempotent)
+            store.reset_plan(query_id)
+            saved = None
+        else:
+            done = [i for i in range(len(saved["tasks"])) if completed_result(saved, i) is not None]
+            logger.info("Resuming query %s: %d of %d tasks already completed", query_id, len(done), len(saved["tasks"]))
+    store.start(query_id, user_query)
+    return QueryCheckpoint(store, query_id), saved
+
+def _checkpointed_tasks(tasks, checkpoint):
+    """Save each planned task as it arrives, and mark the plan complete at the end"""
+    for i, task in enumerate(tasks):
+        checkpoint.save_task(i, task)
+        yield task
+    checkpoint.plan_complete()
+
+def _cached_answer(user_query):
+    """Look the query up in the answer cache inside a telemetry span"""
+    with telemetry.span(telemetry.STAGE_ANSWER_CACHE, telemetry.STAGE_ANSWER_CACHE) as span:
+        cached = answer_cache.lookup(user_query)
+        span.set(cache_hit=cached is not None)
+    if cached is not None:
+        logger.info("Answered from cache")
+    return cached
+
+def _process_user_query(user_query, checkpoint=None, saved=None):
+    memo = request_memo()  # Deduplicates identical side-effect-free calls, batch-wide inside batch_scope()
+    
+    def run(i, task, results, ready_at):
+        # A task completed by an earlier run of a resumed query is not run again
+        result = completed_result(saved, i)
+        if result is None:
+            result = _execute_task(i, task, results, ready_at, memo, checkpoint)
+            if checkpoint is not None:
+                checkpoint.save_result(i, result)
+        return result
+    
+    # Step 2: Execute tasks as soon as their dependencies are done and collect results
+    if saved is not None:
+        # Resuming: the whole plan was checkpointed, so planning is skipped
+        tasks = saved["tasks"]
+        logger.debug("Executing the remaining tasks")
+        task_results_by_index = execute_task_graph(tasks, run)
+    elif PLANNER_STREAMING:
+        # Start likely side-effect-free tools while the planner runs; matching tasks pick them up from the memo
+        speculation = Speculation(memo).start(user_query, available_functions, _call_with_timeout)
+        # Tasks start while the planner is still writing the rest of the plan
+        plan = {"tasks": [], "ready_at": None}
+        planned = _plan_stream(user_query, plan)
+        if checkpoint is not None:
+            planned = _checkpointed_tasks(planned, checkpoint)
+        task_results_by_index = execute_task_graph(planned, run)
+        tasks = plan["tasks"]
+        speculation.settle(tasks, plan["ready_at"] or time.perf_counter())
+    else:
+        speculation = Speculation(memo).start(user_query, available_functions, _call_with_timeout)
+        tasks = _plan(user_query)
+        speculation.settle(tasks, time.perf_counter())
+        if checkpoint is not None:
+            tasks = list(_checkpointed_tasks(tasks, checkpoint))
+        logger.debug("Executing %d tasks", len(tasks))
+        task_results_by_index = execute_task_graph(tasks, run)
+    all_results = [task_results_by_index[i] for i in range(len(tasks))]
+    
+    # Unlike an expired deadline, a cancelled query gets no answer at all
+    if current_deadline().cancelled:
+        raise QueryCancelled(current_deadline().reason)
+    
+    logger.debug("Generating the final response")
+    final_answer = _synthesize(user_query, all_results, stream=progress.active())
+    if checkpoint is not None:
+        checkpoint.finish(final_answer)
+    return all_results, final_answer
+
+def _plan_batch(user_queries):
+    """Plan several queries with one LLM call, returning one task list per query"""
+    numbered_queries = "\n".join(f"{n}. {query}" for n, query in enumerate(user_queries))
+    planning_messages = [
+        {"role": "system", "content": f"""You are a helpful assistant that breaks down several independent queries into separate tasks. 
+        
+{_tools_prompt()}
+
+You will receive a numbered list of queries. Plan EACH query independently.
+Format your response as a single JSON object whose keys are the query numbers (as strings) and whose values are the JSON arrays of tasks for that query.
+"requires" indices refer to positions inside the same query's task array."""},
+        {"role": "user", "content": f"Break down each of these queries into separate subtasks:\n{numbered_queries}"}
+    ]
+    
+    # The batch plan holds one small task array per query, so scale the planner's token cap
+    max_tokens = llm.stage_config(telemetry.STAGE_PLANNING)["max_completion_tokens"] * len(user_queries)
+    planning_response = _chat_completion(telemetry.STAGE_PLANNING, planning_messages,
+                                         max_completion_tokens=min(max_tokens, BATCH_PLANNING_MAX_TOKENS))
+    task_breakdown = planning_response.choices[0].message.content
+    logger.debug("Batch task breakdown:\n%s", task_breakdown)
+    
+    plans = [None] * len(user_queries)
+    try:
+        for key, tasks in extract_json(task_breakdown, "{").items():
+            n = int(key)
+            if 0 <= n < len(user_queries) and isinstance(tasks, list):
+                plans[n] = _validate_tasks(tasks)
+    except (PlanParseError, ValueError, AttributeError, TypeError) as e:
+        logger.warning("Failed to parse batch plan: %s. Planning queries individually.", e)
+    
+    # Any query the batch planner missed is planned on its own
+    return [plan if plan is not None else _plan(query) for plan, query in zip(plans, user_queries)]
+
+def _map_in_context(pool, function, items):
+    """Run function over items on a pool, each call in a copy of the caller's context"""
+    futures = [pool.submit(contextvars.copy_context().run, function, item) for item in items]
+    return [future.result() for future in futures]
+
+def process_user_queries(user_queries, max_workers=MAX_WORKERS, deadline_s=QUERY_DEADLINE_S, use_cache=ANSWER_CACHE):
+    """
+    Answer many queries together, sharing planning calls and tool executions.
+    
+    Queries are planned in groups of BATCH_PLANNING_SIZE per LLM call. All planned tasks
+    form one dependency graph that runs concurrently; identical side-effect-free tool calls
+    from different queries are merged into one execution through the batch memo. Final
+    answers are synthesized in parallel.
+    
+    Args:
+        user_queries (List[str]): Queries to answer
+        max_workers (int): Maximum number of concurrent tool calls and synthesis calls
+        deadline_s (float): Seconds allowed for planning and tool execution of the whole batch
+        use_cache (bool): Answer queries found in the answer cache without planning them
         
-        # Store the result for potential future use
-        task_results_by_index[i] = tool_result
+    Returns:
+        List[Tuple[List[Dict], str]]: (all_results, final_answer) for each query, in input order
+    """
+    if not use_cache:
+        return _process_user_queries(user_queries, max_workers, deadline_s)
+    
+    answers = [answer_cache.lookup(query) for query in user_queries]
+    misses = [q for q, answer in enumerate(answers) if answer is None]
+    if len(misses) < len(user_queries):
+        logger.info("Answered %d of %d queries from cache", len(user_queries) - len(misses), len(user_queries))
+    
+    fresh = _process_user_queries([user_queries[q] for q in misses], max_workers, deadline_s)
+    for q, (all_results, final_answer) in zip(misses, fresh):
+        answer_cache.store(user_queries[q], all_results, final_answer)
+        answers[q] = (all_results, final_answer)
+    return answers
+
+def _process_user_queries(user_queries, max_workers, deadline_s):
+    if not user_queries:
+        return []
+    
+    with batch_scope() as memo, telemetry.start_trace("batch", queries=len(user_queries)), \
+            deadline_scope(deadline_s), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        # Step 1: Plan groups of queries concurrently
+        groups = [user_queries[n:n + BATCH_PLANNING_SIZE] for n in range(0, len(user_queries), BATCH_PLANNING_SIZE)]
+        plans = [plan for group_plans in _map_in_context(pool, _plan_batch, groups) for plan in group_plans]
         
-        # Add the structured result to our collection
-        task_result = {
-            "task_number": i+1,
-            "tool_name": tool_name,
-            "parameters": parameters,
-            "result": tool_result
-        }
-        all_results.append(task_result)
+        # Step 2: Merge every query's plan into one graph and run the union concurrently
+        union_tasks = []
+        owners = []  # (query index, task index inside that query) for each union task
+        for q, tasks in enumerate(plans):
+            offset = len(union_tasks)
+            for i, task in enumerate(tasks):
+                union_task = dict(task)
+                union_task["requires"] = [offset + r for r in task_dependencies(i, task)]
+                union_tasks.append(union_task)
+                owners.append((q, i))
         
-        # Add this as a tool message to the conversation
-        messages.append({
-            "role": "assistant",
-            "content": None,
-            "tool_calls": [{
-                "id": f"call_{i+1}",
-                "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "arguments": json.dumps(parameters)
-                }
-            }]
-        })
+        offsets = {}
+        for n, (q, i) in enumerate(owners):
+            offsets.setdefault(q, n)
         
-        messages.append({
-            "role": "tool",
-            "content": str(tool_result),
-            "tool_call_id": f"call_{i+1}"
-        })
+        def run_union_task(n, union_task, union_results, ready_at):
+            q, i = owners[n]
+            local_results = {r - offsets[q]: union_results[r] for r in union_task["requires"]}
+            return _execute_task(i, plans[q][i], local_results, ready_at, memo)
         
-        print(f"Result: {str(tool_result)[:100]}..." if len(str(tool_result)) > 100 else tool_result)
-    
-    # Step 3: Generate the final comprehensive response
-    print("\n--- Generating Final Response ---")
-    final_response = client.chat.completions.create(
-        model=model, 
-        messages=messages,
-        max_completion_tokens=4096
-    )
-    
-    final_answer = final_response.choices[0].message.content
-    return all_results, final_answer
\ No newline at end of file
+        logger.debug("Executing %d tasks for %d queries", len(union_tasks), len(user_queries))
+        union_results = execute_task_graph(union_tasks, run_union_task, max_workers=max_workers)
+        
+        all_results_by_query = [[] for _ in user_queries]
+        for n, (q, i) in enumerate(owners):
+            all_results_by_query[q].append(union_results[n])
+        logger.info("Merged tool calls: %d of %d", memo.stats["hits"] + memo.stats["coalesced"], len(union_tasks))
+        
+        # Step 3: Synthesize every answer in parallel
+        logger.debug("Generating the final responses")
+        final_answers = _map_in_context(
+            pool,
+            lambda q: _synthesize(user_queries[q], all_results_by_query[q]),
+            range(len(user_queries))
+        )
+    
+    return list(zip(all_results_by_query, final_answers))
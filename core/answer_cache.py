@@ -0,0 +1,152 @@
+import os
+import re
+import copy
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from core.config import TOOL_POLICIES
+from core.memo import is_error_result
+from core.similarity import MinHashIndex, normalize_text
+
+# Serve near-duplicate queries from recently synthesized answers
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "true").lower() in ["true", "1", "yes"]
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Minimum character n-gram similarity for a near-duplicate match
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.9"))
+
+# Queries asking for side effects are never answered from the cache, even if a similar one was cached
+SIDE_EFFECT_PATTERN = re.compile(r'\b(e-?mail|mail|send|sent)\b', re.IGNORECASE)
+
+# Words that do not change what a query asks for, dropped before matching
+FILLER_WORDS = {
+    "a", "an", "the", "what", "whats", "s", "are", "please", "tell", "me", "can",
+    "could", "you", "i", "want", "to", "know", "show", "give", "current", "currently", "right", "now", "today",
+}
+
+# Function words a near-duplicate may add, drop or reorder; every other word (and every number) must match
+FUNCTION_WORDS = {"in", "at", "on", "of", "for", "from", "by", "with", "and", "do", "does", "about"}
+
+
+def normalize_query(user_query: str) -> str:
+    """Normalized query text with filler words removed, used as the cache key"""
+    words = normalize_text(user_query).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS) or " ".join(words)
+
+
+def content_tokens(text: str) -> frozenset:
+    """Words of a normalized query that change its meaning: numbers and everything but function words"""
+    return frozenset(word for word in text.split() if word not in FUNCTION_WORDS)
+
+
+def answer_ttl(all_results: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Freshness of an answer, derived from the tools that produced it.
+
+    Args:
+        all_results (List[Dict[str, Any]]): Task results of the query
+
+    Returns:
+        Optional[float]: The shortest TTL of the tools used, or None if the answer must not
+                         be cached (no tool ran, a non-cacheable tool such as send_email ran,
+                         or a task failed)
+    """
+    if not all_results:
+        # Without tools the answer may come from an unparseable or fully rejected plan
+        return None
+    ttls = []
+    for task_result in all_results:
+        policy = TOOL_POLICIES.get(task_result.get("tool_name"), {})
+        if not policy.get("cacheable"):
+            return None
+        if task_result.get("status", "ok") != "ok" or is_error_result(task_result.get("result")):
+            return None
+        ttls.append(policy.get("ttl", 0))
+    return min(ttls)
+
+
+class AnswerCache:
+    """
+    End-to-end cache of (all_results, final_answer) for whole queries.
+
+    Exact repeats are found by normalized query text (see normalize_query); near-duplicates through a local
+    MinHash index over character n-grams. A near-duplicate is only served when its content
+    tokens (numbers, names, every word but function words) are exactly those of the query, so
+    "convert 1000 dollars" never gets the answer for "convert 100 dollars". Entries expire after
+    the shortest TTL of the tools involved and the oldest entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.index = MinHashIndex(threshold=similarity)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_text: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "stored": 0, "uncacheable": 0}
+
+    def lookup(self, user_query: str) -> Optional[Tuple[List[Dict[str, Any]], str]]:
+        """Return a fresh cached (all_results, final_answer) for the query or a near-duplicate of it"""
+        if SIDE_EFFECT_PATTERN.search(user_query):
+            return None
+        text = normalize_query(user_query)
+        with self._lock:
+            key = self._by_text.get(text)
+            near = False
+            if key is None:
+                match = self.index.query(text)
+                key, near = (match[0], True) if match else (None, False)
+            entry = self._entries.get(key) if key else None
+            if entry is not None and near and entry["tokens"] != content_tokens(text):
+                entry = None
+            if entry is not None and entry["expires_at"] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["near_hits" if near else "hits"] += 1
+            self._entries.move_to_end(key)
+        return copy.deepcopy(entry["results"]), entry["answer"]
+
+    def store(self, user_query: str, all_results: List[Dict[str, Any]], final_answer: str) -> bool:
+        """Cache an answer if every tool it used is cacheable; returns whether it was stored"""
+        ttl = answer_ttl(all_results)
+        if ttl is None or ttl <= 0 or SIDE_EFFECT_PATTERN.search(user_query):
+            with self._lock:
+                self.stats["uncacheable"] += 1
+            return False
+
+        text = normalize_query(user_query)
+        with self._lock:
+            key = self._by_text.get(text) or uuid.uuid4().hex
+            self._entries[key] = {
+                "text": text,
+                "tokens": content_tokens(text),
+                "results": copy.deepcopy(all_results),
+                "answer": final_answer,
+                "expires_at": time.monotonic() + ttl,
+            }
+            self._entries.move_to_end(key)
+            self._by_text[text] = key
+            self.index.add(key, text)
+            self.stats["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._by_text.pop(entry["text"], None)
+        self.index.remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+
+# Process-wide cache used by process_user_query and process_user_queries
+answer_cache = AnswerCache()
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from core.memo import is_error_result
+from core.log import get_logger
+
+logger = get_logger("checkpoint")
+
+# SQLite file holding plans, task results and idempotency records
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join("checkpoints", "checkpoints.db"))
+
+# Error for a side-effecting call that was started but never confirmed
+UNCONFIRMED_MESSAGE = "Not repeated: another run started this call and its outcome was not recorded"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    query_id TEXT PRIMARY KEY,
+    user_query TEXT NOT NULL,
+    plan_complete INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running',
+    final_answer TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    query_id TEXT NOT NULL,
+    task_index INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (query_id, task_index)
+);
+CREATE TABLE IF NOT EXISTS idempotency (
+    idempotency_key TEXT PRIMARY KEY,
+    query_id TEXT NOT NULL,
+    tool_name TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class CheckpointMismatch(ValueError):
+    """Raised when a query ID is reused for a different query than the one checkpointed under it"""
+
+
+class UnconfirmedCall(Exception):
+    """Raised instead of repeating a side-effecting call that was started but whose outcome was never recorded"""
+
+
+def checkpoint_id(query_id: str, tenant: Optional[str] = None) -> str:
+    """
+    Storage key of a caller's query ID, scoped to its tenant.
+
+    Two tenants choosing the same query ID get separate checkpoints, so neither can
+    read the other's results. The tenant's length prefix keeps the key unambiguous.
+    """
+    return query_id if tenant is None else f"{len(tenant)}:{tenant}:{query_id}"
+
+
+def idempotency_key(query_id: str, task_index: int, tool_name: str) -> str:
+    """
+    Stable key for the side-effecting call of one task of one query.
+
+    Parameters are deliberately left out: they may be rewritten by the LLM from
+    earlier results, and a slightly different email body must not be sent again.
+    """
+    raw = f"{query_id}:{task_index}:{tool_name}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Durable record of each query's plan, completed task results and side-effecting calls.
+
+    Everything is keyed by a caller-chosen query ID, so a process that dies halfway
+    through a plan can resume it: planning is skipped if the whole plan was saved,
+    tasks with a stored result are not run again, and side-effecting tools are called
+    at most once per idempotency key.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def start(self, query_id: str, user_query: str) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT OR IGNORE INTO queries (query_id, user_query, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (query_id, user_query, now, now)
+        )
+
+    def load(self, query_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the saved state of a query.
+
+        Returns:
+            Optional[Dict[str, Any]]: user_query, status, final_answer, plan_complete, tasks (list)
+                                      and results (task index -> completed result), or None
+        """
+        rows = self._execute(
+            "SELECT user_query, plan_complete, status, final_answer FROM queries WHERE query_id = ?", (query_id,)
+        )
+        if not rows:
+            return None
+        user_query, plan_complete, status, final_answer = rows[0]
+        tasks, results = [], {}
+        for index, task, result in self._execute(
+                "SELECT task_index, task, result FROM tasks WHERE query_id = ? ORDER BY task_index", (query_id,)):
+            tasks.append(json.loads(task))
+            if result is not None:
+                results[index] = json.loads(result)
+        return {
+            "user_query": user_query,
+            "plan_complete": bool(plan_complete),
+            "status": status,
+            "final_answer": final_answer,
+            "tasks": tasks,
+            "results": results,
+        }
+
+    def save_task(self, query_id: str, index: int, task: Dict[str, Any]) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO tasks (query_id, task_index, task, result) VALUES (?, ?, ?, NULL)",
+            (query_id, index, json.dumps(task, default=str))
+        )
+
+    def save_plan_complete(self, query_id: str) -> None:
+        self._execute("UPDATE queries SET plan_complete = 1, updated_at = ? WHERE query_id = ?",
+                      (time.time(), query_id))
+
+    def reset_plan(self, query_id: str) -> None:
+        """Drop a partially saved plan; it will be planned again"""
+        self._execute("DELETE FROM tasks WHERE query_id = ?", (query_id,))
+
+    def save_result(self, query_id: str, index: int, result: Dict[str, Any]) -> None:
+        self._execute(
+            "UPDATE tasks SET result = ? WHERE query_id = ? AND task_index = ?",
+            (json.dumps(result, default=str), query_id, index)
+        )
+
+    def finish(self, query_id: str, final_answer: str) -> None:
+        self._execute(
+            "UPDATE queries SET status = 'done', final_answer = ?, updated_at = ? WHERE query_id = ?",
+            (final_answer, time.time(), query_id)
+        )
+
+    def incomplete_queries(self) -> List[str]:
+        """IDs of queries that were started but never finished, oldest first"""
+        return [row[0] for row in self._execute(
+            "SELECT query_id FROM queries WHERE status != 'done' ORDER BY created_at"
+        )]
+
+    def _claim(self, key: str, query_id: str, tool_name: str) -> Tuple[bool, Optional[str]]:
+        """Record the key unless it exists; returns whether it was recorded now, else its stored result"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = self._conn.execute(
+                    "INSERT OR IGNORE INTO idempotency (idempotency_key, query_id, tool_name, result, created_at) "
+                    "VALUES (?, ?, ?, NULL, ?)",
+                    (key, query_id, tool_name, time.time())
+                ).rowcount == 1
+                stored = None
+                if not claimed:
+                    stored = self._conn.execute("SELECT result FROM idempotency WHERE idempotency_key = ?",
+                                                (key,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return claimed, stored
+
+    def call_once(self, key: str, query_id: str, tool_name: str, function: Callable[[], Any]) -> Any:
+        """
+        Run a side-effecting call at most once per idempotency key.
+
+        The key is claimed in one transaction before the call, so of several concurrent
+        resumes (in this or another process) only one makes it. If the key is already
+        claimed but has no outcome, because another run is making the call or died before
+        recording it, the call is not repeated (it may already have happened) and
+        UnconfirmedCall is raised, failing the task. A call that reported an error is
+        forgotten so that resuming can try it again.
+        """
+        claimed, stored = self._claim(key, query_id, tool_name)
+        if not claimed:
+            if stored is None:
+                raise UnconfirmedCall(UNCONFIRMED_MESSAGE)
+            logger.info("Idempotency key %s: returning the recorded %s result", key[:12], tool_name)
+            return json.loads(stored)
+
+        result = function()
+        if is_error_result(result):
+            self._execute("DELETE FROM idempotency WHERE idempotency_key = ?", (key,))
+        else:
+            self._execute("UPDATE idempotency SET result = ? WHERE idempotency_key = ?",
+                          (json.dumps(result, default=str), key))
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """The process-wide checkpoint store, opened on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+        return _store
+
+
+class QueryCheckpoint:
+    """Checkpointing of one query, handed to the executor while it runs"""
+
+    def __init__(self, store: CheckpointStore, query_id: str):
+        self.store = store
+        self.query_id = query_id
+
+    def save_task(self, index: int, task: Dict[str, Any]) -> None:
+        self.store.save_task(self.query_id, index, task)
+
+    def save_result(self, index: int, result: Dict[str, Any]) -> None:
+        self.store.save_result(self.query_id, index, result)
+
+    def call_once(self, index: int, tool_name: str, function: Callable[[], Any]) -> Any:
+        key = idempotency_key(self.query_id, index, tool_name)
+        return self.store.call_once(key, self.query_id, tool_name, function)
+
+    def plan_complete(self) -> None:
+        self.store.save_plan_complete(self.query_id)
+
+    def finish(self, final_answer: str) -> None:
+        self.store.finish(self.query_id, final_answer)
+
+
+def completed_result(saved: Optional[Dict[str, Any]], index: int) -> Optional[Dict[str, Any]]:
+    """The saved result of a task if it succeeded; failed, skipped or cancelled tasks run again"""
+    result = (saved or {}).get("results", {}).get(index)
+    if result is not None and result.get("status", "ok") == "ok":
+        return result
+    return None
@@ -0,0 +1,129 @@
+import os
+import json
+import math
+from typing import List, Dict, Any, Tuple
+from core.config import TOOL_POLICIES
+from core.log import get_logger
+
+logger = get_logger("compaction")
+
+# Token budget for the whole final synthesis prompt (system, user, tool calls and tool results)
+SYNTHESIS_TOKEN_BUDGET = int(os.getenv("SYNTHESIS_TOKEN_BUDGET", "6000"))
+
+# Characters per token used for estimates; close enough for Llama-family tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+# Marker appended to tool results that were cut to fit the budget
+TRUNCATION_MARKER = " …[truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for a piece of prompt text"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def to_prompt_text(value: Any) -> str:
+    """Serialize a value for the prompt: strings as-is, everything else as compact JSON"""
+    if isinstance(value, str):
+        return value
+    try:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def compact_result(tool_name: str, result: Any) -> str:
+    """
+    Render a tool result as the concise text the LLM sees.
+
+    Args:
+        tool_name (str): Tool that produced the result
+        result (Any): Raw tool result
+
+    Returns:
+        str: The tool's declared projection (TOOL_POLICIES[tool]["compact"]) serialized
+             compactly, or the compact JSON of the whole result if none is declared
+    """
+    projection = TOOL_POLICIES.get(tool_name, {}).get("compact")
+    if projection is not None:
+        try:
+            result = projection(result)
+        except Exception as e:
+            logger.warning("Compaction for %s failed, using the full result: %s", tool_name, e)
+    return to_prompt_text(result)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    return text[:keep] + TRUNCATION_MARKER
+
+
+def fit_to_budget(contents: List[str], budget_tokens: int) -> List[str]:
+    """
+    Shrink the largest contents first until their total fits in budget_tokens.
+
+    Small results are left intact; the remaining budget is shared equally by the
+    results that do not fit (water-filling).
+
+    Args:
+        contents (List[str]): Tool result texts in conversation order
+        budget_tokens (int): Tokens available for all of them together
+
+    Returns:
+        List[str]: Contents, with the largest ones truncated where needed
+    """
+    sizes = [estimate_tokens(c) for c in contents]
+    if sum(sizes) <= budget_tokens or not contents:
+        return list(contents)
+
+    remaining = max(0, budget_tokens)
+    caps = [None] * len(contents)
+    order = sorted(range(len(contents)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        if sizes[i] <= share:
+            caps[i] = sizes[i]
+        else:
+            caps[i] = share
+        remaining -= caps[i]
+
+    return [truncate_to_tokens(c, cap) for c, cap in zip(contents, caps)]
+
+
+def compact_tool_messages(messages: List[Dict[str, Any]], raw_results: List[Any],
+                          budget_tokens: int = SYNTHESIS_TOKEN_BUDGET) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Fit the tool messages of a synthesis conversation into the global token budget.
+
+    Args:
+        messages (List[Dict[str, Any]]): Conversation whose "tool" messages already hold compact results
+        raw_results (List[Any]): Raw tool results in the same order, used to measure the saving
+        budget_tokens (int): Token budget for the whole prompt
+
+    Returns:
+        Tuple: The conversation with tool contents trimmed to the budget, and a dict with
+               tokens_before (raw str() results), tokens_after and tokens_saved
+    """
+    tool_positions = [n for n, m in enumerate(messages) if m["role"] == "tool"]
+    fixed_tokens = sum(
+        estimate_tokens(to_prompt_text(m.get("content") or "") + to_prompt_text(m.get("tool_calls") or ""))
+        for n, m in enumerate(messages) if n not in tool_positions
+    )
+    contents = fit_to_budget([messages[n]["content"] for n in tool_positions], budget_tokens - fixed_tokens)
+
+    compacted = list(messages)
+    for n, content in zip(tool_positions, contents):
+        compacted[n] = {**messages[n], "content": content}
+
+    tokens_before = fixed_tokens + sum(estimate_tokens(str(r)) for r in raw_results)
+    tokens_after = fixed_tokens + sum(estimate_tokens(c) for c in contents)
+    return compacted, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+    }
@@ -1,4 +1,10 @@
+import threading
 from tools import findDateTime, web_search, get_weather, send_email, translate_text
+from tools import compact_datetime, compact_search, compact_weather, compact_email, compact_translation
+from core.tool_manifest import ToolManifest, import_tool
+from core.log import get_logger
+
+logger = get_logger("config")
 #done
 # Define the tools with their exact names for reference
 # This list is what will be presented to the LLM so it knows what tools are available
@@ -157,4 +163,91 @@ available_functions = {
     "get_weather": get_weather,
     "send_email": send_email,
     "translate_text": translate_text,
-}
\ No newline at end of file
+}
+
+# Execution policies per tool, keyed by tool name
+# cacheable: results may be memoized and shared across queries. Only side-effect-free tools opt in.
+# ttl: seconds a memoized result stays valid
+# case_insensitive: string parameters whose case does not change the result
+# compact: projection of the tool result that is shown to the LLM in the final synthesis
+# speculative: may be started from local query signals before planning finishes (side-effect-free only)
+# timeout: seconds a single call may take before it is cancelled (capped by the query deadline)
+# on_dependency_failure: "skip" the task or "degrade" (run with whatever results are available)
+#                        when a task it requires failed, timed out or was skipped
+# backend: "thread" (default) runs the tool on the orchestrator's tool pool; "process" runs it in the
+#          warm worker processes of core/tool_processes.py, for CPU-heavy or untrusted (generated) tools
+TOOL_POLICIES = {
+    "web_search": {"cacheable": True, "ttl": 300, "case_insensitive": ["query"], "compact": compact_search,
+                   "timeout": 15, "on_dependency_failure": "degrade"},
+    "findDateTime": {"cacheable": True, "ttl": 30, "case_insensitive": ["location"], "compact": compact_datetime,
+                     "speculative": True, "timeout": 10, "on_dependency_failure": "degrade"},
+    "get_weather": {"cacheable": True, "ttl": 600, "case_insensitive": ["location"], "compact": compact_weather,
+                    "speculative": True, "timeout": 10, "on_dependency_failure": "degrade"},
+    "send_email": {"cacheable": False, "compact": compact_email, "timeout": 20, "on_dependency_failure": "skip"},
+    "translate_text": {"cacheable": True, "ttl": 3600, "case_insensitive": ["target_language", "source_language"],
+                       "compact": compact_translation, "timeout": 10, "on_dependency_failure": "skip"},
+}
+
+_registry_lock = threading.Lock()
+
+
+def function_schema(name, description, parameters):
+    """
+    Build the function-calling entry for a tool from its AVAILABLE_TOOLS parameters,
+    e.g. {"location": "string - The location"}. Parameters described as "(Optional)" are not required.
+    """
+    properties, required = {}, []
+    for param_name, param_desc in parameters.items():
+        param_type, _, param_description = param_desc.partition(" - ")
+        if not param_description:
+            param_type, param_description = "string", param_desc
+        properties[param_name] = {"type": param_type.strip().lower(), "description": param_description}
+        if "(optional)" not in param_description.lower():
+            required.append(param_name)
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+def register_tool(name, function, description, parameters, policy=None):
+    """
+    Add a tool to the running registry, or replace the tool of the same name.
+
+    The registry lists are updated in place, so every module that imported them
+    (the planner, executor and speculation) sees the tool on its next query.
+    Without a policy the tool is treated as side-effecting and untrusted: never cached or
+    speculated, and run on the process backend.
+    """
+    entry = {"name": name, "description": description, "parameters": parameters}
+    schema = function_schema(name, description, parameters)
+    with _registry_lock:
+        for registry, item, get_name in ((AVAILABLE_TOOLS, entry, lambda t: t["name"]),
+                                         (tools, schema, lambda t: t["function"]["name"])):
+            positions = [i for i, existing in enumerate(registry) if get_name(existing) == name]
+            if positions:
+                registry[positions[0]] = item
+            else:
+                registry.append(item)
+        available_functions[name] = function
+        TOOL_POLICIES[name] = dict(policy or {"cacheable": False, "on_dependency_failure": "skip", "backend": "process"})
+
+
+def load_generated_tools(manifest=None):
+    """Register every tool in the generated tools manifest; tools that fail to import are skipped"""
+    for entry in (manifest or ToolManifest()).load().values():
+        try:
+            function = import_tool(entry)
+        except Exception as e:
+            logger.warning("Skipping generated tool %s: %s", entry.get("name"), e)
+            continue
+        register_tool(entry["name"], function, entry.get("description", ""), entry.get("parameters", {}),
+                      entry.get("policy"))
+
+
+# Tools written by agent_generator.py live in the manifest rather than in this file
+load_generated_tools()
@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import threading
+from typing import List, Dict, Any
+from core.compaction import SYNTHESIS_TOKEN_BUDGET, compact_result, estimate_tokens, fit_to_budget, to_prompt_text
+from core.executor import task_dependencies
+
+# Tokens an older tool output is reduced to once the conversation exceeds its budget
+SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "120"))
+
+# Token budget for the previous results embedded in one context-rewrite prompt
+CONTEXT_REWRITE_TOKEN_BUDGET = int(os.getenv("CONTEXT_REWRITE_TOKEN_BUDGET", "3000"))
+
+SUMMARY_MARKER = " …[summarized]"
+EVICTED_CONTENT = "[result omitted to fit the context budget]"
+
+SYSTEM_PROMPT = "You are a helpful assistant that responds to user queries by sequentially executing appropriate tools and providing a comprehensive final answer."
+
+
+def summarize_text(text: str, max_tokens: int) -> str:
+    """
+    Extractive summary: keep whole sentences/lines from the start of text until max_tokens.
+
+    Args:
+        text (str): Text to shorten
+        max_tokens (int): Approximate size of the summary
+
+    Returns:
+        str: The leading sentences of text, marked as summarized if anything was dropped
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    summary = ""
+    for piece in re.split(r'(?<=[.!?\n])\s+', text):
+        if estimate_tokens(summary + piece) > max_tokens:
+            break
+        summary += piece + " "
+    if not summary:
+        # A single oversized sentence: fall back to a hard cut
+        summary = text[:max(0, max_tokens * 4 - len(SUMMARY_MARKER))]
+    return summary.rstrip() + SUMMARY_MARKER
+
+
+class ConversationContext:
+    """
+    Synthesis conversation with a token budget.
+
+    Tool outputs are added in task order. Whenever the estimated prompt size exceeds the
+    budget, the oldest full outputs are summarized first; if that is not enough, the
+    oldest summaries are evicted. The most recent outputs are kept intact the longest.
+    """
+
+    def __init__(self, user_query: str, budget_tokens: int = SYNTHESIS_TOKEN_BUDGET,
+                 system_prompt: str = SYSTEM_PROMPT):
+        self.user_query = user_query
+        self.system_prompt = system_prompt
+        self.budget_tokens = budget_tokens
+        self.entries: List[Dict[str, Any]] = []
+        self.stats = {"summarized": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        fixed = estimate_tokens(self.system_prompt) + estimate_tokens(self.user_query)
+        return fixed + sum(entry["call_tokens"] + estimate_tokens(entry["content"]) for entry in self.entries)
+
+    def add(self, task_result: Dict[str, Any]) -> None:
+        """Append a structured task result and re-apply the budget"""
+        call_id = f"call_{task_result['task_number']}"
+        tool_call = {
+            "id": call_id,
+            "type": "function",
+            "function": {
+                "name": task_result["tool_name"],
+                "arguments": json.dumps(task_result["parameters"])
+            }
+        }
+        with self._lock:
+            self.entries.append({
+                "call_id": call_id,
+                "tool_call": tool_call,
+                "call_tokens": estimate_tokens(to_prompt_text(tool_call)),
+                "content": compact_result(task_result["tool_name"], task_result["result"]),
+                "state": "full",
+            })
+            self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        # Summarize oldest first, never the latest output
+        for entry in self.entries[:-1]:
+            if self.total_tokens <= self.budget_tokens:
+                return
+            if entry["state"] == "full":
+                summary = summarize_text(entry["content"], SUMMARY_TOKENS)
+                if summary != entry["content"]:
+                    entry["content"] = summary
+                    entry["state"] = "summarized"
+                    self.stats["summarized"] += 1
+
+        for entry in self.entries[:-1]:
+            if self.total_tokens <= self.budget_tokens:
+                return
+            if entry["state"] != "evicted":
+                entry["content"] = EVICTED_CONTENT
+                entry["state"] = "evicted"
+                self.stats["evicted"] += 1
+
+    def messages(self) -> List[Dict[str, Any]]:
+        """Build the conversation for the final synthesis call"""
+        with self._lock:
+            messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.user_query}
+            ]
+            for entry in self.entries:
+                # Add this as a tool message to the conversation
+                messages.append({"role": "assistant", "content": None, "tool_calls": [entry["tool_call"]]})
+                messages.append({"role": "tool", "content": entry["content"], "tool_call_id": entry["call_id"]})
+            return messages
+
+
+def dependency_context(i: int, task: Dict[str, Any], task_results_by_index: Dict[int, Dict[str, Any]],
+                       budget_tokens: int = CONTEXT_REWRITE_TOKEN_BUDGET) -> Dict[str, str]:
+    """
+    Collect only the results a dependent task requires, in their compact form and within a token budget.
+
+    Args:
+        i (int): Index of the dependent task
+        task (Dict[str, Any]): The dependent task
+        task_results_by_index (Dict[int, Dict[str, Any]]): Finished task results keyed by index
+        budget_tokens (int): Tokens available for all required results together
+
+    Returns:
+        Dict[str, str]: "task_<n>_result" -> compact result text
+    """
+    keys, contents = [], []
+    for req_idx in task_dependencies(i, task):
+        if req_idx in task_results_by_index:  # Ensure the required task has been processed
+            required = task_results_by_index[req_idx]
+            keys.append(f"task_{req_idx+1}_result")
+            contents.append(compact_result(required["tool_name"], required["result"]))
+    contents = fit_to_budget(contents, budget_tokens)
+    return dict(zip(keys, contents))
+
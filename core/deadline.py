@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, InvalidStateError
+from contextlib import contextmanager
+from typing import Optional, Iterator, Dict
+
+# Default end-to-end budget for executing one query's plan
+QUERY_DEADLINE_S = float(os.getenv("QUERY_DEADLINE_S", "60"))
+
+# Deadline of the query being processed in this context
+_current_deadline = contextvars.ContextVar("gyanova_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is started or waited on after the query's deadline or cancellation"""
+
+
+class QueryCancelled(DeadlineExceeded):
+    """Raised when the query was cancelled, e.g. because the caller hung up or started speaking again"""
+
+    # Lets telemetry mark the span as cancelled work without importing this module
+    cancelled = True
+
+
+class ToolTimeout(Exception):
+    """Raised when a single tool call overruns its timeout budget"""
+
+
+# Process-wide totals of work stopped by cancellation, reported by cancellation_stats()
+_stats_lock = threading.Lock()
+_stats = {"queries_cancelled": 0, "tasks_cancelled": 0, "tool_calls_abandoned": 0,
+          "llm_calls_aborted": 0, "work_discarded_s": 0.0}
+
+
+def record_cancelled(kind: str, seconds: float = 0.0) -> None:
+    """Count one piece of cancelled work and the seconds already spent on it"""
+    with _stats_lock:
+        _stats[kind] += 1
+        _stats["work_discarded_s"] += seconds
+
+
+def cancellation_stats() -> Dict[str, float]:
+    """Totals of cancelled queries, tasks, tool calls and LLM calls since the process started"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class Deadline:
+    """A point in time by which a query must finish, which can also be cancelled early"""
+
+    def __init__(self, seconds: Optional[float] = None, _cancellation: Optional[Future] = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        # Resolved with the reason on cancel(); wait on it together with work futures
+        self.cancellation = _cancellation or Future()
+
+    def remaining(self) -> float:
+        """Seconds left, 0 once cancelled or expired, infinity if there is no deadline"""
+        if self.cancellation.done():
+            return 0.0
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancellation.done()
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self.cancellation.result() if self.cancellation.done() else None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the query; returns False if it was already cancelled"""
+        if self.cancellation.done():
+            return False
+        try:
+            self.cancellation.set_result(reason)
+        except InvalidStateError:
+            # Another thread cancelled it at the same moment
+            return False
+        return True
+
+    def without_expiry(self) -> "Deadline":
+        """A deadline that never expires but is cancelled together with this one"""
+        return Deadline(None, _cancellation=self.cancellation)
+
+    def budget(self, timeout: float) -> float:
+        """The smaller of a per-call timeout and the time left before the deadline"""
+        return min(timeout, self.remaining())
+
+    def check(self) -> None:
+        """Raise DeadlineExceeded if the deadline has passed, or QueryCancelled if the query was cancelled"""
+        if self.cancellation.done():
+            raise QueryCancelled(self.reason)
+        if self.expired:
+            raise DeadlineExceeded("query deadline exceeded")
+
+
+def current_deadline() -> Deadline:
+    """The active deadline, or one that never expires outside of a deadline_scope()"""
+    deadline = _current_deadline.get()
+    return deadline if deadline is not None else Deadline()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float] = QUERY_DEADLINE_S, deadline: Optional[Deadline] = None) -> Iterator[Deadline]:
+    """Make a deadline current for the block; worker threads inherit it through copied contexts"""
+    deadline = deadline or Deadline(seconds)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,99 @@
+import os
+import time
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable
+
+# Maximum number of tool calls run at the same time for one plan
+MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", "8"))
+
+
+def task_dependencies(index: int, task: Dict[str, Any]) -> List[int]:
+    """Return the valid earlier task indices listed in a task's "requires" field"""
+    requires = task.get("requires") or []
+    if not isinstance(requires, list):
+        requires = [requires]
+    return [r for r in requires if isinstance(r, int) and 0 <= r < index]
+
+
+def execute_task_graph(tasks: Iterable[Dict[str, Any]],
+                       run_task: Callable[[int, Dict[str, Any], Dict[int, Any], float], Any],
+                       max_workers: int = MAX_WORKERS) -> Dict[int, Any]:
+    """
+    Run a plan as a dependency graph, starting each task as soon as the tasks it requires have finished.
+
+    `tasks` may be a list or any iterable, such as a generator yielding tasks while the
+    planner is still streaming; each task is scheduled the moment it arrives. Independent
+    tasks run concurrently on a thread pool, each in a copy of the caller's context so
+    telemetry traces and the batch memo follow it into the worker thread.
+
+    Args:
+        tasks (Iterable[Dict[str, Any]]): Planned tasks; "requires" holds indices of earlier tasks
+        run_task (Callable): Called as run_task(index, task, results_by_index, ready_at) and
+                             returns the task result
+        max_workers (int): Size of the thread pool
+
+    Returns:
+        Dict[int, Any]: Result of every task keyed by task index
+    """
+    results_by_index: Dict[int, Any] = {}
+    known: List[Dict[str, Any]] = []
+    dependencies: Dict[int, set] = {}
+    pending = set()
+    running = set()
+    events = queue.Queue()
+
+    if isinstance(tasks, list):
+        if not tasks:
+            return results_by_index
+        for task in tasks:
+            events.put(("task", task))
+        events.put(("end", None))
+        max_workers = min(max_workers, len(tasks))
+    else:
+        def feed():
+            try:
+                for task in tasks:
+                    events.put(("task", task))
+                events.put(("end", None))
+            except BaseException as e:
+                events.put(("error", e))
+
+        threading.Thread(target=contextvars.copy_context().run, args=(feed,), daemon=True).start()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        def work(i, ready_at):
+            try:
+                events.put(("done", (i, run_task(i, known[i], results_by_index, ready_at))))
+            except BaseException as e:
+                events.put(("error", e))
+
+        def submit_ready():
+            for i in sorted(pending):
+                if dependencies[i] <= results_by_index.keys():
+                    pending.discard(i)
+                    running.add(i)
+                    pool.submit(contextvars.copy_context().run, work, i, time.perf_counter())
+
+        feed_done = False
+        while not (feed_done and not running and not pending):
+            kind, payload = events.get()
+            if kind == "task":
+                i = len(known)
+                known.append(payload)
+                dependencies[i] = set(task_dependencies(i, payload))
+                pending.add(i)
+            elif kind == "done":
+                i, result = payload
+                running.discard(i)
+                results_by_index[i] = result
+            elif kind == "end":
+                feed_done = True
+            else:
+                # Propagate the first failure (tool or planner stream), as sequential execution did
+                raise payload
+            submit_ready()
+
+    return results_by_index
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import time
+import copy
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from core.config import AVAILABLE_TOOLS
+from core.similarity import MinHashIndex, normalize_text, char_ngrams, containment
+from core.log import get_logger
+
+logger = get_logger("generation_cache")
+
+# Reuse generated tool definitions for repeated agent_generator requests
+GENERATION_CACHE = os.getenv("GENERATION_CACHE", "true").lower() in ["true", "1", "yes"]
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", os.path.join("cache", "generation_cache.json"))
+
+# Minimum similarity between two requests for the cached definition to be reused
+GENERATION_CACHE_SIMILARITY = float(os.getenv("GENERATION_CACHE_SIMILARITY", "0.85"))
+
+# Minimum share of a request's character n-grams found in an existing tool's name and
+# description for the request to be answered with that tool
+TOOL_MATCH_SIMILARITY = float(os.getenv("TOOL_MATCH_SIMILARITY", "0.8"))
+
+# Words that do not change which tool a request asks for
+REQUEST_FILLER_WORDS = {
+    "a", "an", "the", "tool", "function", "agent", "that", "which", "can", "to", "create", "make",
+    "build", "write", "generate", "new", "please", "i", "want", "need", "for", "me", "will", "able", "be",
+}
+
+
+def normalize_request(user_query: str) -> str:
+    """Normalized tool request with filler words removed, used as the cache key"""
+    words = normalize_text(user_query).split()
+    return " ".join(word for word in words if word not in REQUEST_FILLER_WORDS) or " ".join(words)
+
+
+def tool_text(tool: Dict[str, Any]) -> str:
+    """Name (split into words) and description of a registered tool, for matching requests against"""
+    name = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", tool.get("name", "")).replace("_", " ")
+    return normalize_request(f"{name} {tool.get('description', '')}")
+
+
+def registry_fingerprint(available_tools: List[Dict[str, Any]] = AVAILABLE_TOOLS) -> str:
+    """Hash of the registered tool names and parameters; a cached definition is only reused for the same registry"""
+    signature = sorted((tool["name"], sorted(tool.get("parameters", {}))) for tool in available_tools)
+    return hashlib.sha256(json.dumps(signature).encode("utf-8")).hexdigest()[:16]
+
+
+class GenerationCache:
+    """
+    Local cache of generated tool definitions, stored as JSON.
+
+    Entries are keyed by the normalized request and the registry fingerprint, and
+    near-identical requests are matched through a MinHash index. Requests that
+    produced a tool which is still registered, and requests that closely match an
+    existing tool's name and description, are answered with that tool without
+    generating anything.
+    """
+
+    def __init__(self, path: str = GENERATION_CACHE_PATH, similarity: float = GENERATION_CACHE_SIMILARITY,
+                 tool_similarity: float = TOOL_MATCH_SIMILARITY):
+        self.path = path
+        self.tool_similarity = tool_similarity
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._index = MinHashIndex(threshold=similarity)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "existing": 0, "misses": 0, "stored": 0}
+        self._load()
+
+    @staticmethod
+    def _key(normalized: str, fingerprint: str) -> str:
+        return f"{fingerprint}:{normalized}"
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+        for key, entry in entries.items():
+            self._entries[key] = entry
+            self._index.add(key, entry["normalized"])
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self._entries, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def find_existing(self, user_query: str, available_tools: List[Dict[str, Any]] = AVAILABLE_TOOLS
+                      ) -> Optional[Tuple[str, float]]:
+        """
+        Find a registered tool that already does what the request asks for.
+
+        Returns:
+            Optional[Tuple[str, float]]: (tool name, similarity), or None
+        """
+        normalized = normalize_request(user_query)
+        registered = {tool["name"]: tool for tool in available_tools}
+
+        # Requests that produced a tool which is still registered
+        with self._lock:
+            installed = [(entry["normalized"], entry["tool_name"]) for entry in self._entries.values()
+                         if entry.get("installed") and entry["tool_name"] in registered]
+        for previous, tool_name in installed:
+            if previous == normalized:
+                with self._lock:
+                    self.stats["existing"] += 1
+                return tool_name, 1.0
+
+        index = MinHashIndex(threshold=self._index.threshold)
+        for n, (previous, tool_name) in enumerate(installed):
+            index.add((n, tool_name), previous)
+        match = index.query(normalized)
+        if match is not None:
+            (_, tool_name), similarity = match
+        else:
+            # Tool descriptions are longer than requests, so measure how much of the request they cover
+            shingles = char_ngrams(normalized)
+            tool_name, similarity = max(
+                ((name, containment(shingles, char_ngrams(tool_text(tool)))) for name, tool in registered.items()),
+                key=lambda item: item[1], default=(None, 0.0)
+            )
+            if similarity < self.tool_similarity:
+                return None
+        with self._lock:
+            self.stats["existing"] += 1
+        return tool_name, similarity
+
+    def lookup(self, user_query: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the definition generated for the same or a near-identical request, or None"""
+        normalized = normalize_request(user_query)
+        key = self._key(normalized, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return {**copy.deepcopy(entry["tool_info"]), "cache_key": key}
+        match = self._index.query(normalized)
+        with self._lock:
+            entry = self._entries.get(match[0]) if match else None
+            if entry is None or entry["fingerprint"] != fingerprint:
+                self.stats["misses"] += 1
+                return None
+            self.stats["near_hits"] += 1
+            logger.info("Generation cache: '%s' matches '%s' (%.2f)", user_query, entry["query"], match[1])
+            return {**copy.deepcopy(entry["tool_info"]), "cache_key": match[0]}
+
+    def store(self, user_query: str, fingerprint: str, tool_info: Dict[str, Any]) -> str:
+        """Cache a validated definition and return its cache key"""
+        normalized = normalize_request(user_query)
+        key = self._key(normalized, fingerprint)
+        with self._lock:
+            self._entries[key] = {
+                "query": user_query,
+                "normalized": normalized,
+                "fingerprint": fingerprint,
+                "tool_name": tool_info.get("tool_name"),
+                "tool_info": copy.deepcopy(tool_info),
+                "installed": False,
+                "created_at": time.time(),
+            }
+            self._index.add(key, normalized)
+            self.stats["stored"] += 1
+            self._save()
+        return key
+
+    def mark_installed(self, key: str) -> None:
+        """Record that the entry's tool was installed, so repeating the request returns it"""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["installed"] = True
+                self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._index.remove(key)
+            self._entries.clear()
+            self._save()
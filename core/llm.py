@@ -0,0 +1,228 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Iterator, Optional
+import httpx
+from groq import Groq, APIStatusError, RateLimitError
+from dotenv import load_dotenv
+from core import telemetry
+from core.deadline import Deadline, DeadlineExceeded, QueryCancelled, record_cancelled
+from tools.rate_limit import RateLimitExceeded, get_rate_limiter, retry_after
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+
+# Maximum LLM requests in flight across all queries, and pooled keep-alive connections
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+
+# Retries for rate-limited (429) or overloaded (503) requests, with exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_MAX_BACKOFF_S = float(os.getenv("LLM_MAX_BACKOFF_S", "10"))
+
+RETRYABLE_STATUS_CODES = (429, 503)
+
+# Rate limit bucket prefix for Groq; each model gets its own bucket (tools/rate_limit.py)
+GROQ_UPSTREAM = "api.groq.com"
+
+# Model and sampling parameters per pipeline stage
+# model: Groq model id (each stage can be overridden with <STAGE>_MODEL, e.g. CONTEXT_REWRITE_MODEL)
+# max_completion_tokens: completion cap; planning and parameter rewriting only emit small JSON
+# Any other key (temperature, top_p, ...) is passed through to chat.completions.create
+STAGE_CONFIG: Dict[str, Dict[str, Any]] = {
+    telemetry.STAGE_PLANNING: {
+        "model": os.getenv("PLANNING_MODEL", DEFAULT_MODEL),
+        "max_completion_tokens": int(os.getenv("PLANNING_MAX_TOKENS", "1024")),
+        "temperature": 0,
+    },
+    telemetry.STAGE_CONTEXT: {
+        "model": os.getenv("CONTEXT_REWRITE_MODEL", os.getenv("FAST_MODEL", "llama-3.1-8b-instant")),
+        "max_completion_tokens": int(os.getenv("CONTEXT_REWRITE_MAX_TOKENS", "256")),
+        "temperature": 0,
+    },
+    telemetry.STAGE_SYNTHESIS: {
+        "model": os.getenv("SYNTHESIS_MODEL", DEFAULT_MODEL),
+        "max_completion_tokens": int(os.getenv("SYNTHESIS_MAX_TOKENS", "4096")),
+    },
+    telemetry.STAGE_GENERATION: {
+        "model": os.getenv("GENERATOR_MODEL", DEFAULT_MODEL),
+        "max_completion_tokens": int(os.getenv("GENERATOR_MAX_TOKENS", "4096")),
+    },
+}
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Threads that wait for non-streamed responses, so the caller can give up on a cancelled query
+_request_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_REQUEST_POOL_SIZE", "32")))
+
+
+def get_client() -> Groq:
+    """The shared Groq client, created on first use with a keep-alive connection pool"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ))
+            # Retries are handled here so they respect the query deadline and are counted in telemetry
+            _client = Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+        return _client
+
+
+def stage_config(stage: str) -> Dict[str, Any]:
+    """Request parameters for a stage, falling back to the default model with a 4096 token cap"""
+    return dict(STAGE_CONFIG.get(stage, {"model": DEFAULT_MODEL, "max_completion_tokens": 4096}))
+
+
+def _retry_delay(error: APIStatusError, attempt: int) -> float:
+    """Seconds to wait before the next attempt: the server's Retry-After, else jittered exponential backoff"""
+    delay = retry_after(error)
+    if delay is None:
+        delay = LLM_BACKOFF_BASE_S * (2 ** attempt) * random.uniform(0.5, 1.5)
+    return min(delay, LLM_MAX_BACKOFF_S)
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, RateLimitError) or getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return isinstance(error, RateLimitError) or getattr(error, "status_code", None) == 429
+
+
+def _sleep(delay: float, deadline: Optional[Deadline]) -> None:
+    """Sleep, but wake up at once if the query is cancelled meanwhile"""
+    if deadline is None:
+        time.sleep(delay)
+        return
+    wait([deadline.cancellation], timeout=delay)
+    if deadline.cancelled:
+        raise QueryCancelled(deadline.reason)
+
+
+def _wait_for_rate_limit(span: telemetry.Span, upstream: str, deadline: Optional[Deadline]) -> None:
+    """Wait for the model's next slot in the rate limit shared by every thread and process"""
+    limiter = get_rate_limiter()
+    try:
+        delay = limiter.reserve(upstream, deadline.remaining()) if deadline is not None else limiter.reserve(upstream)
+    except RateLimitExceeded as e:
+        if deadline is not None:
+            raise DeadlineExceeded(f"{e} before the query deadline") from e
+        raise
+    if delay > 0:
+        span.set(rate_limit_wait_s=span.attributes.get("rate_limit_wait_s", 0.0) + delay)
+        _sleep(delay, deadline)
+
+
+def _create(span: telemetry.Span, request: Dict[str, Any], deadline: Optional[Deadline] = None):
+    """Send one request, retrying 429/503 responses while the retry budget (and deadline, if any) allow"""
+    upstream = f"{GROQ_UPSTREAM}/{request['model']}"
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        _wait_for_rate_limit(span, upstream, deadline)
+        try:
+            return get_client().chat.completions.create(**request)
+        except APIStatusError as e:
+            if _is_rate_limited(e):
+                # Slows this model down for every thread and process; the next attempt waits in the rate limiter
+                get_rate_limiter().throttled(upstream, retry_after(e))
+            if not _is_retryable(e) or attempt == LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            span.set(retries=attempt + 1)
+            if not _is_rate_limited(e):
+                span.set(retry_wait_s=span.attributes.get("retry_wait_s", 0.0) + delay)
+                _sleep(delay, deadline)
+
+
+def _create_cancellable(span: telemetry.Span, request: Dict[str, Any], deadline: Optional[Deadline]):
+    """Run _create on the request pool and stop waiting for it if the deadline is cancelled"""
+    def send():
+        with _slots:
+            return _create(span, request, deadline)
+
+    if deadline is None:
+        return send()
+    future = _request_pool.submit(contextvars.copy_context().run, send)
+    wait([future, deadline.cancellation], return_when=FIRST_COMPLETED)
+    if future.done():
+        return future.result()
+    # The response is discarded when it arrives; it is bounded by the request timeout
+    record_cancelled("llm_calls_aborted", span.duration)
+    raise QueryCancelled(deadline.reason)
+
+
+def _build_request(stage: str, messages: List[Dict[str, Any]], timeout: Optional[float],
+                   overrides: Dict[str, Any]) -> Dict[str, Any]:
+    request = {**stage_config(stage), **overrides, "messages": messages}
+    # An explicit timeout=None would replace the client's default timeout with none at all
+    if timeout is not None:
+        request["timeout"] = timeout
+    return request
+
+
+def chat_completion(stage: str, messages: List[Dict[str, Any]], timeout: Optional[float] = None,
+                    deadline: Optional[Deadline] = None, **kwargs):
+    """
+    Run a chat completion with the stage's model and parameters.
+
+    Args:
+        stage (str): Pipeline stage (a telemetry.STAGE_* name) selecting the model configuration
+        messages (List[Dict[str, Any]]): Chat messages
+        timeout (float, optional): Per-request timeout in seconds (the client's default timeout if None)
+        deadline (Deadline, optional): No retry is attempted if its backoff would overrun this deadline,
+                                       and the call is abandoned as soon as it is cancelled
+        **kwargs: Overrides for the stage parameters (e.g. max_completion_tokens)
+
+    Returns:
+        The Groq chat completion response
+    """
+    request = _build_request(stage, messages, timeout, kwargs)
+    with telemetry.span(stage, stage, llm=True, model=request["model"],
+                        max_completion_tokens=request.get("max_completion_tokens")) as span:
+        response = _create_cancellable(span, request, deadline)
+        span.record_usage(response)
+        span.record_payload(messages, response.choices[0].message.content)
+    return response
+
+
+def chat_completion_stream(stage: str, messages: List[Dict[str, Any]], timeout: Optional[float] = None,
+                           deadline: Optional[Deadline] = None, **kwargs) -> Iterator[str]:
+    """Stream a chat completion with the stage's model and parameters, yielding content deltas"""
+    request = {**_build_request(stage, messages, timeout, kwargs), "stream": True}
+    with telemetry.span(stage, stage, llm=True, model=request["model"], streamed=True,
+                        max_completion_tokens=request.get("max_completion_tokens")) as span:
+        # The concurrency slot is held until the stream has been fully consumed
+        with _slots:
+            stream = _create(span, request, deadline)
+            content = []
+            for chunk in stream:
+                if deadline is not None and deadline.cancelled:
+                    # Closing the stream drops the connection, which stops generation upstream
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        close()
+                    record_cancelled("llm_calls_aborted", span.duration)
+                    raise QueryCancelled(deadline.reason)
+                if not content:
+                    span.set(first_chunk_s=span.duration)
+                # Groq reports usage on the last chunk under x_groq; OpenAI-compatible servers under usage
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None:
+                    span.set(prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                             completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    content.append(delta)
+                    yield delta
+        span.record_payload(messages, "".join(content))
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Dict, Any, Callable, Optional
+
+# Lowest level written: DEBUG shows task breakdowns, parameters and result previews
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "text" for people, "json" for one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Share of DEBUG/INFO records kept per component, e.g. "agent=0.1,speculation=0";
+# warnings and errors are always kept
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+# Write records from a background thread, so the hot path only enqueues them
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() in ["true", "1", "yes"]
+
+ROOT_LOGGER = "gyanova"
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(component)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parse "agent=0.1,tools.search=0.5" into {component: keep rate}"""
+    rates = {}
+    for item in (spec or "").split(","):
+        component, _, rate = item.partition("=")
+        if component.strip() and rate.strip():
+            rates[component.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured share of each component's DEBUG/INFO records (the longest matching component wins)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def rate(self, component: str) -> float:
+        best, best_rate = "", 1.0
+        for prefix, rate in self.rates.items():
+            if (component == prefix or component.startswith(prefix + ".")) and len(prefix) > len(best):
+                best, best_rate = prefix, rate
+        return best_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate(record.name[len(ROOT_LOGGER) + 1:])
+        return rate >= 1.0 or random.random() < rate
+
+
+class ContextFilter(logging.Filter):
+    """Adds the component name and the current telemetry trace ID (runs in the calling thread, where the trace is set)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.component = record.name[len(ROOT_LOGGER) + 1:] or ROOT_LOGGER
+        telemetry = sys.modules.get("core.telemetry")
+        trace = telemetry.current_trace() if telemetry is not None else None
+        record.trace_id = trace.trace_id if trace is not None else None
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The standard QueueHandler formats every record before enqueueing it, which would
+    put the string work back on the caller. Callers therefore pass values that are not
+    mutated after logging (or Lazy wrappers).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "component": getattr(record, "component", record.name),
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class Lazy:
+    """
+    Defers an expensive value until the record is actually formatted.
+
+    Example:
+        logger.debug("Result: %s", Lazy(json.dumps, result))
+    """
+
+    __slots__ = ("function", "args")
+
+    def __init__(self, function: Callable[..., Any], *args):
+        self.function = function
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.function(*self.args))
+
+
+def _preview(value: Any, limit: int) -> str:
+    text = str(value)
+    return f"{text[:limit]}..." if len(text) > limit else text
+
+
+def preview(value: Any, limit: int = 100) -> Lazy:
+    """A value shortened to `limit` characters, computed only if the record is written"""
+    return Lazy(_preview, value, limit)
+
+
+def configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sampling: str = LOG_SAMPLING,
+              asynchronous: bool = LOG_ASYNC, stream=None) -> logging.Logger:
+    """
+    (Re)configure the "gyanova" loggers. Called automatically with the LOG_* settings
+    on first use; call it again to change them at runtime.
+    """
+    global _listener, _configured
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    root.propagate = False
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    # Filters run in the calling thread: sampled-out records never reach the queue
+    entry = DeferredQueueHandler(queue.SimpleQueue()) if asynchronous else output
+    entry.addFilter(SamplingFilter(parse_sampling(sampling)))
+    entry.addFilter(ContextFilter())
+    root.addHandler(entry)
+    if asynchronous:
+        _listener = logging.handlers.QueueListener(entry.queue, output)
+        _listener.start()
+    _configured = True
+    return root
+
+
+def flush() -> None:
+    """Write every queued record (the listener is restarted afterwards)"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Logger for one component, e.g. get_logger("agent") -> "gyanova.agent" """
+    if not _configured:
+        configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
+
+
+@atexit.register
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
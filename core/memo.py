@@ -0,0 +1,186 @@
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional, Tuple, Iterator
+from core.config import TOOL_POLICIES
+from core.deadline import QueryCancelled, ToolTimeout, current_deadline
+
+# Memo shared by every query processed inside a `batch_scope()` block
+_batch_memo = contextvars.ContextVar("gyanova_batch_memo", default=None)
+
+
+def _canonical_value(value: Any, lowercase: bool = False) -> Any:
+    """Normalize a parameter value so equivalent calls produce the same key"""
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value.lower() if lowercase else value
+    if isinstance(value, dict):
+        return {k: _canonical_value(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    return value
+
+
+def canonical_key(tool_name: str, parameters: Dict[str, Any]) -> str:
+    """
+    Build the memo key for a tool call from its name and canonicalized parameters.
+
+    Args:
+        tool_name (str): Name of the tool
+        parameters (Dict[str, Any]): Parameters the tool is called with
+
+    Returns:
+        str: Stable key, identical for calls that only differ in whitespace, key order
+             or the case of parameters the tool declares as case-insensitive
+    """
+    case_insensitive = set(TOOL_POLICIES.get(tool_name, {}).get("case_insensitive", []))
+    canonical = {
+        name: _canonical_value(value, lowercase=name in case_insensitive)
+        for name, value in parameters.items()
+        if value is not None
+    }
+    return f"{tool_name}:{json.dumps(canonical, sort_keys=True, default=str)}"
+
+
+def is_cacheable(tool_name: str) -> bool:
+    return bool(TOOL_POLICIES.get(tool_name, {}).get("cacheable", False))
+
+
+def is_error_result(result: Any) -> bool:
+    """Tools report failures as strings or dicts with an error status; those are never memoized"""
+    if isinstance(result, str):
+        return True
+    if isinstance(result, dict):
+        return "error" in result or result.get("status") == "error"
+    return False
+
+
+class ToolMemo:
+    """
+    Memoizes side-effect-free tool calls and coalesces concurrent identical calls.
+
+    A memo created with a `parent` (the batch-scoped memo) delegates to it, so every
+    query in a batch shares results while a standalone query still deduplicates
+    repeated calls inside its own plan. A caller that joins an identical call already
+    in flight waits for it only until its own query deadline passes or is cancelled.
+    """
+
+    def __init__(self, parent: Optional["ToolMemo"] = None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0}
+
+    def call(self, tool_name: str, parameters: Dict[str, Any], function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return the memoized result of a tool call, running `function` on a miss.
+
+        Args:
+            tool_name (str): Name of the tool being called
+            parameters (Dict[str, Any]): Parameters of the call, used for the key
+            function (Callable[[], Any]): Zero-argument callable that executes the tool
+
+        Returns:
+            Tuple[Any, bool]: The tool result and whether it was served from the memo
+        """
+        if not is_cacheable(tool_name):
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return function(), False
+
+        if self.parent is not None:
+            result, hit = self.parent.call(tool_name, parameters, function)
+            with self._lock:
+                self.stats["hits" if hit else "misses"] += 1
+            return result, hit
+
+        key = canonical_key(tool_name, parameters)
+        ttl = TOOL_POLICIES.get(tool_name, {}).get("ttl", 60)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.stats["hits"] += 1
+                return entry[1], True
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                owner = True
+                pending = Future()
+                self._inflight[key] = pending
+                self.stats["misses"] += 1
+            else:
+                owner = False
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            # Another thread is already running this exact call; wait for its result, but only
+            # as long as this caller's own query deadline allows
+            deadline = current_deadline()
+            remaining = deadline.remaining()
+            wait([pending, deadline.cancellation], timeout=None if remaining == float("inf") else remaining,
+                 return_when=FIRST_COMPLETED)
+            if pending.done():
+                return pending.result(), True
+            if deadline.cancelled:
+                raise QueryCancelled(deadline.reason)
+            raise ToolTimeout(f"{tool_name} did not finish before the query deadline")
+
+        try:
+            result = function()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if not is_error_result(result):
+                self._entries[key] = (time.monotonic() + ttl, result)
+        pending.set_result(result)
+        return result, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def current_batch_memo() -> Optional[ToolMemo]:
+    return _batch_memo.get()
+
+
+def request_memo() -> ToolMemo:
+    """Create the memo for a single query, joined to the active batch memo if there is one"""
+    return ToolMemo(parent=current_batch_memo())
+
+
+@contextmanager
+def batch_scope(memo: Optional[ToolMemo] = None) -> Iterator[ToolMemo]:
+    """
+    Share memoized tool results across every query processed inside the block.
+
+    The scope is a context variable, so worker threads must run inside a copy of the
+    caller's context (`contextvars.copy_context().run`) to join it.
+
+    Example:
+        with batch_scope() as memo:
+            for query in queries:
+                process_user_query(query)
+        print(memo.stats)
+    """
+    existing = _batch_memo.get()
+    if existing is not None and memo is None:
+        yield existing
+        return
+
+    memo = memo or ToolMemo()
+    token = _batch_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _batch_memo.reset(token)
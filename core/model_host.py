@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Iterator, Optional
+from core.log import get_logger
+
+logger = get_logger("model_host")
+
+# Concurrent inferences per loaded model; requests beyond this wait in the host's queue
+MODEL_HOST_WORKERS = int(os.getenv("MODEL_HOST_WORKERS", "1"))
+
+# Requests allowed to wait for a model before new ones are rejected
+MODEL_HOST_MAX_QUEUE = int(os.getenv("MODEL_HOST_MAX_QUEUE", "32"))
+
+# Seconds to wait for a model to finish loading and warming up
+MODEL_READY_TIMEOUT_S = float(os.getenv("MODEL_READY_TIMEOUT_S", "300"))
+
+_END = object()
+
+
+class ModelNotReady(Exception):
+    """Raised when a request arrives before the model has loaded, or after loading failed"""
+
+
+class ModelHostBusy(Exception):
+    """Raised when the host's request queue is full"""
+
+
+class ModelHost:
+    """
+    One loaded model shared by every concurrent stream in the process.
+
+    The model is loaded and warmed up once, in the background, by start(). Requests
+    are queued to a small worker pool, so memory stays at one copy of the model no
+    matter how many connections are open, and `ready` reports when it can serve.
+
+    Example:
+        tts = ModelHost("tts", get_tts_model, warmup=lambda m: list(m.stream_tts_sync("Hello.")))
+        tts.start()
+        for chunk in tts.stream(lambda m: m.stream_tts_sync("Hi there")):
+            play(chunk)
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None,
+                 workers: int = MODEL_HOST_WORKERS, max_queue: int = MODEL_HOST_MAX_QUEUE):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.error = None
+        self._ready = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"model-{name}")
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_queue)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.error is None
+
+    def status(self) -> Dict[str, Any]:
+        if self.error is not None:
+            state = "failed"
+        elif self._ready.is_set():
+            state = "ready"
+        else:
+            state = "loading" if self._started else "stopped"
+        return {"name": self.name, "state": state, "error": str(self.error) if self.error else None}
+
+    def _load(self) -> None:
+        try:
+            model = self.loader()
+            if self.warmup is not None:
+                # The first inference pays for JIT/graph initialization; do it before serving
+                self.warmup(model)
+            self.model = model
+            logger.info("Model host '%s' ready", self.name)
+        except Exception as e:
+            self.error = e
+            logger.error("Model host '%s' failed to load: %s", self.name, e)
+        finally:
+            self._ready.set()
+
+    def start(self, background: bool = True) -> "ModelHost":
+        """Load and warm up the model once; later calls do nothing"""
+        with self._start_lock:
+            if self._started:
+                return self
+            self._started = True
+        if background:
+            threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+        else:
+            self._load()
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = MODEL_READY_TIMEOUT_S) -> bool:
+        """Block until the model is loaded (starting it if needed); returns whether it is usable"""
+        self.start()
+        self._ready.wait(timeout)
+        return self.ready
+
+    def _acquire(self) -> None:
+        if not self.wait_ready():
+            raise ModelNotReady(f"Model '{self.name}' is not ready: {self.error or 'still loading'}")
+        if not self._slots.acquire(blocking=False):
+            raise ModelHostBusy(f"Model '{self.name}' has too many queued requests")
+
+    def submit(self, function: Callable[[Any], Any]) -> Future:
+        """Queue function(model) and return a Future with its result"""
+        self._acquire()
+
+        def run():
+            try:
+                return function(self.model)
+            finally:
+                self._slots.release()
+
+        return self._pool.submit(contextvars.copy_context().run, run)
+
+    def run(self, function: Callable[[Any], Any]) -> Any:
+        """Queue function(model) and wait for its result"""
+        return self.submit(function).result()
+
+    def stream(self, function: Callable[[Any], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Queue a generating call such as TTS and yield its items as the worker produces them.
+
+        The worker holds the model for the whole generation, so streams are served one
+        after another per worker instead of interleaving on the same model. Closing the
+        returned generator (barge-in, hang-up) stops the generation at the next item and
+        frees the worker.
+        """
+        items = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce(model):
+            generation = None
+            try:
+                if cancelled.is_set():
+                    return
+                generation = function(model)
+                for item in generation:
+                    if cancelled.is_set():
+                        return
+                    items.put(item)
+            except Exception as e:
+                items.put(e)
+            finally:
+                close = getattr(generation, "close", None)
+                if close is not None:
+                    close()
+                items.put(_END)
+
+        self.submit(produce)
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+
+_hosts: Dict[str, ModelHost] = {}
+_hosts_lock = threading.Lock()
+
+
+def get_model_host(name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None,
+                   **kwargs) -> ModelHost:
+    """Return the process-wide host for a model, creating it on first use"""
+    with _hosts_lock:
+        if name not in _hosts:
+            _hosts[name] = ModelHost(name, loader, warmup, **kwargs)
+        return _hosts[name]
+
+
+def model_hosts_status() -> Dict[str, Dict[str, Any]]:
+    """Readiness of every model host, for health checks"""
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return {host.name: host.status() for host in hosts}
+
+
+def model_hosts_ready() -> bool:
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return all(host.ready for host in hosts)
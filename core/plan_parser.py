@@ -0,0 +1,286 @@
+import re
+import json
+import difflib
+from typing import Dict, Any, List, Optional, Tuple
+
+# Keys planners use for the tool name and its arguments, in order of preference
+TOOL_NAME_KEYS = ("tool_name", "tool", "name", "function_name", "function", "action")
+PARAMETER_KEYS = ("parameters", "params", "arguments", "args", "input", "inputs")
+
+# Minimum difflib ratio for a misspelled tool or parameter name to be corrected
+NAME_MATCH_CUTOFF = 0.8
+
+_CLOSERS = {"[": "]", "{": "}"}
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class PlanParseError(ValueError):
+    """Raised when no JSON value can be recovered from a planner response"""
+
+
+def _balanced_fragment(text: str, start: int) -> Optional[str]:
+    """
+    The JSON value opening at text[start], found by bracket matching in one pass.
+
+    Brackets inside strings are ignored. A response cut off inside a top-level array
+    is truncated after its last complete element and closed, so the finished tasks
+    are still usable.
+    """
+    stack = []
+    quote = None
+    escape = False
+    last_complete = None
+    for pos in range(start, len(text)):
+        ch = text[pos]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "[{":
+            stack.append(ch)
+        elif ch in "]}":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                return None
+            stack.pop()
+            if not stack:
+                return text[start:pos + 1]
+            if len(stack) == 1:
+                last_complete = pos + 1
+    if stack and stack[0] == "[" and last_complete is not None:
+        return text[start:last_complete] + "]"
+    return None
+
+
+def repair_json(fragment: str) -> str:
+    """
+    Fix the mistakes LLMs commonly make in JSON, in one pass: trailing commas,
+    // and /* */ comments, single-quoted strings, raw newlines inside strings
+    and Python literals (True, False, None).
+    """
+    out = []
+    i, n = 0, len(fragment)
+    while i < n:
+        ch = fragment[i]
+        if ch in "\"'":
+            quote, j, chars = ch, i + 1, []
+            while j < n and fragment[j] != quote:
+                c = fragment[j]
+                if c == "\\" and j + 1 < n:
+                    # \' is not a JSON escape; an escaped quote of the other kind needs no escape
+                    chars.append("'" if fragment[j + 1] == "'" else fragment[j:j + 2])
+                    j += 2
+                    continue
+                chars.append('\\"' if c == '"' else "\\n" if c == "\n" else c)
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+        elif fragment.startswith("//", i):
+            end = fragment.find("\n", i)
+            i = n if end == -1 else end
+        elif fragment.startswith("/*", i):
+            end = fragment.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif ch == ",":
+            rest = fragment[i + 1:].lstrip()
+            if rest[:1] not in ("]", "}", ""):
+                out.append(ch)
+            i += 1
+        elif ch.isalpha():
+            match = re.match(r"[A-Za-z_]\w*", fragment[i:])
+            word = match.group(0)
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def loads_tolerant(fragment: str) -> Any:
+    """json.loads, retried once on the repaired text"""
+    try:
+        return json.loads(fragment)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(fragment))
+
+
+def extract_json(text: str, openers: str = "[{") -> Any:
+    """
+    Find and parse the first JSON value in an LLM response.
+
+    Prose, ```json fences and trailing explanations around the value are skipped.
+
+    Args:
+        text (str): Response text
+        openers (str): Characters a candidate value may start with ("[", "{" or both)
+
+    Returns:
+        Any: The parsed value
+
+    Raises:
+        PlanParseError: If no candidate parses, even after repair
+    """
+    text = text or ""
+    last_error = "No JSON found in the response"
+    for match in re.finditer("[" + re.escape(openers) + "]", text):
+        fragment = _balanced_fragment(text, match.start())
+        if fragment is None:
+            continue
+        try:
+            return loads_tolerant(fragment)
+        except json.JSONDecodeError as e:
+            last_error = f"{e}: {fragment[:80]}"
+    raise PlanParseError(last_error)
+
+
+def parse_plan(text: str) -> List[Any]:
+    """
+    Extract the raw task list from a planner response.
+
+    Accepts a task array, an object wrapping it under "tasks", or a single task object.
+
+    Raises:
+        PlanParseError: If the response contains no usable plan
+    """
+    value = extract_json(text)
+    if isinstance(value, dict):
+        value = value.get("tasks", value.get("plan", [value]))
+    if not isinstance(value, list):
+        raise PlanParseError(f"Expected a list of tasks, got {type(value).__name__}")
+    return value
+
+
+def tool_schemas(tools: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Parameter schemas by tool name, from the function-calling definitions in core/config.tools"""
+    return {tool["function"]["name"]: tool["function"].get("parameters", {}) for tool in tools}
+
+
+def _simplify(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def match_name(name: str, candidates: List[str]) -> Optional[str]:
+    """The candidate a possibly misspelled name refers to (get_weather for getWeather or get_wether), or None"""
+    if name in candidates:
+        return name
+    simple = _simplify(name)
+    for candidate in candidates:
+        if _simplify(candidate) == simple:
+            return candidate
+    close = difflib.get_close_matches(simple, [_simplify(c) for c in candidates], n=1, cutoff=NAME_MATCH_CUTOFF)
+    if close:
+        return next(c for c in candidates if _simplify(c) == close[0])
+    return None
+
+
+def _coerce(value: Any, expected: str) -> Any:
+    """Convert a parameter value to the schema type when the conversion is lossless"""
+    if expected == "string" and isinstance(value, (int, float, bool)):
+        return str(value).lower() if isinstance(value, bool) else str(value)
+    if expected in ("integer", "number") and isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            return value
+        return int(number) if expected == "integer" and number.is_integer() else number
+    if expected == "boolean" and isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    return value
+
+
+def _requires(value: Any) -> List[int]:
+    values = value if isinstance(value, list) else [value]
+    requires = []
+    for r in values:
+        if isinstance(r, str) and r.strip().isdigit():
+            r = int(r.strip())
+        if isinstance(r, int) and not isinstance(r, bool):
+            requires.append(r)
+    return requires
+
+
+def validate_task(task: Any, schemas: Dict[str, Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Check one planned task against the tool schemas and repair what can be repaired locally.
+
+    Repairs: alternative keys for the tool name and parameters (including OpenAI-style
+    {"function": {"name", "arguments"}}), arguments given as a JSON string, misspelled
+    or differently cased tool and parameter names, parameters placed next to the tool
+    name, a bare value for a single-parameter tool, scalar types, and "requires" given
+    as a number or strings. Unknown parameters are dropped.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], List[str]]: The repaired task (None if it cannot
+                                                    be used) and a note per repair or problem
+    """
+    notes = []
+    if not isinstance(task, dict):
+        return None, [f"Task is not an object: {str(task)[:80]}"]
+
+    raw_name, raw_parameters = None, None
+    function = task.get("function")
+    if isinstance(function, dict):
+        raw_name = function.get("name")
+        raw_parameters = function.get("arguments", function.get("parameters"))
+    if raw_name is None:
+        raw_name = next((task[key] for key in TOOL_NAME_KEYS if isinstance(task.get(key), str)), None)
+    if raw_name is None:
+        return None, [f"Task has no tool name: {json.dumps(task, default=str)[:80]}"]
+
+    tool_name = match_name(raw_name.strip(), list(schemas))
+    if tool_name is None:
+        return None, [f"Invalid tool name: {raw_name}"]
+    if tool_name != raw_name:
+        notes.append(f"tool name {raw_name!r} -> {tool_name!r}")
+
+    schema = schemas[tool_name]
+    properties = schema.get("properties", {})
+    if raw_parameters is None:
+        raw_parameters = next((task[key] for key in PARAMETER_KEYS if key in task), None)
+    if isinstance(raw_parameters, str):
+        try:
+            raw_parameters = loads_tolerant(raw_parameters)
+        except json.JSONDecodeError:
+            # A bare value is taken as the tool's only (or first required) parameter
+            target = (schema.get("required") or list(properties) or [None])[0]
+            if target is not None:
+                notes.append(f"bare argument used as '{target}'")
+                raw_parameters = {target: raw_parameters}
+    if not isinstance(raw_parameters, dict):
+        raw_parameters = {}
+    raw_parameters = dict(raw_parameters)
+    for key in properties:
+        # Parameters written next to the tool name instead of inside "parameters"
+        if key not in raw_parameters and key in task and key not in TOOL_NAME_KEYS:
+            raw_parameters[key] = task[key]
+            notes.append(f"moved '{key}' into parameters")
+
+    parameters = {}
+    for key, value in raw_parameters.items():
+        name = key if key in properties else match_name(str(key), [p for p in properties if p not in raw_parameters])
+        if name is None:
+            notes.append(f"dropped unknown parameter '{key}'")
+            continue
+        if name != key:
+            notes.append(f"parameter '{key}' -> '{name}'")
+        coerced = _coerce(value, properties[name].get("type", "string"))
+        if coerced is not value and coerced != value:
+            notes.append(f"'{name}' converted to {properties[name].get('type')}")
+        parameters[name] = coerced
+
+    repaired = {"tool_name": tool_name, "parameters": parameters}
+    if "requires" in task:
+        repaired["requires"] = _requires(task["requires"])
+        if repaired["requires"] != task["requires"]:
+            notes.append("normalized 'requires'")
+
+    # A missing required parameter can still be filled from the results of required tasks
+    missing = [p for p in schema.get("required", []) if p not in parameters]
+    if missing and not repaired.get("requires"):
+        return None, notes + [f"{tool_name} is missing required parameter(s) {missing}"]
+    return repaired, notes
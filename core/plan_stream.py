@@ -0,0 +1,90 @@
+import json
+from typing import List, Any
+from core.plan_parser import loads_tolerant
+
+
+class IncrementalTaskParser:
+    """
+    Incremental parser for a JSON array of task objects arriving in chunks.
+
+    Text before the opening '[' (explanations, a ```json fence) is skipped. Every
+    top-level object inside the array is emitted as soon as its closing brace arrives,
+    so the executor can start it while the planner is still writing the rest of the plan.
+    Objects with common JSON mistakes (trailing commas, single quotes) are repaired.
+
+    Example:
+        parser = IncrementalTaskParser()
+        for chunk in stream:
+            for task in parser.feed(chunk):
+                start(task)
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.tasks: List[Any] = []
+        self.errors: List[str] = []
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_started = False
+        self._array_closed = False
+        self._object_start = None
+
+    @property
+    def complete(self) -> bool:
+        """True once the closing bracket of the task array has been seen"""
+        return self._array_closed
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next piece of the planner response.
+
+        Args:
+            chunk (str): Newly streamed text
+
+        Returns:
+            List[Any]: Task objects completed by this chunk, in order
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        while self._pos < len(text) and not self._array_closed:
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif not self._array_started:
+                # Skip any prose or code fence before the array
+                if ch == "[":
+                    self._array_started = True
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                if ch == "{" and self._depth == 1:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if ch == "}" and self._depth == 1 and self._object_start is not None:
+                    fragment = text[self._object_start:self._pos + 1]
+                    self._object_start = None
+                    try:
+                        task = loads_tolerant(fragment)
+                        self.tasks.append(task)
+                        completed.append(task)
+                    except json.JSONDecodeError as e:
+                        self.errors.append(f"{e}: {fragment[:80]}")
+                elif self._depth == 0:
+                    self._array_closed = True
+
+            self._pos += 1
+
+        return completed
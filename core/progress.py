@@ -0,0 +1,38 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, Optional
+
+# Events reported while a query is processed
+TASK_STARTED = "task_started"      # tool_name, parameters, task_number
+TASK_FINISHED = "task_finished"    # tool_name, status, task_number
+ANSWER_DELTA = "answer_delta"      # text: the next piece of the streamed final answer
+
+# Listener of the query being processed in this context
+_listener = contextvars.ContextVar("gyanova_progress", default=None)
+
+
+def active() -> bool:
+    """True if someone is listening for progress events (e.g. the voice pipeline)"""
+    return _listener.get() is not None
+
+
+def emit(event: str, **data: Any) -> None:
+    """Report a progress event to the current listener; a no-op without progress_scope()"""
+    listener = _listener.get()
+    if listener is not None:
+        listener(event, data)
+
+
+@contextmanager
+def progress_scope(listener: Optional[Callable[[str, Dict[str, Any]], None]]) -> Iterator[None]:
+    """
+    Send progress events of queries processed in the block to listener(event, data).
+
+    Tool tasks run on worker threads that inherit the listener through copied contexts,
+    so the listener must be thread-safe (a queue.Queue's put is a good choice).
+    """
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
@@ -0,0 +1,148 @@
+import re
+import zlib
+import random
+import threading
+import unicodedata
+from typing import Dict, List, Tuple, Optional, Hashable, Iterable
+
+# Length of the character shingles compared between texts
+NGRAM_SIZE = 3
+
+# MinHash signature length; split into bands for locality-sensitive lookup
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> set:
+    """Set of character n-grams of the normalized text (padded so short texts still produce shingles)"""
+    text = f" {normalize_text(text)} "
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    """Exact Jaccard similarity of two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def containment(a: set, b: set) -> float:
+    """Share of a's shingles that also occur in b, for matching a short text against a longer one"""
+    if not a:
+        return 1.0
+    return len(a & b) / len(a)
+
+
+class MinHasher:
+    """Fixed family of hash permutations turning a shingle set into a MinHash signature"""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = 1):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_permutations)
+        ]
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles] or [0]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        )
+
+
+class MinHashIndex:
+    """
+    Local near-duplicate index over short texts.
+
+    Candidates are found with MinHash LSH (texts sharing any band of their signature)
+    and then ranked by exact n-gram Jaccard similarity, so lookups stay cheap as the
+    index grows and need no external service.
+
+    Example:
+        index = MinHashIndex(threshold=0.85)
+        index.add("q1", "weather in Kolhapur")
+        index.query("Weather in KOLHAPUR!")  # -> ("q1", 1.0)
+        index.query("weather in Pune")       # -> None
+    """
+
+    def __init__(self, threshold: float = 0.85, num_permutations: int = NUM_PERMUTATIONS,
+                 num_bands: int = NUM_BANDS):
+        self.threshold = threshold
+        self.rows = max(1, num_permutations // num_bands)
+        self.hasher = MinHasher(num_permutations)
+        self._shingles: Dict[Hashable, set] = {}
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(n, signature[start:start + self.rows])
+                for n, start in enumerate(range(0, len(signature), self.rows))]
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index text under key, replacing any text previously stored under the same key"""
+        shingles = char_ngrams(text)
+        signature = self.hasher.signature(shingles)
+        with self._lock:
+            self._remove(key)
+            self._shingles[key] = shingles
+            self._signatures[key] = signature
+            for band in self._bands(signature):
+                self._buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        signature = self._signatures.pop(key, None)
+        self._shingles.pop(key, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def query(self, text: str, threshold: Optional[float] = None) -> Optional[Tuple[Hashable, float]]:
+        """
+        Find the most similar indexed text.
+
+        Args:
+            text (str): Text to look up
+            threshold (float, optional): Minimum Jaccard similarity; defaults to the index threshold
+
+        Returns:
+            Optional[Tuple[Hashable, float]]: (key, similarity) of the best match, or None
+        """
+        threshold = self.threshold if threshold is None else threshold
+        shingles = char_ngrams(text)
+        signature = self.hasher.signature(shingles)
+        with self._lock:
+            candidates = set()
+            for band in self._bands(signature):
+                candidates |= self._buckets.get(band, set())
+            scored = [(key, jaccard(shingles, self._shingles[key])) for key in candidates]
+        best = max(scored, key=lambda item: item[1], default=None)
+        if best is None or best[1] < threshold:
+            return None
+        return best
@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Callable, Optional
+from core.config import TOOL_POLICIES
+from core.memo import ToolMemo, canonical_key
+from core import telemetry
+from core.log import get_logger, preview
+
+logger = get_logger("speculation")
+
+# Start likely tool calls while the planner is still running
+SPECULATIVE_EXECUTION = os.getenv("SPECULATIVE_EXECUTION", "true").lower() in ["true", "1", "yes"]
+
+# Cheap local signals: keywords that predict a location-based tool
+TOOL_KEYWORDS = {
+    "get_weather": re.compile(r'\b(weather|temperature|forecast|rain(ing)?|humid(ity)?|sunny|cloudy)\b', re.IGNORECASE),
+    "findDateTime": re.compile(r'\b(time|date|clock)\b', re.IGNORECASE),
+}
+
+# "in Kolhapur", "at barrie, ontario, canada" — up to punctuation or a joining word
+LOCATION_PATTERN = re.compile(
+    r'\b(?:in|at|for)\s+([a-z][\w\s,.\'-]*?)'
+    r'(?=\s+(?:and|then|also|send|email|please|today|now|tomorrow|right)\b|[?!;]|\.\s|\.$|$)',
+    re.IGNORECASE
+)
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATION_MAX_WORKERS", "4")))
+
+# Process-wide totals, reported by speculation_stats()
+_stats_lock = threading.Lock()
+_stats = {"started": 0, "used": 0, "wasted": 0, "latency_saved_s": 0.0, "wasted_s": 0.0}
+
+
+def predict_tool_calls(user_query: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Guess side-effect-free tool calls from the query text alone.
+
+    Args:
+        user_query (str): The user's query
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: (tool_name, parameters) pairs; empty if no location is mentioned
+    """
+    match = LOCATION_PATTERN.search(user_query)
+    if not match:
+        return []
+    location = match.group(1).strip(" ,.'")
+    if not location:
+        return []
+
+    predictions = []
+    for tool_name, pattern in TOOL_KEYWORDS.items():
+        if TOOL_POLICIES.get(tool_name, {}).get("speculative") and pattern.search(user_query):
+            predictions.append((tool_name, {"location": location}))
+    return predictions
+
+
+class Speculation:
+    """Speculative tool calls started for one query, feeding their results into the query's memo"""
+
+    def __init__(self, memo: ToolMemo):
+        self.memo = memo
+        self.calls: Dict[str, Dict[str, Any]] = {}
+
+    def start(self, user_query: str, functions: Dict[str, Any],
+              call_tool: Optional[Callable[[str, Callable, Dict[str, Any]], Any]] = None) -> "Speculation":
+        """
+        Submit predicted calls; the planned task with the same key will hit (or join) them in the memo.
+
+        Args:
+            user_query (str): The user's query
+            functions (Dict[str, Any]): Tool functions by name
+            call_tool (Callable, optional): Runs call_tool(tool_name, function, parameters) for each
+                                            predicted call. Pass the agent's timeout wrapper, so a
+                                            speculative call gets the same timeout, cancellation and
+                                            backend as the planned task that may join it
+        """
+        if not SPECULATIVE_EXECUTION:
+            return self
+        if call_tool is None:
+            call_tool = lambda tool_name, function, parameters: function(**parameters)
+        for tool_name, parameters in predict_tool_calls(user_query):
+            key = canonical_key(tool_name, parameters)
+            call = {"tool_name": tool_name, "started": time.perf_counter(), "finished": None}
+            self.calls[key] = call
+
+            def run(tool_name=tool_name, parameters=parameters, call=call):
+                try:
+                    with telemetry.span(f"tool.{tool_name}", telemetry.STAGE_TOOL, tool_name=tool_name, speculative=True) as span:
+                        result, cache_hit = self.memo.call(
+                            tool_name, parameters, lambda: call_tool(tool_name, functions[tool_name], parameters))
+                        span.set(cache_hit=cache_hit)
+                        span.record_payload(parameters, result)
+                except Exception as e:
+                    # A joined planned task receives the same error through the memo
+                    logger.debug("Speculative %s failed: %s", tool_name, e)
+                finally:
+                    call["finished"] = time.perf_counter()
+
+            _pool.submit(contextvars.copy_context().run, run)
+            logger.debug("Speculatively started %s with parameters %s", tool_name, preview(parameters, 200))
+        return self
+
+    def settle(self, tasks: List[Dict[str, Any]], plan_ready_at: float) -> Dict[str, Any]:
+        """
+        Compare speculative calls with the plan and record what was used or wasted.
+
+        Args:
+            tasks (List[Dict[str, Any]]): Validated planned tasks
+            plan_ready_at (float): perf_counter() value when the plan became available
+
+        Returns:
+            Dict[str, Any]: used/wasted counts and estimated seconds saved and wasted
+        """
+        if not self.calls:
+            return {}
+        planned = {canonical_key(t["tool_name"], t.get("parameters") or {}) for t in tasks}
+        result = {"started": len(self.calls), "used": 0, "wasted": 0, "latency_saved_s": 0.0, "wasted_s": 0.0}
+        for key, call in self.calls.items():
+            finished = call["finished"] or time.perf_counter()
+            if key in planned:
+                result["used"] += 1
+                # Tool time that overlapped with planning instead of following it
+                result["latency_saved_s"] += max(0.0, min(finished, plan_ready_at) - call["started"])
+            else:
+                # Unmatched results stay in the memo unused and are simply discarded
+                result["wasted"] += 1
+                result["wasted_s"] += finished - call["started"]
+
+        with _stats_lock:
+            for name, value in result.items():
+                _stats[name] += value
+        with telemetry.span(telemetry.STAGE_SPECULATION, telemetry.STAGE_SPECULATION, **result):
+            pass
+        logger.info("Speculation: %d used, %d wasted, ~%.2fs saved", result["used"], result["wasted"], result["latency_saved_s"])
+        return result
+
+
+def speculation_stats() -> Dict[str, Any]:
+    """Totals of speculative calls started, used and wasted since the process started"""
+    with _stats_lock:
+        return dict(_stats)
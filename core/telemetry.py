@@ -0,0 +1,440 @@
+import os
+import json
+import math
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+from core.log import get_logger
+
+logger = get_logger("telemetry")
+
+# Stage names used across the agent pipeline
+STAGE_QUERY = "query"
+STAGE_PLANNING = "planning"
+STAGE_CONTEXT = "context_rewrite"
+STAGE_TOOL = "tool"
+STAGE_SYNTHESIS = "synthesis"
+STAGE_COMPACTION = "compaction"
+STAGE_SPECULATION = "speculation"
+STAGE_ANSWER_CACHE = "answer_cache"
+STAGE_GENERATION = "tool_generation"
+
+# Trace of the query currently being processed on this thread / task
+_current_trace = contextvars.ContextVar("gyanova_trace", default=None)
+_current_span = contextvars.ContextVar("gyanova_span", default=None)
+
+
+def _payload_bytes(payload: Any) -> int:
+    """Return the UTF-8 size of a payload as it would be sent over the wire"""
+    if payload is None:
+        return 0
+    if isinstance(payload, bytes):
+        return len(payload)
+    if not isinstance(payload, str):
+        try:
+            payload = json.dumps(payload, default=str)
+        except (TypeError, ValueError):
+            payload = str(payload)
+    return len(payload.encode("utf-8"))
+
+
+class Span:
+    """A single timed unit of work inside a query trace"""
+
+    def __init__(self, name: str, stage: str, trace_id: str, parent_id: Optional[str] = None,
+                 queued_at: Optional[float] = None, **attributes):
+        self.name = name
+        self.stage = stage
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        # Time spent waiting to run after the span became runnable
+        self.queue_time = max(0.0, self.start - queued_at) if queued_at is not None else 0.0
+        self.attributes = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cache_hit": False,
+            "request_bytes": 0,
+            "response_bytes": 0,
+        }
+        self.attributes.update(attributes)
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_usage(self, response: Any) -> None:
+        """Copy token counts from a Groq/OpenAI-compatible response's `usage` field"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.attributes["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        self.attributes["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def record_payload(self, request: Any = None, response: Any = None) -> None:
+        self.attributes["request_bytes"] += _payload_bytes(request)
+        self.attributes["response_bytes"] += _payload_bytes(response)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "stage": self.stage,
+            "start_time": self.start_wall,
+            "duration_s": round(self.duration, 6),
+            "queue_time_s": round(self.queue_time, 6),
+            "error": self.error,
+            **self.attributes,
+        }
+
+
+class Trace:
+    """All spans recorded while processing one user query"""
+
+    def __init__(self, name: str = STAGE_QUERY, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Total wall time per span name (e.g. planning, tool.get_weather, synthesis)"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def totals(self) -> Dict[str, Any]:
+        """Aggregate token and call counts across the whole trace"""
+        llm_spans = [s for s in self.spans if s.attributes.get("llm")]
+        root = next((s for s in self.spans if s.stage == STAGE_QUERY), None)
+        return {
+            "latency_s": root.duration if root else sum(s.duration for s in self.spans),
+            "llm_calls": len(llm_spans),
+            "prompt_tokens": sum(s.attributes["prompt_tokens"] for s in llm_spans),
+            "completion_tokens": sum(s.attributes["completion_tokens"] for s in llm_spans),
+            "tool_calls": sum(1 for s in self.spans if s.stage == STAGE_TOOL),
+            "cache_hits": sum(1 for s in self.spans if s.attributes.get("cache_hit")),
+        }
+
+
+class JsonLinesSink:
+    """Append one JSON object per span to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in trace.spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(lines)
+
+
+class PrometheusSink:
+    """Accumulate per-stage metrics and render them in the Prometheus text format"""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[tuple, float] = {}
+
+    def _inc(self, metric: str, labels: tuple, value: float) -> None:
+        key = (metric, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def export(self, trace: Trace) -> None:
+        with self._lock:
+            for span in trace.spans:
+                hist = self._histograms.setdefault(span.name, {
+                    "buckets": [0] * len(self.BUCKETS), "sum": 0.0, "count": 0
+                })
+                for i, bound in enumerate(self.BUCKETS):
+                    if span.duration <= bound:
+                        hist["buckets"][i] += 1
+                hist["sum"] += span.duration
+                hist["count"] += 1
+
+                labels = (("stage", span.name),)
+                self._inc("gyanova_queue_seconds_total", labels, span.queue_time)
+                self._inc("gyanova_prompt_tokens_total", labels, span.attributes["prompt_tokens"])
+                self._inc("gyanova_completion_tokens_total", labels, span.attributes["completion_tokens"])
+                self._inc("gyanova_payload_bytes_total", labels,
+                          span.attributes["request_bytes"] + span.attributes["response_bytes"])
+                if span.attributes.get("cache_hit"):
+                    self._inc("gyanova_cache_hits_total", labels, 1)
+                if span.error:
+                    self._inc("gyanova_errors_total", labels, 1)
+                if span.attributes.get("cancelled"):
+                    self._inc("gyanova_cancelled_total", labels, 1)
+                    self._inc("gyanova_cancelled_seconds_total", labels, span.duration)
+            rendered = self.render_unlocked()
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(rendered)
+            os.replace(tmp_path, self.path)
+
+    def render(self) -> str:
+        with self._lock:
+            return self.render_unlocked()
+
+    def render_unlocked(self) -> str:
+        lines = [
+            "# HELP gyanova_stage_duration_seconds Wall time per pipeline stage",
+            "# TYPE gyanova_stage_duration_seconds histogram",
+        ]
+        for stage, hist in sorted(self._histograms.items()):
+            for bound, count in zip(self.BUCKETS, hist["buckets"]):
+                lines.append(f'gyanova_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'gyanova_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'gyanova_stage_duration_seconds_sum{{stage="{stage}"}} {hist["sum"]:.6f}')
+            lines.append(f'gyanova_stage_duration_seconds_count{{stage="{stage}"}} {hist["count"]}')
+
+        seen = set()
+        for (metric, labels), value in sorted(self._counters.items()):
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class OTLPJsonSink:
+    """Write traces as OTLP/JSON (OpenTelemetry protocol) records, one trace per line"""
+
+    def __init__(self, path: str, service_name: str = "gyanova"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def to_otlp(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        for span in trace.spans:
+            start_ns = int(span.start_wall * 1e9)
+            attributes = [
+                {"key": f"gyanova.{key}", "value": self._value(value)}
+                for key, value in span.attributes.items()
+            ]
+            attributes.append({"key": "gyanova.stage", "value": {"stringValue": span.stage}})
+            attributes.append({"key": "gyanova.queue_time_s", "value": {"doubleValue": span.queue_time}})
+            spans.append({
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(span.duration * 1e9)),
+                "attributes": attributes,
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}}
+            ]},
+            "scopeSpans": [{"scope": {"name": "gyanova.telemetry"}, "spans": spans}],
+        }]}
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def export(self, trace: Trace) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(self.to_otlp(trace)) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+
+_sinks: List[Any] = []
+_sinks_lock = threading.Lock()
+
+# Sinks created by configure_from_env, replaced when it is called again
+_env_sinks: List[Any] = []
+
+
+def add_sink(sink: Any) -> Any:
+    """Register a sink; any object with an `export(trace)` method works"""
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: Any) -> None:
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def get_sinks() -> List[Any]:
+    with _sinks_lock:
+        return list(_sinks)
+
+
+def configure_from_env() -> None:
+    """
+    Create sinks listed in TELEMETRY_SINKS (comma separated: jsonl, prometheus, otlp).
+
+    Runs on import. Calling it again replaces the sinks it created before instead of
+    adding a second copy of each.
+    """
+    names = [n.strip().lower() for n in os.getenv("TELEMETRY_SINKS", "").split(",") if n.strip()]
+    directory = os.getenv("TELEMETRY_DIR", "telemetry")
+    sinks = []
+    for name in names:
+        if name == "jsonl":
+            sinks.append(JsonLinesSink(os.path.join(directory, "spans.jsonl")))
+        elif name == "prometheus":
+            sinks.append(PrometheusSink(os.path.join(directory, "metrics.prom")))
+        elif name == "otlp":
+            sinks.append(OTLPJsonSink(os.path.join(directory, "traces.otlp.jsonl")))
+        else:
+            logger.warning("Unknown telemetry sink: %s", name)
+    with _sinks_lock:
+        for sink in _env_sinks:
+            if sink in _sinks:
+                _sinks.remove(sink)
+        _sinks.extend(sinks)
+        _env_sinks[:] = sinks
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def _export(trace: Trace) -> None:
+    for sink in get_sinks():
+        try:
+            sink.export(trace)
+        except Exception as e:
+            logger.warning("Telemetry sink %s failed: %s", type(sink).__name__, e)
+
+
+@contextmanager
+def start_trace(name: str = STAGE_QUERY, **attributes) -> Iterator[Trace]:
+    """
+    Start a trace for one query, or join the trace already active in this context.
+
+    Only the outermost trace is exported, so callers such as test_agent.py can open
+    a trace around `process_user_query` and read its spans afterwards.
+    """
+    existing = _current_trace.get()
+    if existing is not None:
+        yield existing
+        return
+
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, STAGE_QUERY, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        _export(trace)
+
+
+@contextmanager
+def span(name: str, stage: str, queued_at: Optional[float] = None, **attributes) -> Iterator[Span]:
+    """Time a block of work as a span of the current trace (a no-op trace is created if none)"""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(
+        name,
+        stage,
+        trace.trace_id if trace else uuid.uuid4().hex,
+        parent_id=parent.span_id if parent else None,
+        queued_at=queued_at,
+        **attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        if getattr(e, "cancelled", False):
+            # Work thrown away because the query was cancelled (see core.deadline.QueryCancelled)
+            current.attributes["cancelled"] = True
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        if trace is not None:
+            trace.add(current)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_traces(traces: List[Trace]) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate p50/p95 latency per stage across many traces.
+
+    Args:
+        traces (List[Trace]): Traces collected for a set of queries
+
+    Returns:
+        Dict[str, Dict[str, float]]: Stage name -> count, p50, p95 and mean seconds
+    """
+    per_stage: Dict[str, List[float]] = {}
+    for trace in traces:
+        for stage, duration in trace.stage_durations().items():
+            per_stage.setdefault(stage, []).append(duration)
+
+    summary = {}
+    for stage, durations in sorted(per_stage.items()):
+        summary[stage] = {
+            "count": len(durations),
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "mean": sum(durations) / len(durations),
+        }
+    return summary
+
+
+configure_from_env()
@@ -0,0 +1,74 @@
+import os
+import json
+import importlib
+import threading
+from typing import Dict, Any, List, Callable
+
+# JSON manifest of generated tools, loaded into the registry by core/config.py at import
+TOOL_MANIFEST = os.getenv("TOOL_MANIFEST", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools", "generated_tools.json"
+))
+
+
+class ToolManifest:
+    """
+    Registry store for generated tools, kept as one JSON object keyed by tool name.
+
+    Replaces editing tools/__init__.py and core/config.py with regular expressions.
+    Adding or replacing a tool is a dictionary insert. A whole batch is written at once,
+    to a temporary file that then atomically replaces the manifest, so readers never
+    see a half-written file and the cost of a batch does not grow with the config file.
+
+    Entry format:
+        {"name": "reverse_text", "module": "tools.reverse_text_tool", "function": "reverse_text",
+         "description": "...", "parameters": {"text": "string - Text to reverse"}, "policy": {...}}
+    """
+
+    def __init__(self, path: str = TOOL_MANIFEST):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def add(self, entries: List[Dict[str, Any]]) -> None:
+        """Add or replace several tools with a single write"""
+        if not entries:
+            return
+        with self._lock:
+            manifest = self.load()
+            for entry in entries:
+                manifest[entry["name"]] = entry
+            self._write(manifest)
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            manifest = self.load()
+            if manifest.pop(name, None) is None:
+                return False
+            self._write(manifest)
+            return True
+
+    def _write(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+
+def import_tool(entry: Dict[str, Any], reload: bool = False) -> Callable:
+    """Import the function of a manifest entry (reloading its module to pick up a rewritten file)"""
+    importlib.invalidate_caches()
+    module = importlib.import_module(entry["module"])
+    if reload:
+        module = importlib.reload(module)
+    return getattr(module, entry["function"])
@@ -0,0 +1,192 @@
+import os
+import json
+import signal
+import logging
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory limits are then not enforced
+    resource = None
+
+# Worker processes running tools whose TOOL_POLICIES "backend" is "process"
+TOOL_PROCESS_WORKERS = int(os.getenv("TOOL_PROCESS_WORKERS", "2"))
+
+# Address space limit per worker process, in MB (0 disables the limit)
+TOOL_PROCESS_MEMORY_MB = int(os.getenv("TOOL_PROCESS_MEMORY_MB", "1024"))
+
+# "spawn" starts clean interpreters; "fork" is faster but unsafe with the orchestrator's threads
+TOOL_PROCESS_START_METHOD = os.getenv("TOOL_PROCESS_START_METHOD", "spawn")
+
+# Extra seconds a worker gives a call beyond its timeout before interrupting it
+TIME_LIMIT_GRACE_S = 1.0
+
+
+class ToolTimeLimitExceeded(Exception):
+    """Raised inside a worker process when a tool call runs past its time limit"""
+
+
+def _on_time_limit(signum, frame):
+    raise ToolTimeLimitExceeded("Tool call exceeded its time limit in the worker process")
+
+
+def _init_worker(modules: List[str], memory_mb: int) -> None:
+    """Runs once per worker process: apply the memory limit and preload the tool modules"""
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _on_time_limit)
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logging.getLogger("gyanova.tool_processes").warning("Tool worker could not preload %s: %s", module, e)
+
+
+def _run_in_worker(module: str, function: str, parameters: Dict[str, Any], time_limit: float) -> bytes:
+    """Call module.function(**parameters) under a time limit and return the result as compact JSON"""
+    function_to_call = getattr(importlib.import_module(module), function)
+    use_timer = hasattr(signal, "setitimer") and time_limit > 0
+    if use_timer:
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        result = function_to_call(**parameters)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return json.dumps(result, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ToolProcessPool:
+    """
+    Warm pool of worker processes for tools that must not run on the orchestrator's threads.
+
+    CPU-heavy or GIL-holding tools, and LLM-written tools from agent_generator.py, run in
+    separate interpreters so they cannot stall other queries. Workers preload the tool
+    modules, run each call under a memory limit (RLIMIT_AS) and a time limit (the tool's
+    timeout, enforced in the worker so an abandoned call frees its worker), and return
+    results as compact JSON. A pool whose worker died is replaced on the next call.
+    """
+
+    def __init__(self, workers: int = TOOL_PROCESS_WORKERS, memory_mb: int = TOOL_PROCESS_MEMORY_MB,
+                 start_method: str = TOOL_PROCESS_START_METHOD):
+        self.workers = max(1, workers)
+        self.memory_mb = memory_mb
+        self.start_method = start_method
+        self.modules: List[str] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "restarts": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(list(self.modules), self.memory_mb),
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken executor so the next call starts fresh workers"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.stats["restarts"] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def preload(self, functions: List[Callable]) -> None:
+        """Modules the workers import at startup (applies to workers started after this call)"""
+        for function in functions:
+            if function.__module__ not in self.modules:
+                self.modules.append(function.__module__)
+
+    def start(self) -> "ToolProcessPool":
+        """Start every worker now, so the first tool call does not pay for interpreter startup"""
+        executor = self._get_executor()
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        return self
+
+    def submit(self, function: Callable, parameters: Dict[str, Any], time_limit: float = 0) -> Future:
+        """Run function(**parameters) in a worker; returns a Future with the decoded result"""
+        executor = self._get_executor()
+        outer = Future()
+        self.stats["calls"] += 1
+        try:
+            inner = executor.submit(_run_in_worker, function.__module__, function.__name__, parameters,
+                                    time_limit + TIME_LIMIT_GRACE_S if time_limit > 0 else 0)
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            outer.set_exception(e)
+            return outer
+
+        def settle(inner_future):
+            if inner_future.cancelled():
+                outer.cancel()
+                return
+            error = inner_future.exception()
+            if error is not None:
+                self.stats["errors"] += 1
+                if isinstance(error, BrokenProcessPool):
+                    # A worker was killed (e.g. by the OS for memory); start over with fresh workers
+                    self._discard(executor)
+            try:
+                if error is None:
+                    outer.set_result(json.loads(inner_future.result()))
+                else:
+                    outer.set_exception(error)
+            except InvalidStateError:
+                pass  # The caller cancelled and stopped waiting
+
+        inner.add_done_callback(settle)
+        # A call the caller gave up on before a worker picked it up is not run at all
+        outer.add_done_callback(lambda future: inner.cancel() if future.cancelled() else None)
+        return outer
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[ToolProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_tool_process_pool() -> ToolProcessPool:
+    """The process-wide tool worker pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ToolProcessPool()
+        return _pool
+
+
+def uses_process_backend(policy: Dict[str, Any]) -> bool:
+    return policy.get("backend", "thread") == "process"
+
+
+def start_tool_processes(tool_policies: Dict[str, Dict[str, Any]], functions: Dict[str, Callable]) -> bool:
+    """Preload and start the worker pool if any tool runs on the process backend; returns whether it did"""
+    process_tools = [functions[name] for name, policy in tool_policies.items()
+                     if uses_process_backend(policy) and name in functions]
+    if not process_tools:
+        return False
+    pool = get_tool_process_pool()
+    pool.preload(process_tools)
+    pool.start()
+    return True
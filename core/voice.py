@@ -0,0 +1,80 @@
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+# Spoken right after the user stops talking, before any planning has happened
+ACKNOWLEDGEMENT = os.getenv("VOICE_ACKNOWLEDGEMENT", "Okay, let me check.")
+
+# A sentence shorter than this is held back and joined with the next one,
+# so TTS is not called for fragments like "Sure."
+MIN_SENTENCE_CHARS = int(os.getenv("VOICE_MIN_SENTENCE_CHARS", "20"))
+
+# Text without sentence punctuation is still flushed at a word boundary beyond this length
+MAX_SENTENCE_CHARS = int(os.getenv("VOICE_MAX_SENTENCE_CHARS", "200"))
+
+SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+|\n+')
+
+# Short progress phrases spoken while tools run
+PROGRESS_PHRASES = {
+    "get_weather": "Checking the weather in {location}.",
+    "findDateTime": "Looking up the time in {location}.",
+    "web_search": "Searching the web.",
+    "translate_text": "Translating.",
+    "send_email": "Sending the email.",
+}
+
+
+def progress_phrase(tool_name: str, parameters: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Phrase announcing a tool call, or None for tools without one"""
+    phrase = PROGRESS_PHRASES.get(tool_name)
+    if phrase is None:
+        return None
+    try:
+        return phrase.format(**(parameters or {}))
+    except (KeyError, IndexError):
+        # Drop the placeholder part if the parameter is missing
+        return phrase.split(" {")[0].rstrip(".") + "."
+
+
+class SentenceChunker:
+    """
+    Turns a stream of text deltas into speakable sentences.
+
+    Example:
+        chunker = SentenceChunker()
+        for delta in answer_stream:
+            for sentence in chunker.feed(delta):
+                speak(sentence)
+        for sentence in chunker.flush():
+            speak(sentence)
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS, max_chars: int = MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+
+        # Very long run-on text: speak up to the last word boundary instead of waiting
+        if len(self._buffer) > self.max_chars:
+            cut = self._buffer.rfind(" ", 0, self.max_chars)
+            if cut > 0:
+                sentences.append(self._buffer[:cut].strip())
+                self._buffer = self._buffer[cut + 1:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
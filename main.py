@@ -22,54 +22,189 @@
 
 
 import os
+import queue
+import threading
 from core.agent import process_user_query
+from core import progress
+from core.voice import ACKNOWLEDGEMENT, SentenceChunker, progress_phrase
+from core.model_host import get_model_host, ModelNotReady, ModelHostBusy
+from core.deadline import Deadline, QueryCancelled, QUERY_DEADLINE_S
+from core.log import get_logger, preview
 from fastrtc import (ReplyOnPause, Stream, get_stt_model, get_tts_model)
 from dotenv import load_dotenv
 #done
 # Load environment variables
 load_dotenv()
-if (os.getenv("AUDIO_MODE", "False").lower() in ["true", "1", "yes"]):
-# Initialize STT and TTS models
-    stt_model = get_stt_model()
-    tts_model = get_tts_model()
+
+logger = get_logger("voice")
+
+AUDIO_MODE = os.getenv("AUDIO_MODE", "False").lower() in ["true", "1", "yes"]
+
+# Speak an acknowledgement, tool progress and answer sentences as soon as each is available
+VOICE_PIPELINE = os.getenv("VOICE_PIPELINE", "true").lower() in ["true", "1", "yes"]
+
+# Audio of the acknowledgement, synthesized once and replayed for every query
+_acknowledgement_audio = []
+
+
+def _warm_up_stt(model):
+    """Transcribe one second of silence so the first caller does not pay for initialization"""
+    import numpy as np
+    model.stt((16000, np.zeros(16000, dtype=np.float32)))
+
+
+def _warm_up_tts(model):
+    """Synthesize the acknowledgement, which also initializes the TTS model"""
+    _acknowledgement_audio[:] = list(model.stream_tts_sync(ACKNOWLEDGEMENT))
+
+
+# STT and TTS models shared by every concurrent audio stream, loaded and warmed up at startup
+stt_host = get_model_host("stt", get_stt_model, warmup=_warm_up_stt)
+tts_host = get_model_host("tts", get_tts_model, warmup=_warm_up_tts)
+if AUDIO_MODE:
+    stt_host.start()
+    tts_host.start()
+
+
+def speak(text):
+    """Convert text to audio using the shared TTS model and stream it"""
+    yield from tts_host.stream(lambda model: model.stream_tts_sync(text))
+
+
+def speak_acknowledgement():
+    if not _acknowledgement_audio:
+        _acknowledgement_audio.extend(speak(ACKNOWLEDGEMENT))
+    yield from _acknowledgement_audio
+
+
+# Query currently being answered on each audio connection; a new utterance cancels it
+_active_queries = {}
+_active_queries_lock = threading.Lock()
+
+
+def _connection_id():
+    """Identify the WebRTC connection being served, when fastrtc exposes it"""
+    try:
+        from fastrtc.utils import get_current_context
+        return get_current_context().webrtc_id
+    except Exception:
+        return "default"
+
+
+def start_query(connection_id):
+    """Cancel the query still running on this connection and register a new one"""
+    deadline = Deadline(QUERY_DEADLINE_S)
+    with _active_queries_lock:
+        previous = _active_queries.get(connection_id)
+        _active_queries[connection_id] = deadline
+    if previous is not None and previous.cancel("interrupted by a new utterance"):
+        logger.info("Barge-in: cancelled the previous query")
+    return deadline
+
+
+def finish_query(connection_id, deadline, reason):
+    """Cancel the query if it is still running (e.g. the caller hung up) and unregister it"""
+    deadline.cancel(reason)
+    with _active_queries_lock:
+        if _active_queries.get(connection_id) is deadline:
+            del _active_queries[connection_id]
+
+
+def log_results(results, final_answer):
+    """Log each tool's result and the answer spoken to the caller"""
+    for result in results:
+        logger.debug("Task %s: %s %s -> %s", result['task_number'], result['tool_name'],
+                     preview(result['parameters']), preview(result['result'], 150))
+    logger.info("Final answer: %s", preview(final_answer, 200))
 
 
 def process_audio_query(audio):
     """Process audio input using STT, agent system, and TTS for output"""
     # Convert audio to text using STT
-    user_query = stt_model.stt(audio)
-    print("User Query (from audio):", user_query)
+    try:
+        user_query = stt_host.run(lambda model: model.stt(audio))
+    except (ModelNotReady, ModelHostBusy) as e:
+        logger.warning("Cannot process audio: %s", e)
+        return
+    logger.info("User Query (from audio): %s", user_query)
     
-    # Process the query using our agent system
-    results, final_answer = process_user_query(user_query)
+    if not VOICE_PIPELINE:
+        # Process the query using our agent system, then speak the whole answer
+        results, final_answer = process_user_query(user_query)
+        log_results(results, final_answer)
+        yield from speak(final_answer)
+        return
     
-    # Print results for logging purposes
-    print("\n--- Results from Each Tool ---")
-    for result in results:
-        print(f"Task {result['task_number']}: {result['tool_name']}")
-        print(f"Parameters: {result['parameters']}")
-        print(f"Result: {str(result['result'])[:150]}..." if len(str(result['result'])) > 150 else result['result'])
+    # A new utterance preempts whatever this connection was still answering
+    connection_id = _connection_id()
+    deadline = start_query(connection_id)
+    
+    # The agent runs on a worker thread and reports its progress through this queue
+    events = queue.Queue()
     
-    print("\n--- Final Answer ---")
-    print(final_answer)
+    def run_query():
+        try:
+            with progress.progress_scope(lambda event, data: events.put((event, data))):
+                events.put(("done", process_user_query(user_query, deadline=deadline)))
+        except Exception as e:
+            events.put(("error", e))
     
-    # Convert the answer back to audio using TTS and stream it
-    for audio_chunk in tts_model.stream_tts_sync(final_answer):
-        yield audio_chunk
+    # If the generator is closed early (barge-in or hang-up), the finally block cancels the
+    # query so in-flight LLM requests and tool calls are abandoned instead of run to completion
+    try:
+        threading.Thread(target=run_query, daemon=True).start()
+        yield from speak_acknowledgement()
+        
+        chunker = SentenceChunker()
+        answer_started = False
+        announced = set()
+        while True:
+            event, data = events.get()
+            if deadline.cancelled:
+                return
+            if event == progress.TASK_STARTED and not answer_started:
+                phrase = progress_phrase(data["tool_name"], data["parameters"])
+                if phrase and phrase not in announced:
+                    announced.add(phrase)
+                    yield from speak(phrase)
+            elif event == progress.ANSWER_DELTA:
+                answer_started = True
+                for sentence in chunker.feed(data["text"]):
+                    yield from speak(sentence)
+            elif event == "done":
+                results, final_answer = data
+                log_results(results, final_answer)
+                # An answer served from the answer cache was not streamed
+                sentences = [] if answer_started else chunker.feed(final_answer)
+                for sentence in sentences + chunker.flush():
+                    yield from speak(sentence)
+                return
+            elif event == "error":
+                if isinstance(data, QueryCancelled):
+                    return
+                logger.error("Error processing query: %s", data)
+                yield from speak("Sorry, something went wrong while answering that.")
+                return
+    finally:
+        finish_query(connection_id, deadline, "caller interrupted or hung up")
 
 def main():
     # Determine if we're running in audio mode or text mode
-    audio_mode = os.getenv("AUDIO_MODE", "False").lower() in ["true", "1", "yes"]
+    audio_mode = AUDIO_MODE
     
     if audio_mode:
-        # Audio mode: Set up the real-time communication stream
-        print("Starting in audio mode...")
-        stream = Stream(ReplyOnPause(process_audio_query), modality="audio", mode="send-receive")
+        # Audio mode: Set up the real-time communication stream once the models are warm
+        logger.info("Starting in audio mode...")
+        if not (stt_host.wait_ready() and tts_host.wait_ready()):
+            logger.error("Speech models failed to load: %s, %s", stt_host.status(), tts_host.status())
+            return
+        # can_interrupt lets a new utterance close the running reply, which cancels its query
+        stream = Stream(ReplyOnPause(process_audio_query, can_interrupt=True), modality="audio", mode="send-receive")
         stream.fastphone()
         # The Stream object handles the audio I/O
     else:
         # Text mode: Process a text query directly
-        print("Starting in text mode...")
+        logger.info("Starting in text mode...")
         user_query = input("Enter your query: ")
         if not user_query:
             user_query = "Find the current weather in Ontario and email it to swaroopingavale73@gmail.com"
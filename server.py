@@ -0,0 +1,297 @@
+import os
+import json
+import math
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+from core.agent import process_user_query
+from core import telemetry, progress
+from core.deadline import Deadline, QueryCancelled, QUERY_DEADLINE_S, cancellation_stats
+from core.answer_cache import answer_cache
+from core.model_host import model_hosts_status, model_hosts_ready
+from core.config import TOOL_POLICIES, available_functions
+from core.tool_processes import start_tool_processes, get_tool_process_pool
+
+# Load environment variables
+load_dotenv()
+
+# Queries processed at the same time; further admitted queries wait in the pool's queue
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "16"))
+
+# Queries allowed to wait for a worker before new ones are shed with 503
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+
+# Queries one tenant may have admitted at once before getting 429
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "4"))
+
+# Seconds a shed client is asked to wait before retrying
+RETRY_AFTER_S = int(os.getenv("SERVER_RETRY_AFTER_S", "2"))
+
+# Seconds between heartbeat lines while a query produces no events, so disconnects are noticed
+HEARTBEAT_S = float(os.getenv("SERVER_HEARTBEAT_S", "5"))
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class AdmissionController:
+    """
+    Decides whether a new query may enter the server.
+
+    A query is rejected when its tenant already has TENANT_MAX_CONCURRENCY queries
+    admitted (429), or when every worker is busy and SERVER_MAX_QUEUE queries are
+    already waiting (503, load shedding), so latency stays bounded under overload
+    instead of the queue growing without limit.
+    """
+
+    def __init__(self, workers: int = SERVER_WORKERS, max_queue: int = SERVER_MAX_QUEUE,
+                 tenant_limit: int = TENANT_MAX_CONCURRENCY):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.tenant_limit = tenant_limit
+        self.admitted = 0
+        self.running = 0
+        self.by_tenant = {}
+        self.stats = {"admitted": 0, "completed": 0, "shed": 0, "tenant_limited": 0, "cancelled": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.admitted - self.running)
+
+    def try_admit(self, tenant: str):
+        """Return None if the query is admitted, else the (status, reason) to reject it with"""
+        with self._lock:
+            if self.by_tenant.get(tenant, 0) >= self.tenant_limit:
+                self.stats["tenant_limited"] += 1
+                return 429, f"Tenant '{tenant}' already has {self.tenant_limit} queries in progress"
+            if self.admitted >= self.workers + self.max_queue:
+                self.stats["shed"] += 1
+                return 503, "Server overloaded, try again later"
+            self.admitted += 1
+            self.by_tenant[tenant] = self.by_tenant.get(tenant, 0) + 1
+            self.stats["admitted"] += 1
+        return None
+
+    def started(self) -> None:
+        with self._lock:
+            self.running += 1
+
+    def finished(self, tenant: str, cancelled: bool = False) -> None:
+        with self._lock:
+            self.running -= 1
+            self.admitted -= 1
+            self.by_tenant[tenant] -= 1
+            if not self.by_tenant[tenant]:
+                del self.by_tenant[tenant]
+            self.stats["cancelled" if cancelled else "completed"] += 1
+
+    def render_metrics(self) -> str:
+        with self._lock:
+            gauges = {
+                "gyanova_server_running_queries": self.running,
+                "gyanova_server_queue_depth": self.queue_depth,
+                "gyanova_server_tenants_active": len(self.by_tenant),
+            }
+            counters = {f"gyanova_server_{name}_total": value for name, value in self.stats.items()}
+        counters.update({f"gyanova_{name}_total": value for name, value in cancellation_stats().items()
+                         if not name.endswith("_s")})
+        counters["gyanova_cancelled_work_seconds_total"] = cancellation_stats()["work_discarded_s"]
+        counters.update({f"gyanova_answer_cache_{name}_total": value for name, value in answer_cache.stats.items()})
+
+        lines = []
+        for name, value in gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        for name, value in counters.items():
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class GyanovaServer(ThreadingHTTPServer):
+    """HTTP server answering queries on a bounded worker pool"""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = SERVER_WORKERS, max_queue: int = SERVER_MAX_QUEUE,
+                 tenant_limit: int = TENANT_MAX_CONCURRENCY):
+        super().__init__(address, QueryHandler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+        self.admission = AdmissionController(workers, max_queue, tenant_limit)
+        # /metrics renders stage metrics from a Prometheus sink; reuse a configured one if present
+        self.prometheus = next((s for s in telemetry.get_sinks() if isinstance(s, telemetry.PrometheusSink)), None)
+        if self.prometheus is None:
+            self.prometheus = telemetry.add_sink(telemetry.PrometheusSink())
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        get_tool_process_pool().shutdown()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /query    {"query": "...", "deadline_s": 60, "query_id": "..."} -> NDJSON event stream
+        GET  /metrics  Prometheus text format
+        GET  /health   liveness
+        GET  /ready    readiness (including speech model hosts, if any)
+
+    "deadline_s" must be positive and is capped at QUERY_DEADLINE_S, so no query can hold
+    a worker for longer than the server allows. The tenant is taken from the X-Tenant-ID
+    header ("default" if missing). With a "query_id", the query is checkpointed under the
+    tenant and a retried request with the same query resumes it; reusing the ID for a
+    different query is an error.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request access logs are noise under load; errors are still reported
+        pass
+
+    def _send_json(self, status: int, body, headers=None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_event(self, event: dict) -> None:
+        """Write one NDJSON line as an HTTP chunk and flush it to the client"""
+        line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = (self.server.prometheus.render() + self.server.admission.render_metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/ready":
+            ready = model_hosts_ready()
+            self._send_json(200 if ready else 503, {"ready": ready, "models": model_hosts_status()})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/query":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY_BYTES:
+                self._send_json(413, {"error": "Request body too large"})
+                return
+            request = json.loads(self.rfile.read(length) or b"{}")
+            user_query = request["query"]
+            deadline_s = float(request.get("deadline_s", QUERY_DEADLINE_S))
+            if not math.isfinite(deadline_s) or deadline_s <= 0:
+                raise ValueError(f"deadline_s must be a positive number of seconds, got {deadline_s}")
+            # A client may ask for less time than the server's deadline, never more
+            deadline_s = min(deadline_s, QUERY_DEADLINE_S)
+            query_id = request.get("query_id")
+            if query_id is not None:
+                query_id = str(query_id)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        tenant = self.headers.get("X-Tenant-ID", "default")
+        rejection = self.server.admission.try_admit(tenant)
+        if rejection is not None:
+            status, reason = rejection
+            self._send_json(status, {"error": reason}, {"Retry-After": str(RETRY_AFTER_S)})
+            return
+
+        deadline = Deadline(deadline_s)
+        events = queue.Queue()
+
+        def run():
+            self.server.admission.started()
+            cancelled = deadline.cancelled
+            try:
+                if not cancelled:
+                    with progress.progress_scope(lambda event, data: events.put({"event": event, **data})):
+                        results, final_answer = process_user_query(user_query, deadline=deadline,
+                                                                     query_id=query_id, tenant=tenant)
+                    events.put({"event": "done", "results": results, "answer": final_answer})
+            except QueryCancelled:
+                cancelled = True
+            except Exception as e:
+                events.put({"event": "error", "error": str(e)})
+            finally:
+                self.server.admission.finished(tenant, cancelled)
+                events.put(None)
+
+        self.server.pool.submit(contextvars.copy_context().run, run)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            self._write_event({"event": "accepted", "tenant": tenant,
+                               "queue_depth": self.server.admission.queue_depth})
+            while True:
+                try:
+                    event = events.get(timeout=HEARTBEAT_S)
+                except queue.Empty:
+                    event = {"event": "heartbeat"}
+                if event is None:
+                    break
+                self._write_event(event)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away: stop the query instead of finishing it for nobody
+            deadline.cancel("client disconnected")
+            self.close_connection = True
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, **kwargs) -> GyanovaServer:
+    return GyanovaServer((host, port), **kwargs)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve the Gyanova agent over HTTP')
+    parser.add_argument('--host', type=str, default=os.getenv("SERVER_HOST", "127.0.0.1"),
+                        help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=int(os.getenv("SERVER_PORT", "8000")),
+                        help='Port to listen on (default: 8000)')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS,
+                        help=f'Queries processed concurrently (default: {SERVER_WORKERS})')
+    parser.add_argument('--max-queue', type=int, default=SERVER_MAX_QUEUE,
+                        help=f'Queries allowed to wait before load shedding (default: {SERVER_MAX_QUEUE})')
+    parser.add_argument('--tenant-limit', type=int, default=TENANT_MAX_CONCURRENCY,
+                        help=f'Concurrent queries per tenant (default: {TENANT_MAX_CONCURRENCY})')
+    args = parser.parse_args()
+
+    # Start the tool worker processes before serving, so no query waits for interpreter startup
+    if start_tool_processes(TOOL_POLICIES, available_functions):
+        print(f"Started {get_tool_process_pool().workers} tool worker processes")
+    server = make_server(args.host, args.port, workers=args.workers, max_queue=args.max_queue,
+                         tenant_limit=args.tenant_limit)
+    print(f"Serving Gyanova on http://{args.host}:{args.port} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
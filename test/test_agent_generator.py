@@ -0,0 +1,36 @@
+import os
+import pytest
+from agent_generator import AgentGenerator
+
+TOOL_CODE = '''
+def convert_units(value):
+    return value
+'''
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    return AgentGenerator(use_cache=False)
+
+
+def tool_info(file_name):
+    return {"tool_name": "convert_units", "function_name": "convert_units", "file_name": file_name,
+            "code": TOOL_CODE, "parameters": {"value": "Value to convert"}}
+
+
+@pytest.mark.parametrize("file_name", ["__init__.py", "search_tool.py", "rate_limit.py", "resilience.py"])
+def test_rejects_file_names_already_in_tools_package(generator, file_name):
+    errors = generator.validate_tool(tool_info(file_name))
+    assert errors == [f"File name {file_name!r} is already used in the tools package"]
+
+
+@pytest.mark.parametrize("file_name", ["../agent_generator.py", "tools/evil.py", "Upper.py", "tool.txt"])
+def test_rejects_invalid_file_names(generator, file_name):
+    assert generator.validate_tool(tool_info(file_name)) == [f"Invalid file name: {file_name!r}"]
+
+
+def test_accepts_unused_file_name(generator):
+    file_name = "convert_units_tool.py"
+    assert not os.path.exists(os.path.join(generator.tools_dir, file_name))
+    assert generator.validate_tool(tool_info(file_name)) == []
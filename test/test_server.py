@@ -0,0 +1,84 @@
+import json
+import threading
+import http.client
+import pytest
+import server
+
+
+@pytest.fixture
+def gyanova_server(monkeypatch):
+    """A server on a free port with one worker, no queue and one query per tenant, answering with a stub agent"""
+    release = threading.Event()
+    calls = []
+
+    def process_user_query(user_query, deadline=None, query_id=None, tenant=None):
+        calls.append({"query": user_query, "deadline": deadline, "tenant": tenant})
+        release.wait(10)
+        return [{"task_number": 1, "tool_name": "findDateTime", "parameters": {}, "result": "12:00"}], "It is noon."
+
+    monkeypatch.setattr(server, "process_user_query", process_user_query)
+    httpd = server.make_server("127.0.0.1", 0, workers=1, max_queue=0, tenant_limit=1)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, release, calls
+    release.set()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post_query(httpd, body, tenant="acme"):
+    connection = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+    connection.request("POST", "/query", json.dumps(body), {"X-Tenant-ID": tenant, "Connection": "close"})
+    return connection.getresponse()
+
+
+def read_event(response):
+    return json.loads(response.readline())
+
+
+def test_query_streams_ndjson_until_done(gyanova_server):
+    httpd, release, calls = gyanova_server
+    release.set()
+    response = post_query(httpd, {"query": "what time is it"})
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "application/x-ndjson"
+    events = [json.loads(line) for line in response.read().splitlines()]
+    assert events[0]["event"] == "accepted" and events[0]["tenant"] == "acme"
+    assert events[-1] == {"event": "done", "answer": "It is noon.", "results": [
+        {"task_number": 1, "tool_name": "findDateTime", "parameters": {}, "result": "12:00"}]}
+    assert calls[0]["query"] == "what time is it" and calls[0]["tenant"] == "acme"
+
+
+def test_rejects_tenant_over_limit_and_sheds_when_full(gyanova_server):
+    httpd, release, _ = gyanova_server
+    running = post_query(httpd, {"query": "first"})
+    assert read_event(running)["event"] == "accepted"
+
+    limited = post_query(httpd, {"query": "second"}, tenant="acme")
+    assert limited.status == 429
+    assert limited.getheader("Retry-After") == str(server.RETRY_AFTER_S)
+
+    shed = post_query(httpd, {"query": "third"}, tenant="other")
+    assert shed.status == 503
+    assert shed.getheader("Retry-After") == str(server.RETRY_AFTER_S)
+
+    release.set()
+    events = [json.loads(line) for line in running.read().splitlines()]
+    assert events[-1]["event"] == "done"
+    assert httpd.admission.stats["tenant_limited"] == 1 and httpd.admission.stats["shed"] == 1
+
+
+@pytest.mark.parametrize("deadline_s", [0, -5, "inf", "nan"])
+def test_rejects_invalid_deadline(gyanova_server, deadline_s):
+    httpd, _, calls = gyanova_server
+    response = post_query(httpd, {"query": "what time is it", "deadline_s": deadline_s})
+    assert response.status == 400
+    assert not calls
+
+
+def test_caps_deadline_at_server_limit(gyanova_server):
+    httpd, release, calls = gyanova_server
+    release.set()
+    response = post_query(httpd, {"query": "what time is it", "deadline_s": 10 ** 9})
+    response.read()
+    assert 0 < calls[0]["deadline"].remaining() <= server.QUERY_DEADLINE_S
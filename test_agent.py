@@ -6,6 +6,8 @@ import datetime
 import pandas as pd
 from typing import List, Dict, Any, Tuple, Set
 from core.agent import process_user_query
+from core import telemetry
+from core.memo import ToolMemo, batch_scope
 from dotenv import load_dotenv
 import time
 # Load environment variables
@@ -56,9 +58,46 @@ def parse_expected_tools(expected_tools_str: str) -> Set[str]:
 
 from typing import List, Dict, Any, Set
 
+# Keys of a task_result record that hold tool payloads rather than tool metadata
+PAYLOAD_KEYS = frozenset({'result', 'parameters'})
+
+# Upper bound on nodes visited by the fallback walker for a single result
+MAX_WALK_NODES = 10000
+
+def _walk_tool_names(item: Any, tool_names: Set[str], max_nodes: int = MAX_WALK_NODES) -> None:
+    """
+    Iteratively collect 'tool_name' values from a nested structure of dicts and lists.
+    
+    Payload keys are skipped and the walk stops after max_nodes containers, so a
+    large search result can never dominate evaluation time.
+    
+    Args:
+        item (Any): Structure to search
+        tool_names (Set[str]): Set that found tool names are added to
+        max_nodes (int): Maximum number of dicts/lists to visit
+    """
+    stack = [item]
+    visited = 0
+    while stack and visited < max_nodes:
+        node = stack.pop()
+        visited += 1
+        if isinstance(node, dict):
+            name = node.get('tool_name')
+            if isinstance(name, str):
+                tool_names.add(name)
+            for key, value in node.items():
+                if key not in PAYLOAD_KEYS and isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(element for element in node if isinstance(element, (dict, list)))
+
 def get_actual_tools(results: List[Dict[str, Any]]) -> Set[str]:
     """
-    Extract all tool names used from the test results, handling various nested structures.
+    Extract all tool names used from the test results.
+    
+    Structured task_result records ({'task_number', 'tool_name', 'parameters', 'result'})
+    are read directly without scanning their payloads. Anything else falls back to a
+    bounded iterative walk.
     
     Args:
         results (List[Dict[str, Any]]): List of task results from agent
@@ -68,32 +107,35 @@ def get_actual_tools(results: List[Dict[str, Any]]) -> Set[str]:
     """
     tool_names = set()
     
+    for result in results:
+        name = result.get('tool_name') if isinstance(result, dict) else None
+        if isinstance(name, str):
+            tool_names.add(name)
+        else:
+            _walk_tool_names(result, tool_names)
+        
+    return tool_names
+
+def _get_actual_tools_recursive(results: List[Dict[str, Any]]) -> Set[str]:
+    """Previous full recursive walker, kept as the baseline for benchmark_get_actual_tools"""
+    tool_names = set()
+    
     def extract_tool_names(item: Any) -> None:
-        """Recursively extract tool names from nested dictionaries and lists."""
         if isinstance(item, dict):
-            # Extract tool_name if it exists at this level
             if 'tool_name' in item:
                 tool_names.add(item['tool_name'])
-            
-            # Check for tools or calls fields that might contain tool information
             if 'tools' in item and isinstance(item['tools'], list):
                 for tool in item['tools']:
                     extract_tool_names(tool)
-            
             if 'tool_calls' in item and isinstance(item['tool_calls'], list):
                 for call in item['tool_calls']:
                     extract_tool_names(call)
-                    
-            # Recursively process all other dictionary values
             for value in item.values():
                 extract_tool_names(value)
-                
         elif isinstance(item, list):
-            # Process each item in the list
             for element in item:
                 extract_tool_names(element)
     
-    # Process all results
     for result in results:
         extract_tool_names(result)
         
@@ -117,7 +159,8 @@ def evaluate_test_case(query: str, expected_tools_set: Set[str]) -> Tuple[List[D
         - extra_tools (Set[str]): Unexpected tools that were used
     """
     try:
-        results, final_answer = process_user_query(query)
+        # Bypass the answer cache so every test case measures a real run
+        results, final_answer = process_user_query(query, use_cache=False)
         print("Processing completed with tools:", [r.get('tool_name', 'unknown') for r in results])
         
         actual_tools_set = get_actual_tools(results)
@@ -135,6 +178,27 @@ def evaluate_test_case(query: str, expected_tools_set: Set[str]) -> Tuple[List[D
         print(f"Error processing query '{query}': {str(e)}")
         return [], str(e), False, set(), expected_tools_set, set()
 
+def print_stage_latencies(traces: List[telemetry.Trace]) -> Dict[str, Dict[str, float]]:
+    """
+    Print p50/p95 latency for each pipeline stage across all test queries.
+    
+    Args:
+        traces (List[telemetry.Trace]): One trace per test case
+        
+    Returns:
+        Dict[str, Dict[str, float]]: Per-stage latency summary
+    """
+    summary = telemetry.summarize_traces(traces)
+    if not summary:
+        return summary
+    
+    print(f"\n{'Stage':<30}{'Count':>8}{'p50 (s)':>12}{'p95 (s)':>12}")
+    print("-" * 62)
+    for stage, stats in summary.items():
+        print(f"{stage:<30}{stats['count']:>8}{stats['p50']:>12.3f}{stats['p95']:>12.3f}")
+    
+    return summary
+
 def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int, List[Dict[str, Any]]]:
     """
     Run all test cases from the CSV file and generate results.
@@ -153,6 +217,8 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
     total_tests = len(test_cases)
     passed_tests = 0
     detailed_results = []
+    traces = []
+    memo = ToolMemo()  # Shared by all test queries so identical tool calls run once
     
     print(f"\n{'=' * 80}")
     print(f"Running {total_tests} test cases from {csv_file_path}")
@@ -166,8 +232,9 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
         print(f"\nTest {i}/{total_tests}: {query}")
         print(f"Expected tools: {', '.join(expected_tools_set)}")
         
-        results, final_answer, passed, actual_tools_set, missing_tools, extra_tools = evaluate_test_case(query, expected_tools_set)
-        time.sleep(5)
+        with batch_scope(memo), telemetry.start_trace(telemetry.STAGE_QUERY, test_index=i) as trace:
+            results, final_answer, passed, actual_tools_set, missing_tools, extra_tools = evaluate_test_case(query, expected_tools_set)
+        traces.append(trace)
         
         if passed:
             passed_tests += 1
@@ -184,6 +251,9 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
             print(f"Extra tools: {', '.join(extra_tools)}")
         
         # Prepare detailed results
+        totals = trace.totals()
+        stage_latencies = {stage: round(duration, 4) for stage, duration in trace.stage_durations().items()
+                           if stage != telemetry.STAGE_QUERY}
         result_entry = {
             'query': query,
             'expected_tools': expected_tools_str,
@@ -192,7 +262,14 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
             'missing_tools': ','.join(missing_tools) if missing_tools else '',
             'extra_tools': ','.join(extra_tools) if extra_tools else '',
             'final_answer': final_answer[:200] + '...' if len(final_answer) > 200 else final_answer,
-            'raw_results': str(results)[:300] + '...' if len(str(results)) > 300 else str(results)
+            'raw_results': str(results)[:300] + '...' if len(str(results)) > 300 else str(results),
+            'latency_s': round(totals['latency_s'], 4),
+            'stage_latencies': json.dumps(stage_latencies),
+            'llm_calls': totals['llm_calls'],
+            'prompt_tokens': totals['prompt_tokens'],
+            'completion_tokens': totals['completion_tokens'],
+            'total_tokens': totals['prompt_tokens'] + totals['completion_tokens'],
+            'tool_cache_hits': totals['cache_hits']
         }
         
         detailed_results.append(result_entry)
@@ -201,6 +278,8 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
     print(f"\n{'=' * 80}")
     print(f"Test Summary: {passed_tests}/{total_tests} tests passed ({passed_tests/total_tests*100:.1f}%)")
     print(f"{'=' * 80}")
+    print_stage_latencies(traces)
+    print(f"Tool memo: {memo.stats['hits']} hits, {memo.stats['coalesced']} coalesced, {memo.stats['misses']} misses")
     
     # Save detailed results to CSV
     if output_csv_path is None:
@@ -217,6 +296,150 @@ def run_tests(csv_file_path: str, output_csv_path: str = None) -> Tuple[int, int
     
     return total_tests, passed_tests, detailed_results
 
+def summarize_results_file(results_csv_path: str) -> Dict[str, Any]:
+    """
+    Compute latency and token statistics from a saved results CSV.
+    
+    Args:
+        results_csv_path (str): Path to a test_results_*.csv file written by run_tests
+        
+    Returns:
+        Dict[str, Any]: p50/p95 end-to-end latency, mean tokens and LLM calls per query,
+                        and p95 latency per stage
+    """
+    df = pd.read_csv(results_csv_path)
+    required_columns = {'latency_s', 'total_tokens', 'llm_calls'}
+    missing_columns = required_columns - set(df.columns)
+    if missing_columns:
+        raise ValueError(f"{results_csv_path} has no performance columns: {', '.join(sorted(missing_columns))}")
+    
+    latencies = df['latency_s'].dropna().tolist()
+    stage_values: Dict[str, List[float]] = {}
+    for raw in df.get('stage_latencies', pd.Series(dtype=str)).dropna():
+        for stage, duration in json.loads(raw).items():
+            stage_values.setdefault(stage, []).append(float(duration))
+    
+    return {
+        'queries': len(df),
+        'p50_latency_s': telemetry.percentile(latencies, 50),
+        'p95_latency_s': telemetry.percentile(latencies, 95),
+        'tokens_per_query': float(df['total_tokens'].mean()) if len(df) else 0.0,
+        'llm_calls_per_query': float(df['llm_calls'].mean()) if len(df) else 0.0,
+        'stage_p95_s': {stage: telemetry.percentile(values, 95) for stage, values in sorted(stage_values.items())}
+    }
+
+def compare_results(baseline_csv_path: str, candidate_csv_path: str,
+                    max_latency_regression: float = 0.2, max_token_regression: float = 0.1) -> bool:
+    """
+    Compare two results CSVs and report whether the candidate regressed.
+    
+    Args:
+        baseline_csv_path (str): Results file of the reference run
+        candidate_csv_path (str): Results file of the run being checked
+        max_latency_regression (float): Allowed relative increase of p95 latency (0.2 = +20%)
+        max_token_regression (float): Allowed relative increase of tokens per query
+        
+    Returns:
+        bool: True if both p95 latency and tokens per query are within their thresholds
+    """
+    baseline = summarize_results_file(baseline_csv_path)
+    candidate = summarize_results_file(candidate_csv_path)
+    
+    def relative_change(old: float, new: float) -> float:
+        if old == 0:
+            return 0.0 if new == 0 else float('inf')
+        return (new - old) / old
+    
+    thresholds = {
+        'p95_latency_s': max_latency_regression,
+        'tokens_per_query': max_token_regression,
+    }
+    
+    print(f"\n{'Metric':<30}{'Baseline':>12}{'Candidate':>12}{'Change':>10}")
+    print("-" * 64)
+    passed = True
+    for metric in ['p50_latency_s', 'p95_latency_s', 'tokens_per_query', 'llm_calls_per_query']:
+        change = relative_change(baseline[metric], candidate[metric])
+        threshold = thresholds.get(metric)
+        marker = ""
+        if threshold is not None and change > threshold:
+            passed = False
+            marker = f"  ❌ > +{threshold*100:.0f}%"
+        print(f"{metric:<30}{baseline[metric]:>12.3f}{candidate[metric]:>12.3f}{change*100:>9.1f}%{marker}")
+    
+    for stage in sorted(set(baseline['stage_p95_s']) | set(candidate['stage_p95_s'])):
+        old = baseline['stage_p95_s'].get(stage, 0.0)
+        new = candidate['stage_p95_s'].get(stage, 0.0)
+        print(f"{'p95 ' + stage:<30}{old:>12.3f}{new:>12.3f}{relative_change(old, new)*100:>9.1f}%")
+    
+    print(f"\nRegression check: {'✅ PASS' if passed else '❌ FAIL'}")
+    return passed
+
+def make_synthetic_results(num_queries: int, tasks_per_query: int = 3, payload_items: int = 200) -> List[List[Dict[str, Any]]]:
+    """
+    Build large synthetic agent results shaped like process_user_query output.
+    
+    Args:
+        num_queries (int): Number of result lists to generate
+        tasks_per_query (int): Task records per result list
+        payload_items (int): Size of the nested search-like payload in each task result
+        
+    Returns:
+        List[List[Dict[str, Any]]]: One list of task_result records per query
+    """
+    tool_cycle = ['web_search', 'get_weather', 'translate_text', 'send_email', 'findDateTime']
+    suite = []
+    for q in range(num_queries):
+        results = []
+        for t in range(tasks_per_query):
+            payload = {
+                'organic_results': [
+                    {'title': f'Result {k}', 'snippet': 'lorem ipsum ' * 10,
+                     'rich_snippet': {'top': {'extensions': ['a', 'b', 'c']}}}
+                    for k in range(payload_items)
+                ]
+            }
+            results.append({
+                'task_number': t + 1,
+                'tool_name': tool_cycle[(q + t) % len(tool_cycle)],
+                'parameters': {'query': f'query {q}'},
+                'result': payload
+            })
+        suite.append(results)
+    return suite
+
+def benchmark_get_actual_tools(num_queries: int = 500, payload_items: int = 200) -> Dict[str, float]:
+    """
+    Time get_actual_tools against the previous recursive walker on synthetic results.
+    
+    Args:
+        num_queries (int): Number of synthetic result lists
+        payload_items (int): Size of the nested payload per task
+        
+    Returns:
+        Dict[str, float]: Seconds taken by each implementation and the speedup
+    """
+    suite = make_synthetic_results(num_queries, payload_items=payload_items)
+    
+    timings = {}
+    extracted = {}
+    for label, extractor in [('recursive', _get_actual_tools_recursive), ('structured', get_actual_tools)]:
+        start = time.perf_counter()
+        extracted[label] = [extractor(results) for results in suite]
+        timings[label] = time.perf_counter() - start
+        timings[f'{label}_tools'] = sum(len(tools) for tools in extracted[label])
+    
+    for n, (recursive_tools, structured_tools) in enumerate(zip(extracted['recursive'], extracted['structured'])):
+        if set(recursive_tools) != set(structured_tools):
+            raise AssertionError(f"Structured extraction returned {sorted(structured_tools)} for result {n}, "
+                                 f"the recursive walker {sorted(recursive_tools)}")
+    
+    timings['speedup'] = timings['recursive'] / timings['structured'] if timings['structured'] else float('inf')
+    print(f"get_actual_tools over {num_queries} results x {payload_items} payload items:")
+    print(f"  recursive:  {timings['recursive']:.4f}s")
+    print(f"  structured: {timings['structured']:.4f}s  ({timings['speedup']:.0f}x faster)")
+    return timings
+
 def main():
     """Main function to run the tests"""
     # Default input and output file paths
@@ -229,9 +452,27 @@ def main():
                         help=f'Path to input CSV file with test cases (default: {default_input_csv})')
     parser.add_argument('--output', type=str, default=None,
                         help='Path to output CSV file for results (default: test_results_TIMESTAMP.csv)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'), default=None,
+                        help='Compare two results CSVs instead of running tests; exits non-zero on regression')
+    parser.add_argument('--max-latency-regression', type=float, default=0.2,
+                        help='Allowed relative p95 latency increase when comparing (default: 0.2)')
+    parser.add_argument('--max-token-regression', type=float, default=0.1,
+                        help='Allowed relative tokens-per-query increase when comparing (default: 0.1)')
+    
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Benchmark tool-name extraction on large synthetic results instead of running tests')
     
     args = parser.parse_args()
     
+    if args.benchmark:
+        benchmark_get_actual_tools()
+        return
+    
+    if args.compare:
+        passed = compare_results(args.compare[0], args.compare[1],
+                                 args.max_latency_regression, args.max_token_regression)
+        raise SystemExit(0 if passed else 1)
+    
     # Run tests
     run_tests(args.input, args.output)
 
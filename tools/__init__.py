@@ -1,10 +1,11 @@
 # Import all tools to make them accessible from the tools package
-from .datetime_tool import findDateTime
-from .search_tool import web_search
-from .weather_tool import get_weather
-from .send_email_tool import send_email
-from .translation_tool import translate_text
+from .datetime_tool import findDateTime, compact_datetime
+from .search_tool import web_search, compact_search
+from .weather_tool import get_weather, compact_weather
+from .send_email_tool import send_email, compact_email
+from .translation_tool import translate_text, compact_translation
 
 # Export all tools
-__all__ = ['findDateTime', 'web_search','get_weather','send_email','translate_text']
+__all__ = ['findDateTime', 'web_search','get_weather','send_email','translate_text',
+           'compact_datetime', 'compact_search', 'compact_weather', 'compact_email', 'compact_translation']
 #done
\ No newline at end of file
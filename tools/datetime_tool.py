@@ -4,11 +4,15 @@ from datetime import datetime
 from timezonefinder import TimezoneFinder
 from geopy.geocoders import Nominatim
 from dotenv import load_dotenv
+from .resilience import call_with_breaker
 
 # Load environment variables
 #done
 load_dotenv()
 
+# Seconds to wait for the geocoder before giving up
+REQUEST_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "10"))
+
 def findDateTime(location: str):
     """Returns current date and time at the given city location"""
     try:
@@ -17,7 +21,10 @@ def findDateTime(location: str):
         tf = TimezoneFinder()
         
         # Get coordinates for the location
-        location_info = geolocator.geocode(location)
+        location_info = call_with_breaker(
+            "findDateTime", "nominatim.openstreetmap.org",
+            lambda: geolocator.geocode(location, timeout=REQUEST_TIMEOUT)
+        )
         if not location_info:
             return f"Could not find location: {location}"
         
@@ -41,4 +48,15 @@ def findDateTime(location: str):
             "timestamp": now.timestamp()
         }
     except Exception as e:
-        return f"Error finding time for location '{location}': {str(e)}"
\ No newline at end of file
+        return f"Error finding time for location '{location}': {str(e)}"
+
+
+def compact_datetime(result):
+    """Keep only the location, timezone and formatted time of a findDateTime result"""
+    if not isinstance(result, dict):
+        return result
+    return {
+        "location": result.get("location"),
+        "timezone": result.get("timezone"),
+        "current_datetime": result.get("current_datetime")
+    }
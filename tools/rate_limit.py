@@ -0,0 +1,256 @@
+# tools/rate_limit.py
+import os
+import time
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+# Requests per second ("rate") and burst size per upstream; unknown upstreams are not limited.
+# Any 60 seconds allow at most burst + 60 * rate requests, so per-minute quotas are split between the two.
+# Override or extend with RATE_LIMITS="api.groq.com=1:60,smtp.gmail.com=0.5" (rate[:burst])
+RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "api.groq.com": {"rate": 0.45, "burst": 3},                 # 30 requests/minute per model (free tier)
+    "serpapi.com": {"rate": 1.0, "burst": 5},
+    "nominatim.openstreetmap.org": {"rate": 1.0, "burst": 1},   # Usage policy: at most 1 request/second
+    "api.openweathermap.org": {"rate": 0.8, "burst": 12},       # 60 calls/minute (free plan)
+    "translate.googleapis.com": {"rate": 5.0, "burst": 5},
+    "clients5.google.com": {"rate": 5.0, "burst": 5},
+}
+
+# "sqlite" shares the buckets between processes (server workers, tool worker processes);
+# "memory" keeps them per process
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite").lower()
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join("cache", "rate_limits.db"))
+
+# Longest a call waits for its turn before failing with RateLimitExceeded
+RATE_LIMIT_MAX_WAIT_S = float(os.getenv("RATE_LIMIT_MAX_WAIT_S", "30"))
+
+# After a 429 the rate is halved (never below MIN_RATE_FRACTION of the configured rate)
+# and climbs back to the configured rate over RATE_LIMIT_RECOVERY_S seconds
+RATE_LIMIT_RECOVERY_S = float(os.getenv("RATE_LIMIT_RECOVERY_S", "60"))
+MIN_RATE_FRACTION = 0.1
+
+# Pause after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER_S = float(os.getenv("RATE_LIMIT_RETRY_AFTER_S", "1"))
+
+_logger = None
+
+
+def _get_logger():
+    # Imported on first use: importing core while the tools package loads would import it circularly
+    global _logger
+    if _logger is None:
+        from core.log import get_logger
+        _logger = get_logger("rate_limit")
+    return _logger
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    upstream TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class RateLimitExceeded(Exception):
+    """Raised when waiting for an upstream's rate limit would take longer than allowed"""
+
+
+def parse_limits(spec: str) -> Dict[str, Dict[str, float]]:
+    """Parse "host=rate[:burst],..." into RATE_LIMITS entries (burst defaults to max(1, rate))"""
+    limits = {}
+    for item in (spec or "").split(","):
+        upstream, _, value = item.partition("=")
+        if not upstream.strip() or not value.strip():
+            continue
+        rate, _, burst = value.partition(":")
+        limits[upstream.strip()] = {"rate": float(rate), "burst": float(burst) if burst else max(1.0, float(rate))}
+    return limits
+
+
+RATE_LIMITS.update(parse_limits(os.getenv("RATE_LIMITS", "")))
+
+
+def retry_after(value: Any) -> Optional[float]:
+    """Seconds from a Retry-After header (delta or HTTP date) of a response or an exception carrying one"""
+    if isinstance(getattr(value, "retry_after", None), (int, float)):
+        return float(value.retry_after)  # geopy's GeocoderRateLimited
+    response = getattr(value, "response", None) if isinstance(value, Exception) else value
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("retry-after") or headers.get("Retry-After")
+    if header is None:
+        return None
+    try:
+        return max(0.0, float(header))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(value: Any) -> bool:
+    """Whether a response or exception means the upstream rejected the call for exceeding its rate limit"""
+    response = getattr(value, "response", None) if isinstance(value, Exception) else value
+    status = getattr(value, "status_code", None) or getattr(response, "status_code", None)
+    return status == 429 or type(value).__name__ == "GeocoderRateLimited"
+
+
+class RateLimiter:
+    """
+    Token bucket per upstream, shared by every thread and (with the SQLite backend) every process.
+
+    A call reserves the next free slot in one short transaction and then sleeps outside it,
+    so concurrent callers are spaced out in order instead of polling. A 429 from the upstream
+    halves its rate and pauses the bucket for the Retry-After period (calls reserved from then
+    on are scheduled after the pause); the rate then recovers linearly to the configured ceiling.
+
+    Buckets are named by host. "host/suffix" names (e.g. one bucket per Groq model) get their
+    own bucket with the limits configured for the host.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 backend: str = RATE_LIMIT_BACKEND, path: str = RATE_LIMIT_DB):
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.backend = backend
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._buckets: Dict[str, Dict[str, float]] = {}
+        self.stats = {"calls": 0, "waited_s": 0.0, "throttled": 0}
+
+    def limit_for(self, upstream: str) -> Optional[Dict[str, float]]:
+        return self.limits.get(upstream) or self.limits.get(upstream.split("/", 1)[0])
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process; a forked child opens its own
+        if getattr(self._local, "pid", None) != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def _update(self, upstream: str, change) -> Any:
+        """Apply change(bucket, now) -> value to the upstream's bucket atomically and return the value"""
+        limit = self.limit_for(upstream)
+        if self.backend != "sqlite":
+            with self._lock:
+                bucket = self._buckets.setdefault(
+                    upstream, {"tokens": limit["burst"], "rate": limit["rate"], "updated": time.time()})
+                return change(bucket, limit, time.time())
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute("SELECT tokens, rate, updated FROM buckets WHERE upstream = ?",
+                                     (upstream,)).fetchone()
+            bucket = ({"tokens": row[0], "rate": row[1], "updated": row[2]} if row
+                      else {"tokens": limit["burst"], "rate": limit["rate"], "updated": now})
+            value = change(bucket, limit, now)
+            connection.execute("INSERT OR REPLACE INTO buckets (upstream, tokens, rate, updated) VALUES (?, ?, ?, ?)",
+                               (upstream, bucket["tokens"], bucket["rate"], bucket["updated"]))
+            connection.execute("COMMIT")
+            return value
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _refill(bucket: Dict[str, float], limit: Dict[str, float], now: float) -> None:
+        """Advance the bucket to now: recover the rate, then add the tokens earned since the last update"""
+        elapsed = now - bucket["updated"]
+        if elapsed > 0:
+            bucket["rate"] = min(limit["rate"], bucket["rate"] + limit["rate"] * elapsed / RATE_LIMIT_RECOVERY_S)
+        # Before the end of a 429 pause, elapsed is negative and the bucket stays in debt
+        bucket["tokens"] = min(limit["burst"], bucket["tokens"] + elapsed * bucket["rate"])
+        bucket["updated"] = now
+
+    def reserve(self, upstream: str, max_wait: float = RATE_LIMIT_MAX_WAIT_S) -> float:
+        """
+        Reserve a call to the upstream without waiting.
+
+        Returns:
+            float: Seconds to wait before making the call (0 for unlimited upstreams)
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait (nothing is reserved)
+        """
+        if self.limit_for(upstream) is None:
+            return 0.0
+
+        def take(bucket, limit, now):
+            self._refill(bucket, limit, now)
+            delay = max(0.0, (1 - bucket["tokens"]) / bucket["rate"])
+            if delay > max_wait:
+                return None
+            bucket["tokens"] -= 1
+            return delay
+
+        delay = self._update(upstream, take)
+        if delay is None:
+            raise RateLimitExceeded(f"Rate limit for {upstream}: no slot within {max_wait:.1f}s")
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["waited_s"] += delay
+        return delay
+
+    def acquire(self, upstream: str, max_wait: float = RATE_LIMIT_MAX_WAIT_S) -> float:
+        """Wait for the upstream's next slot; returns the seconds waited"""
+        delay = self.reserve(upstream, max_wait)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def throttled(self, upstream: str, retry_after_s: Optional[float] = None) -> None:
+        """Record a 429 from the upstream: halve its rate and pause it for retry_after_s"""
+        if self.limit_for(upstream) is None:
+            return
+        pause = DEFAULT_RETRY_AFTER_S if retry_after_s is None else retry_after_s
+
+        def backoff(bucket, limit, now):
+            self._refill(bucket, limit, now)
+            bucket["rate"] = max(limit["rate"] * MIN_RATE_FRACTION, bucket["rate"] / 2)
+            # One call may go as soon as the pause ends, the rest follow at the reduced rate
+            bucket["tokens"] = min(bucket["tokens"], 1.0)
+            # Refilling resumes when the pause ends
+            bucket["updated"] = now + pause
+            return bucket["rate"]
+
+        rate = self._update(upstream, backoff)
+        with self._lock:
+            self.stats["throttled"] += 1
+        _get_logger().warning("Rate limited by %s: pausing %.1fs, rate now %.2f/s", upstream, pause, rate)
+
+    def state(self, upstream: str) -> Optional[Dict[str, float]]:
+        """Current tokens and rate of an upstream's bucket, or None if it is not limited"""
+        if self.limit_for(upstream) is None:
+            return None
+
+        def read(bucket, limit, now):
+            current = dict(bucket)
+            self._refill(current, limit, now)
+            return current
+
+        return self._update(upstream, read)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide rate limiter, created on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
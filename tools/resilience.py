@@ -0,0 +1,270 @@
+# tools/resilience.py
+import os
+import time
+import threading
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Optional
+from .rate_limit import get_rate_limiter, is_throttled, retry_after
+
+# Consecutive failures that open a host's circuit, and seconds before a trial request is allowed
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Hedge delay used until enough latency samples exist to compute a p95
+DEFAULT_HEDGE_AFTER = float(os.getenv("DEFAULT_HEDGE_AFTER", "1.5"))
+MIN_LATENCY_SAMPLES = 20
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ["true", "1", "yes"]
+
+
+# Per-tool resilience settings
+# breaker: skip hosts whose circuit is open
+# rate_limit: wait for the host's shared rate limit (tools/rate_limit.py) before each call
+# hedge: fire the backup call if the primary has not answered within its p95 (or hedge_after)
+# hedge_after: fixed hedge delay in seconds; None uses the primary's observed p95
+RESILIENCE = {
+    "translate_text": {"breaker": True, "hedge": _env_flag("HEDGE_TRANSLATE_TEXT", "true"), "hedge_after": None},
+    "web_search": {"breaker": True, "hedge": False},
+    "get_weather": {"breaker": True, "hedge": False},
+    "findDateTime": {"breaker": True, "hedge": False},
+    "send_email": {"breaker": True, "hedge": False},
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cool-down -> closed on success"""
+
+    def __init__(self, host: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state only one trial request is let through"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to pick the hedge delay"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self, default: float = DEFAULT_HEDGE_AFTER) -> float:
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return default
+            ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_POOL_SIZE", "16")))
+
+
+def host_of(url_or_host: str) -> str:
+    """Return the host part of a URL (or the argument itself if it is already a host)"""
+    return urlparse(url_or_host).hostname or url_or_host
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    host = host_of(host)
+    with _registry_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    with _registry_lock:
+        if name not in _latencies:
+            _latencies[name] = LatencyTracker()
+        return _latencies[name]
+
+
+def breaker_states() -> Dict[str, str]:
+    """Current state of every known host's circuit"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: breaker.state for breaker in breakers}
+
+
+def call_with_breaker(tool_name: str, host: str, function: Callable[[], Any],
+                      is_failure: Optional[Callable[[Any], bool]] = None) -> Any:
+    """
+    Call an upstream through its host's circuit breaker and rate limiter.
+
+    A rate-limited (429) response or exception slows the host's shared rate limit down
+    for every thread and process.
+
+    Args:
+        tool_name: Tool making the call, used to look up its RESILIENCE settings
+        host: URL or host name of the upstream
+        function: Zero-argument callable that performs the request
+        is_failure: Optional predicate marking a returned value as a failure (e.g. HTTP 5xx/429)
+
+    Returns:
+        Whatever function returns
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open
+        RateLimitExceeded: If the host's rate limit has no free slot within RATE_LIMIT_MAX_WAIT_S
+    """
+    settings = RESILIENCE.get(tool_name, {})
+    limiter = get_rate_limiter() if settings.get("rate_limit", True) else None
+    if not settings.get("breaker", True):
+        if limiter is not None:
+            limiter.acquire(host_of(host))
+        return _report_throttling(limiter, host_of(host), function)
+
+    breaker = get_breaker(host)
+    if breaker.state == "open":
+        raise CircuitOpenError(f"Circuit open for {breaker.host}; skipping request")
+    # Wait for a slot before taking the breaker's (half-open trial) permission, and outside the latency sample
+    if limiter is not None:
+        limiter.acquire(breaker.host)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for {breaker.host}; skipping request")
+
+    start = time.perf_counter()
+    try:
+        result = _report_throttling(limiter, breaker.host, function)
+    except Exception:
+        breaker.record_failure()
+        raise
+    get_latency_tracker(breaker.host).record(time.perf_counter() - start)
+
+    if is_failure is not None and is_failure(result):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return result
+
+
+def _report_throttling(limiter, host: str, function: Callable[[], Any]) -> Any:
+    """Call function and report a 429 response or exception to the host's rate limiter"""
+    try:
+        result = function()
+    except Exception as e:
+        if limiter is not None and is_throttled(e):
+            limiter.throttled(host, retry_after(e))
+        raise
+    if limiter is not None and is_throttled(result):
+        limiter.throttled(host, retry_after(result))
+    return result
+
+
+def is_http_failure(response: Any) -> bool:
+    """Server errors and rate limiting count against a host; client errors do not"""
+    status = getattr(response, "status_code", 200)
+    return status >= 500 or status == 429
+
+
+def hedged_call(tool_name: str, primary: Callable[[], Any], backup: Callable[[], Any],
+                is_success: Callable[[Any], bool] = lambda result: True) -> Any:
+    """
+    Run primary, and also backup if primary has not succeeded within the hedge delay.
+
+    The first successful result wins. If hedging is disabled for the tool, backup is
+    only called after primary fails (the previous serial fallback).
+
+    Args:
+        tool_name: Tool making the call, used to look up its RESILIENCE settings
+        primary: Zero-argument callable for the preferred endpoint
+        backup: Zero-argument callable for the alternative endpoint
+        is_success: Predicate deciding whether a returned value is usable
+
+    Returns:
+        The first successful result, or the last result/exception if both fail
+    """
+    settings = RESILIENCE.get(tool_name, {})
+    tracker = get_latency_tracker(f"{tool_name}.primary")
+
+    def timed_primary():
+        start = time.perf_counter()
+        result = primary()
+        if is_success(result):
+            tracker.record(time.perf_counter() - start)
+        return result
+
+    if not settings.get("hedge"):
+        try:
+            result = timed_primary()
+            if is_success(result):
+                return result
+        except Exception:
+            pass
+        return backup()
+
+    hedge_after = settings.get("hedge_after") or tracker.p95()
+    futures = {_hedge_pool.submit(timed_primary): "primary"}
+    done, _ = wait(futures, timeout=hedge_after)
+    primary_future = next(iter(futures))
+    if done and primary_future.exception() is None and is_success(primary_future.result()):
+        return primary_future.result()
+
+    # Primary is slow or failed: race the backup against it
+    futures[_hedge_pool.submit(backup)] = "backup"
+    last_error, last_result = None, None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            result = future.result()
+            if is_success(result):
+                return result
+            last_result = result
+    if last_result is not None:
+        return last_result
+    raise last_error
@@ -4,10 +4,14 @@ import re
 from typing import List, Dict, Any, Union, Tuple
 from serpapi import GoogleSearch
 from dotenv import load_dotenv
+from .resilience import call_with_breaker
 
 # Load environment variables
 load_dotenv()
 
+# Seconds to wait for SerpAPI before giving up
+REQUEST_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "10"))
+
 def clean_search_data(data: Union[List[Dict[str, Any]], str]) -> List[Dict[str, Any]]:
     """
     Clean search data to extract only natural language content.
@@ -116,9 +120,10 @@ def web_search(query: str) -> Dict[str, Any]:
 
     }
     
-    # Execute search
+    # Execute search; never hedged, since a second SerpAPI request is billed and hits the same backend
     search = GoogleSearch(params)
-    results = search.get_dict()
+    search.timeout = REQUEST_TIMEOUT  # Passed through to requests.get by the SerpAPI client
+    results = call_with_breaker("web_search", "serpapi.com", search.get_dict)
     
     # Process results if available
     if "organic_results" in results:
@@ -137,6 +142,20 @@ def web_search(query: str) -> Dict[str, Any]:
             "result_count": 0
         }
 
+def compact_search(result: Dict[str, Any]) -> Union[Dict[str, Any], str]:
+    """
+    Reduce a web_search result to its plain text summary
+    
+    Args:
+        result: Value returned by web_search
+        
+    Returns:
+        Summary text without the separator lines, or the result unchanged on error
+    """
+    if not isinstance(result, dict) or "summary" not in result:
+        return result
+    return "\n".join(line for line in result["summary"].splitlines() if line and line.strip("-"))
+
 # Example usage
 if __name__ == "__main__":
     # Get search results
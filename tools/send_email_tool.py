@@ -4,9 +4,13 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
+from .resilience import call_with_breaker
 #done
 load_dotenv()
 
+# Seconds to wait on the SMTP server (connect and each command) before giving up
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "15"))
+
 def send_email(to: str = None, subject: str = None, body: str = None, **kwargs):
     """Send an email with subject and body to the specified recipient."""
     try:
@@ -29,12 +33,23 @@ def send_email(to: str = None, subject: str = None, body: str = None, **kwargs):
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain', 'utf-8')) 
 
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
+        def deliver():
+            server = smtplib.SMTP(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
+            server.starttls()
+            server.login(smtp_user, smtp_password)
+            server.send_message(msg)
+            server.quit()
+
+        # Never hedged: a duplicate request would send the email twice
+        call_with_breaker("send_email", smtp_server, deliver)
         return {"status": "success", "message": f"Email sent to {to}"}
     
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+
+def compact_email(result):
+    """An email result is already small; only the status message is useful to the LLM"""
+    if not isinstance(result, dict):
+        return result
+    return f"{result.get('status')}: {result.get('message')}"
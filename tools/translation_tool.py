@@ -1,8 +1,12 @@
 # tools/translate_tool.py
+import os
 import requests
-import time
 import random
+from .resilience import call_with_breaker, hedged_call, is_http_failure
 #done
+# Seconds to wait for a translation endpoint before giving up
+REQUEST_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "10"))
+
 def translate_text(to: str = None, text: str = None, target_language: str = None, source_language: str = "auto", **kwargs):
     """
     Translate text using Google Translate's unofficial API.
@@ -34,9 +38,23 @@ def translate_text(to: str = None, text: str = None, target_language: str = None
         if not target_language:
             return {"status": "error", "message": "No target language provided"}
             
-        # Add a small random delay to avoid rate limiting
-        time.sleep(random.uniform(0.1, 0.5))
-        
+        # Race the primary endpoint against the backup once it is slower than its usual p95
+        return hedged_call(
+            "translate_text",
+            lambda: primary_translate(text, target_language, source_language),
+            lambda: backup_translate(text, target_language, source_language),
+            is_success=lambda result: result.get("status") == "success"
+        )
+            
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Both translation methods failed: {str(e)}"
+        }
+
+def primary_translate(text, target_language, source_language="auto"):
+    """Primary translation method using the translate.googleapis.com endpoint"""
+    try:
         # Google Translate URL
         url = "https://translate.googleapis.com/translate_a/single"
         
@@ -62,8 +80,12 @@ def translate_text(to: str = None, text: str = None, target_language: str = None
             "Accept-Language": "en-US,en;q=0.9",
         }
         
-        # Make request
-        response = requests.get(url, params=params, headers=headers)
+        # Make request through the host's circuit breaker
+        response = call_with_breaker(
+            "translate_text", url,
+            lambda: requests.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT),
+            is_failure=is_http_failure
+        )
         
         # Check if request was successful
         if response.status_code == 200:
@@ -88,19 +110,16 @@ def translate_text(to: str = None, text: str = None, target_language: str = None
                 "target_language": target_language
             }
         else:
-            # Handle error
-            # Try a backup method
-            return backup_translate(text, target_language, source_language)
-            
-    except Exception as e:
-        # If primary method fails, try backup
-        try:
-            return backup_translate(text, target_language, source_language)
-        except Exception as backup_error:
             return {
                 "status": "error",
-                "message": f"Both translation methods failed. Primary error: {str(e)}, Backup error: {str(backup_error)}"
+                "message": f"Primary translation API returned status code {response.status_code}: {response.text}"
             }
+            
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Primary translation failed: {str(e)}"
+        }
 
 def backup_translate(text, target_language, source_language="auto"):
     """Backup translation method using a different Google Translate endpoint"""
@@ -119,7 +138,11 @@ def backup_translate(text, target_language, source_language="auto"):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36",
         }
         
-        response = requests.get(url, params=params, headers=headers)
+        response = call_with_breaker(
+            "translate_text", url,
+            lambda: requests.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT),
+            is_failure=is_http_failure
+        )
         
         if response.status_code == 200:
             # This endpoint returns a different format
@@ -151,4 +174,13 @@ def backup_translate(text, target_language, source_language="auto"):
         return {
             "status": "error",
             "message": f"Backup translation failed: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+def compact_translation(result):
+    """Return just the translated text (or the error message) of a translate_text result"""
+    if not isinstance(result, dict):
+        return result
+    if result.get("status") == "success":
+        return {"translated_text": result.get("translated_text"), "target_language": result.get("target_language")}
+    return {"error": result.get("message")}
@@ -3,10 +3,14 @@ import requests
 from typing import Dict, Any, Union
 from dotenv import load_dotenv
 from geopy.geocoders import Nominatim
+from .resilience import call_with_breaker, is_http_failure
 #done
 # Load environment variables
 load_dotenv()
 
+# Seconds to wait for the geocoder and the weather API before giving up
+REQUEST_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "10"))
+
 def get_weather(location: str) -> Union[Dict[str, Any], str]:
     """
     Returns current weather information for the given location
@@ -29,7 +33,10 @@ def get_weather(location: str) -> Union[Dict[str, Any], str]:
             raise ValueError("WEATHER_API_KEY not set in .env file")
         
         # Get geographic coordinates for the location
-        location_info = geolocator.geocode(location)
+        location_info = call_with_breaker(
+            "get_weather", "nominatim.openstreetmap.org",
+            lambda: geolocator.geocode(location, timeout=REQUEST_TIMEOUT)
+        )
         if not location_info:
             return f"Location not found: {location}"
         
@@ -39,7 +46,11 @@ def get_weather(location: str) -> Union[Dict[str, Any], str]:
         
         # Make API request to OpenWeatherMap
         weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-        response = requests.get(weather_url)
+        response = call_with_breaker(
+            "get_weather", weather_url,
+            lambda: requests.get(weather_url, timeout=REQUEST_TIMEOUT),
+            is_failure=is_http_failure
+        )
         
         if response.status_code != 200:
             return f"Weather API error: {response.status_code} - {response.text}"
@@ -80,3 +91,24 @@ def get_weather(location: str) -> Union[Dict[str, Any], str]:
     
     except Exception as e:
         return f"Error getting weather for '{location}': {str(e)}"
+
+def compact_weather(result: Union[Dict[str, Any], str]) -> Union[Dict[str, Any], str]:
+    """
+    Project a get_weather result onto the fields the final answer needs
+    
+    Args:
+        result: Value returned by get_weather
+        
+    Returns:
+        dict: Location, condition, temperature and humidity, or the error message unchanged
+    """
+    if not isinstance(result, dict) or "weather" not in result:
+        return result
+    weather = result["weather"]
+    return {
+        "location": result.get("location"),
+        "condition": weather.get("description", weather.get("condition")),
+        "temp_c": weather.get("temperature", {}).get("current"),
+        "feels_like_c": weather.get("temperature", {}).get("feels_like"),
+        "humidity": weather.get("humidity")
+    }